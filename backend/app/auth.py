@@ -1,90 +1,227 @@
 from __future__ import annotations
 
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models
-from .database import get_db
+from .config import get_settings
+from .database import get_async_db
 from .schemas import TokenData
 
 SECRET_KEY = "super-secret-key-change-me"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 12
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (
         expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> models.User:
+def new_refresh_token() -> tuple[str, str]:
+    """Return an opaque refresh token and the digest to store for it."""
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    # The token is random, so a fast digest is enough; nothing to brute-force.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def principal_claims(user: models.User) -> dict:
+    """Claims that let a request be authorized without loading the user row."""
+    return {
+        "sub": str(user.id),
+        "is_admin": user.is_admin,
+        "name": user.display_name,
+        "tv": user.token_version,
+    }
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    is_admin: bool
+    display_name: str
+    token_version: int
+
+
+class PrincipalCache:
+    """Recently seen principals, keyed by user id.
+
+    Entries expire after ``ttl`` seconds so an admin flag or token version
+    changed by another worker is picked up without a restart; changes made
+    through this worker call ``invalidate`` directly.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[int, tuple[float, Principal]] = {}
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            item = self._entries.get(user_id)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item[1]
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+principal_cache = PrincipalCache(get_settings().auth_principal_ttl_seconds)
+
+
+class TokenDenylist:
+    """Access tokens revoked before they expire, by ``jti``.
+
+    Entries are dropped once the token would have expired anyway, so the set
+    stays as small as the number of logouts in the last access-token lifetime.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._expiry: dict[str, float] = {}
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._expiry = {key: exp for key, exp in self._expiry.items() if exp > now}
+            if expires_at > now:
+                self._expiry[jti] = expires_at
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._expiry
+
+
+token_denylist = TokenDenylist()
+
+
+def decode_access_token(token: str) -> Optional[TokenData]:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return TokenData(
+            user_id=int(payload["sub"]),
+            is_admin=bool(payload.get("is_admin", False)),
+            display_name=payload.get("name"),
+            token_version=int(payload.get("tv", 0)),
+            jti=payload.get("jti"),
+            expires_at=payload.get("exp"),
+        )
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+
+async def _resolve(token_data: TokenData, db: AsyncSession) -> Optional[Principal]:
+    if token_denylist.is_revoked(token_data.jti):
+        return None
+    principal = principal_cache.get(token_data.user_id)
+    if principal is None:
+        row = (
+            await db.execute(
+                select(
+                    models.User.id,
+                    models.User.is_admin,
+                    models.User.display_name,
+                    models.User.token_version,
+                ).where(models.User.id == token_data.user_id)
+            )
+        ).one_or_none()
+        # Release the connection now rather than when the request finishes.
+        await db.commit()
+        if row is None:
+            return None
+        principal = Principal(*row)
+        principal_cache.put(principal)
+    if principal.token_version != token_data.token_version:
+        return None
+    return principal
+
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = int(payload.get("sub"))
-        is_admin: bool = bool(payload.get("is_admin", False))
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id, is_admin=is_admin)
-    except JWTError:
-        raise credentials_exception from None
-    user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
-    if user is None:
+    token_data = decode_access_token(token)
+    if token_data is None:
         raise credentials_exception
+    principal = await _resolve(token_data, db)
+    if principal is None:
+        raise credentials_exception
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+) -> models.User:
+    """The full user row, for endpoints that read or change the profile."""
+    user = await db.get(models.User, principal.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
-async def get_current_user_optional(
+async def get_current_principal_optional(
     authorization: Optional[str] = Header(default=None),
-    db: Session = Depends(get_db),
-) -> Optional[models.User]:
+    db: AsyncSession = Depends(get_async_db),
+) -> Optional[Principal]:
     if not authorization:
         return None
     scheme, _, token = authorization.partition(" ")
     if scheme.lower() != "bearer" or not token:
         return None
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            return None
-    except JWTError:
+    return await principal_for_token(token, db)
+
+
+async def principal_for_token(token: str, db: AsyncSession) -> Optional[Principal]:
+    """Resolve a bare access token, for transports that cannot send headers."""
+    token_data = decode_access_token(token)
+    if token_data is None:
         return None
-    return db.query(models.User).filter(models.User.id == int(user_id)).first()
+    return await _resolve(token_data, db)
 
 
 async def get_current_active_user(user: models.User = Depends(get_current_user)) -> models.User:
     return user
 
 
-async def get_current_admin(user: models.User = Depends(get_current_user)) -> models.User:
-    if not user.is_admin:
+async def get_current_admin(
+    principal: Principal = Depends(get_current_principal),
+) -> Principal:
+    if not principal.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
-    return user
+    return principal
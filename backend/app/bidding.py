@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import weakref
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import lifecycle, models
+from .config import get_settings
+
+settings = get_settings()
+
+# How often set_proxy_bid re-reads the lot when another process bids first.
+PROXY_ATTEMPTS = 3
+
+
+class AuctionLockManager:
+    """Hands out one lock per auction so bids on a lot are serialized in-process.
+
+    Locks are held weakly, so lots nobody is bidding on do not accumulate.
+    """
+
+    def __init__(self) -> None:
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def lock_for(self, auction_id: int) -> asyncio.Lock:
+        lock = self._locks.get(auction_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[auction_id] = lock
+        return lock
+
+
+auction_locks = AuctionLockManager()
+
+
+def _outbid(current_price: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Outbid: current price is {current_price:.2f}",
+    )
+
+
+class _StaleAuction(Exception):
+    """The auction row changed under us (another process bid or it closed)."""
+
+
+def increment_for(price: float) -> float:
+    step = settings.bid_increments[0][1]
+    for threshold, increment in settings.bid_increments:
+        if price >= threshold:
+            step = increment
+    return step
+
+
+def resolve_proxies(
+    price: float, high_bidder_id: int | None, proxies: list[tuple[int, float]]
+) -> list[tuple[int, float]]:
+    """Visible bids that settle the standing proxies against the current price.
+
+    ``proxies`` are ``(bidder_id, max_amount)`` in precedence order: highest
+    maximum first, earlier proxy first among equals. The runner-up bids its
+    full maximum, then the leader bids one increment past it (capped at its
+    own maximum), so at most two bids are written however long the war would
+    have been by hand.
+
+    The price equals that of a war fought one increment at a time whenever the
+    runner-up gets to bid its maximum in it. Otherwise the war stops on the
+    first step of its ladder past that maximum, a step that depends on where
+    the price happened to start, while this charges the full increment past
+    the maximum, so the price can be higher by up to that increment.
+    ``python -m benchmarks.proxy_war`` checks both against random wars.
+    """
+    if not proxies:
+        return []
+    leader_id, leader_max = proxies[0]
+    runner_max = proxies[1][1] if len(proxies) > 1 else None
+    bids: list[tuple[int, float]] = []
+
+    if runner_max is not None and price < runner_max < leader_max:
+        runner_id = proxies[1][0]
+        if runner_id != high_bidder_id:
+            bids.append((runner_id, runner_max))
+            price, high_bidder_id = runner_max, runner_id
+
+    # A runner-up whose maximum only equals the price cannot beat it.
+    contested = runner_max is not None and runner_max > price
+    if high_bidder_id == leader_id and not contested:
+        return bids
+    target = price + increment_for(price)
+    if runner_max is not None:
+        target = max(target, runner_max + increment_for(runner_max))
+    amount = round(min(leader_max, target), 2)
+    if amount > price:
+        bids.append((leader_id, amount))
+    return bids
+
+
+async def _open_auction(db: AsyncSession, auction_id: int, now: datetime) -> models.Auction:
+    auction = await db.get(models.Auction, auction_id, populate_existing=True)
+    if not auction:
+        raise HTTPException(status_code=404, detail="Auction not found")
+    if now < auction.start_time:
+        raise HTTPException(status_code=400, detail="Auction has not started")
+    if now >= auction.end_time:
+        raise HTTPException(status_code=400, detail="Auction has ended")
+    return auction
+
+
+async def _record_bid(
+    db: AsyncSession, auction: models.Auction, bidder_id: int, amount: float, now: datetime
+) -> models.Bid:
+    """Raise the auction to ``amount`` if it is still below it, and add the bid.
+
+    The price check and the price update are a single conditional UPDATE, so
+    concurrent bidders (in this process or another) can never both win the
+    same price step.
+    """
+    # Same rule as Auction.extend_for_anti_sniping, evaluated against the
+    # row as it stands when the UPDATE runs.
+    window_edge = now + timedelta(minutes=auction.sniping_window_minutes)
+    extended_end = now + timedelta(minutes=auction.sniping_extension_minutes)
+    result = await db.execute(
+        update(models.Auction)
+        .where(
+            models.Auction.id == auction.id,
+            models.Auction.current_price < amount,
+            models.Auction.start_time <= now,
+            models.Auction.end_time > now,
+            # A close that ran since ``now`` was read settles the auction.
+            models.Auction.status != lifecycle.COMPLETED,
+        )
+        .values(
+            current_price=amount,
+            bid_count=models.Auction.bid_count + 1,
+            high_bidder_id=bidder_id,
+            last_bid_at=now,
+            version=models.Auction.version + 1,
+            end_time=case(
+                (models.Auction.end_time <= window_edge, extended_end),
+                else_=models.Auction.end_time,
+            ),
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise _StaleAuction
+    bid = models.Bid(amount=amount, auction_id=auction.id, bidder_id=bidder_id, created_at=now)
+    db.add(bid)
+    return bid
+
+
+async def _proxy_responses(
+    db: AsyncSession, auction: models.Auction, price: float, high_bidder_id: int | None, now: datetime
+) -> list[models.Bid]:
+    rows = await db.execute(
+        select(models.ProxyBid.bidder_id, models.ProxyBid.max_amount)
+        .where(models.ProxyBid.auction_id == auction.id)
+        .order_by(
+            models.ProxyBid.max_amount.desc(),
+            models.ProxyBid.updated_at.asc(),
+            models.ProxyBid.id.asc(),
+        )
+    )
+    plan = resolve_proxies(price, high_bidder_id, [tuple(row) for row in rows])
+    return [await _record_bid(db, auction, bidder, amount, now) for bidder, amount in plan]
+
+
+async def _commit(
+    db: AsyncSession, auction: models.Auction, bids: list[models.Bid], end_time: datetime
+) -> None:
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await db.refresh(auction)
+        raise _outbid(auction.current_price) from None
+    await db.refresh(auction)
+    if auction.end_time != end_time:
+        lifecycle.scheduler.watch(
+            auction.id, auction.status, auction.start_time, auction.end_time
+        )
+
+
+async def place_bid(
+    db: AsyncSession, auction_id: int, bidder_id: int, amount: float
+) -> tuple[list[models.Bid], models.Auction]:
+    """Record a bid if it beats the current price, extending the clock if needed.
+
+    Standing proxies then answer it in the same transaction. Returns every
+    visible bid written (the caller's first) and the auction as committed.
+    """
+    async with auction_locks.lock_for(auction_id):
+        now = datetime.utcnow()
+        auction = await _open_auction(db, auction_id, now)
+        if amount <= auction.current_price:
+            raise _outbid(auction.current_price)
+        end_time = auction.end_time
+        try:
+            bids = [await _record_bid(db, auction, bidder_id, amount, now)]
+            bids += await _proxy_responses(db, auction, amount, bidder_id, now)
+        except _StaleAuction:
+            await db.rollback()
+            await db.refresh(auction)
+            if now >= auction.end_time:
+                raise HTTPException(status_code=400, detail="Auction has ended") from None
+            raise _outbid(auction.current_price) from None
+        await _commit(db, auction, bids, end_time)
+        return bids, auction
+
+
+async def set_proxy_bid(
+    db: AsyncSession, auction_id: int, bidder_id: int, max_amount: float
+) -> tuple[list[models.Bid], models.Auction, models.ProxyBid]:
+    """Register or raise a bidder's maximum and let the proxies settle.
+
+    Returns the visible bids written, the auction as committed, and the
+    bidder's proxy. Retries if another process bids on the lot meanwhile.
+    """
+    async with auction_locks.lock_for(auction_id):
+        for attempt in range(PROXY_ATTEMPTS):
+            now = datetime.utcnow()
+            auction = await _open_auction(db, auction_id, now)
+            if max_amount <= auction.current_price:
+                raise _outbid(auction.current_price)
+            proxy = await db.scalar(
+                select(models.ProxyBid).where(
+                    models.ProxyBid.auction_id == auction_id,
+                    models.ProxyBid.bidder_id == bidder_id,
+                )
+            )
+            if proxy is None:
+                proxy = models.ProxyBid(
+                    auction_id=auction_id,
+                    bidder_id=bidder_id,
+                    max_amount=max_amount,
+                    created_at=now,
+                    updated_at=now,
+                )
+                db.add(proxy)
+            elif max_amount < proxy.max_amount:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Maximum can only be raised (currently {proxy.max_amount:.2f})",
+                )
+            elif max_amount > proxy.max_amount:
+                proxy.max_amount = max_amount
+                proxy.updated_at = now
+            await db.flush()
+
+            end_time = auction.end_time
+            try:
+                bids = await _proxy_responses(
+                    db, auction, auction.current_price, auction.high_bidder_id, now
+                )
+            except _StaleAuction:
+                await db.rollback()
+                continue
+            await _commit(db, auction, bids, end_time)
+            return bids, auction, proxy
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Auction is busy, try again"
+        )
+
+
+def recompute_aggregates(connection: Connection, auction_id: int | None = None) -> int:
+    """Rebuild price and bid aggregates on auctions from the bid history.
+
+    Returns the number of auctions rewritten.
+    """
+    bids = models.Bid.__table__
+    auctions = models.Auction.__table__
+
+    def _for_auction(column):
+        return select(column).where(bids.c.auction_id == auctions.c.id).scalar_subquery()
+
+    top_bid = (
+        select(bids.c.bidder_id)
+        .where(bids.c.auction_id == auctions.c.id)
+        .order_by(bids.c.amount.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    statement = update(auctions).values(
+        bid_count=_for_auction(func.count(bids.c.id)),
+        high_bidder_id=top_bid,
+        last_bid_at=_for_auction(func.max(bids.c.created_at)),
+        current_price=func.coalesce(
+            _for_auction(func.max(bids.c.amount)), auctions.c.starting_price
+        ),
+        version=auctions.c.version + 1,
+    )
+    if auction_id is not None:
+        statement = statement.where(auctions.c.id == auction_id)
+    return connection.execute(statement).rowcount
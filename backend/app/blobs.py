@@ -0,0 +1,236 @@
+"""Content-addressed storage for uploaded images.
+
+Uploads are streamed to a scratch file while their SHA-256 is computed,
+processed there, and published to the media storage under
+``blobs/<aa>/<sha256><ext>`` together with their renditions. The same bytes
+always map to the same URL, so a re-uploaded photo costs no disk and every
+blob URL can be cached forever. The digest names the bytes as uploaded; the
+stored file is that upload with its metadata stripped, which is deterministic.
+``media_files.ref_count`` counts the auction images, auction heroes and
+avatars that point at a blob; ``python -m app.manage gc-media`` deletes blobs
+nobody references.
+"""
+from __future__ import annotations
+
+import hashlib
+import secrets
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterable, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import imaging, models
+from .config import get_settings
+from .storage import DEFAULT_ROOT, media_storage, media_url
+
+settings = get_settings()
+
+CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and part headers around the file itself.
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Leading bytes -> (content type, extension). WebP is checked separately
+# because its signature is split around the RIFF chunk length.
+SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"GIF87a", "image/gif", ".gif"),
+    (b"GIF89a", "image/gif", ".gif"),
+]
+
+
+@lru_cache
+def incoming_dir() -> Path:
+    """Node-local scratch space, created on first use.
+
+    It sits next to the media root rather than inside it, so half-written and
+    unprocessed files are never served.
+    """
+    root = Path(settings.media_root) if settings.media_root else DEFAULT_ROOT
+    path = root.resolve().parent / f".{root.name}-incoming"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class IncomingBlob(NamedTuple):
+    path: Path
+    sha256: str
+    size: int
+    content_type: str
+    extension: str
+
+
+def sniff(head: bytes) -> Optional[tuple[str, str]]:
+    """The content type and extension the leading bytes identify, if any."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    for signature, content_type, extension in SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    return None
+
+
+def too_large(limit: Optional[int] = None) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Uploads are limited to {limit or settings.max_upload_bytes} bytes",
+    )
+
+
+def receive(source: BinaryIO, max_bytes: int) -> IncomingBlob:
+    """Copy ``source`` to a scratch file, checking its type and size as it goes."""
+    scratch = incoming_dir() / secrets.token_hex(16)
+    digest = hashlib.sha256()
+    size = 0
+    kind = None
+    try:
+        with scratch.open("wb") as buffer:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                if kind is None:
+                    kind = sniff(chunk)
+                    if kind is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Unsupported file type",
+                        )
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large()
+                digest.update(chunk)
+                buffer.write(chunk)
+        if kind is None:
+            raise HTTPException(status_code=400, detail="Empty upload")
+    except BaseException:
+        scratch.unlink(missing_ok=True)
+        raise
+    finally:
+        source.close()
+    return IncomingBlob(scratch, digest.hexdigest(), size, *kind)
+
+
+def blob_key(sha256: str, extension: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256}{extension}"
+
+
+def rendition_key(key: str, name: str) -> str:
+    return imaging.rendition_path(PurePosixPath(key), name).as_posix()
+
+
+def media_file_values(
+    key: str, path: Path, content_type: str, processed: imaging.ProcessedImage
+) -> dict:
+    """Column values for the MediaFile stored under ``key``, processed at ``path``."""
+    return {
+        "url": media_url(key),
+        "content_type": content_type,
+        "size": path.stat().st_size,
+        "width": processed.width,
+        "height": processed.height,
+        "thumbnail_url": media_url(rendition_key(key, "thumb")),
+        "medium_url": media_url(rendition_key(key, "medium")),
+    }
+
+
+def publish(
+    key: str, path: Path, content_type: str, processed: imaging.ProcessedImage
+) -> None:
+    """Hand a processed upload and its renditions to the media storage.
+
+    The original goes last, so once it is visible its renditions are too.
+    Blocking; run it on a worker thread.
+    """
+    publish_renditions(key, processed)
+    media_storage.put(key, path, content_type)
+
+
+def publish_renditions(key: str, processed: imaging.ProcessedImage) -> None:
+    """Hand the renditions of the upload stored under ``key`` to the media storage."""
+    for name, rendition in processed.renditions.items():
+        media_storage.put(rendition_key(key, name), Path(rendition), "image/webp")
+
+
+def discard_local(path: Path) -> None:
+    """Delete a scratch file and any renditions written beside it."""
+    for name in imaging.RENDITIONS:
+        imaging.rendition_path(path, name).unlink(missing_ok=True)
+    path.unlink(missing_ok=True)
+
+
+def discard(key: str) -> None:
+    """Delete a stored upload and its renditions."""
+    for name in imaging.RENDITIONS:
+        media_storage.delete(rendition_key(key, name))
+    media_storage.delete(key)
+
+
+async def adjust_references(
+    db: AsyncSession, removed: Iterable[Optional[str]], added: Iterable[Optional[str]]
+) -> None:
+    """Move reference counts from ``removed`` URLs to ``added`` ones.
+
+    URLs that are not uploads (external links) match no row and are ignored.
+    The caller commits.
+    """
+    delta = Counter(url for url in added if url)
+    delta.subtract(url for url in removed if url)
+    # Sessions do not autoflush; files added in this session must exist first.
+    await db.flush()
+    media_files = models.MediaFile.__table__
+    for url, change in delta.items():
+        if change:
+            await db.execute(
+                update(media_files)
+                .where(media_files.c.url == url)
+                .values(ref_count=media_files.c.ref_count + change)
+            )
+
+
+class UploadSizeLimit:
+    """Reject upload requests over the size limit before they are buffered.
+
+    Starlette spools the whole multipart body before the endpoint runs, so the
+    limit is applied to ``Content-Length`` up front and to the bytes actually
+    received (for chunked bodies) while the form is being parsed.
+    """
+
+    def __init__(self, app, path_prefix: str = "/media") -> None:
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+        if scope["path"].endswith("/batch"):
+            limit = settings.max_upload_batch_bytes
+            error = too_large(limit)
+        else:
+            limit = settings.max_upload_bytes + MULTIPART_OVERHEAD
+            error = too_large()
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise error
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,464 @@
+"""Bulk auction import and export.
+
+Imports are CSV, with a header row naming ``AuctionCreate`` fields, or NDJSON
+(one JSON object per line). Both are parsed as the bytes arrive, so a fleet
+consignment never sits in memory whole. Each row is validated with
+``AuctionCreate``. Valid rows are inserted in batches, one transaction per
+batch. Category slugs come from a single lookup per import, and postal codes
+are geocoded once each. Rows that fail validation are skipped and reported
+with their line number.
+
+Exports write the same columns, so an export can be edited and imported
+again. List fields (``category_slugs``, ``gallery_urls``) are ``|``-separated
+in CSV.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, NamedTuple, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import blobs, geo, lifecycle, models
+from .cache import AUCTIONS_NAMESPACE, response_cache
+from .schemas import (
+    AuctionCreate,
+    AuctionImportError,
+    AuctionImportReport,
+    AuctionImportWarning,
+)
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+LIST_FIELDS = ("category_slugs", "gallery_urls")
+LIST_SEPARATOR = "|"
+# A report lists at most this many failed rows; ``failed`` counts them all.
+MAX_REPORTED_ERRORS = 200
+EXPORT_BATCH = 500
+# Longest CSV record held while waiting for its closing quote.
+MAX_RECORD_CHARS = 1024 * 1024
+
+EXPORT_FIELDS = [
+    "id",
+    "title",
+    "description",
+    "status",
+    "starting_price",
+    "current_price",
+    "bid_count",
+    "location",
+    "postal_code",
+    "latitude",
+    "longitude",
+    "start_time",
+    "end_time",
+    "sniping_extension_minutes",
+    "sniping_window_minutes",
+    "image_url",
+    "gallery_urls",
+    "category_slugs",
+]
+
+
+def format_for(hint: Optional[str]) -> Optional[str]:
+    """The import format a content type or file name suggests."""
+    hint = (hint or "").lower()
+    if "csv" in hint:
+        return "csv"
+    if "ndjson" in hint or "jsonl" in hint or "json-seq" in hint:
+        return "ndjson"
+    return None
+
+
+class Record(NamedTuple):
+    line: int
+    fields: Optional[dict]
+    error: Optional[str] = None
+
+
+class RowReader:
+    """Turns streamed bytes into records as each one completes.
+
+    ``feed`` returns the records finished by a chunk and ``close`` the rest.
+    CSV lines are held until ``csv.reader`` can parse a whole record from
+    them, so quoting follows the CSV rules: a quoted field may span lines,
+    and a quote inside an unquoted cell (``12" pipe``) is just a character.
+    """
+
+    def __init__(self, fmt: str) -> None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown import format: {fmt}")
+        self.fmt = fmt
+        # utf-8-sig drops the byte-order mark spreadsheet exports start with.
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._buffer = ""
+        self._line = 0
+        # CSV lines not yet parsed into a record, and the number of the first.
+        self._pending: list[str] = []
+        self._pending_line = 1
+        self._header: Optional[list[str]] = None
+
+    def feed(self, chunk: bytes) -> list[Record]:
+        self._buffer += self._decoder.decode(chunk)
+        *lines, self._buffer = self._buffer.split("\n")
+        return self._take([line + "\n" for line in lines], final=False)
+
+    def close(self) -> list[Record]:
+        self._buffer += self._decoder.decode(b"", final=True)
+        lines = [self._buffer] if self._buffer else []
+        self._buffer = ""
+        return self._take(lines, final=True)
+
+    def _take(self, lines: list[str], final: bool) -> list[Record]:
+        if self.fmt == "ndjson":
+            records = []
+            for line in lines:
+                self._line += 1
+                record = self._json(line)
+                if record is not None:
+                    records.append(record)
+            return records
+        self._pending.extend(lines)
+        return self._csv_records(final)
+
+    def _csv_records(self, final: bool) -> list[Record]:
+        records = []
+        while self._pending:
+            consumed = 0
+
+            def source():
+                nonlocal consumed
+                for line in self._pending:
+                    consumed += 1
+                    yield line
+
+            try:
+                values = next(csv.reader(source(), strict=True))
+            except StopIteration:
+                break
+            except csv.Error as exc:
+                if consumed < len(self._pending):
+                    # Malformed quoting that more data cannot fix.
+                    records.append(Record(self._pending_line, None, f"Invalid CSV: {exc}"))
+                elif not final and sum(map(len, self._pending)) <= MAX_RECORD_CHARS:
+                    break  # The record continues in a later chunk.
+                else:
+                    # An opening quote that never closes. Report its line and
+                    # carry on from the next one rather than lose the rest.
+                    records.append(Record(self._pending_line, None, "Unterminated quoted field"))
+                    consumed = 1
+                self._advance(consumed)
+                continue
+            line = self._pending_line
+            self._advance(consumed)
+            record = self._row(line, values)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _advance(self, lines: int) -> None:
+        del self._pending[:lines]
+        self._pending_line += lines
+
+    def _json(self, line: str) -> Optional[Record]:
+        if not line.strip():
+            return None
+        try:
+            fields = json.loads(line)
+        except ValueError as exc:
+            return Record(self._line, None, f"Invalid JSON: {exc.msg}")
+        if not isinstance(fields, dict):
+            return Record(self._line, None, "Each line must be a JSON object")
+        return Record(self._line, fields)
+
+    def _row(self, line: int, values: list[str]) -> Optional[Record]:
+        if not any(value.strip() for value in values):
+            return None
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return None
+        if len(values) > len(self._header):
+            return Record(line, None, "More values than header columns")
+        fields: dict = {}
+        for name, value in zip(self._header, values):
+            # Blank cells fall back to the schema defaults.
+            if value == "":
+                continue
+            if name in LIST_FIELDS:
+                items = (item.strip() for item in value.split(LIST_SEPARATOR))
+                fields[name] = [item for item in items if item]
+            else:
+                fields[name] = value
+        return Record(line, fields)
+
+
+def _describe(exc: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    ]
+
+
+class AuctionImporter:
+    """Validates records and inserts them a batch at a time for one owner."""
+
+    def __init__(self, db: AsyncSession, owner_id: int, batch_size: int = 100) -> None:
+        self.db = db
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        self.report = AuctionImportReport()
+        self._categories: Optional[dict[str, models.Category]] = None
+        self._places: dict[str, Optional[geo.Point]] = {}
+        # (line, row, categories, coordinates) waiting for the next flush.
+        self._batch: list[tuple] = []
+
+    async def add(self, record: Record) -> None:
+        if record.error is not None:
+            self._fail(record.line, [record.error])
+            return
+        try:
+            auction_in = AuctionCreate.parse_obj(record.fields)
+        except ValidationError as exc:
+            self._fail(record.line, _describe(exc))
+            return
+        # Stored times are naive UTC; files often carry an offset or a "Z".
+        for name in ("start_time", "end_time"):
+            value = getattr(auction_in, name)
+            if value.tzinfo is not None:
+                setattr(auction_in, name, value.astimezone(timezone.utc).replace(tzinfo=None))
+        problems = []
+        if auction_in.end_time <= auction_in.start_time:
+            problems.append("End time must be after start time")
+        categories = await self._resolve_categories(auction_in.category_slugs, problems)
+        point = await self._resolve_place(record.line, auction_in, problems)
+        if problems:
+            self._fail(record.line, problems)
+            return
+        self._batch.append((record.line, auction_in, categories, point))
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Insert and commit the pending batch."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        db = self.db
+        try:
+            gallery = await self._gallery_media(batch)
+            auctions = [
+                self._build(auction_in, categories, point, gallery)
+                for _, auction_in, categories, point in batch
+            ]
+            media_urls = [
+                url
+                for auction in auctions
+                for url in (auction.image_url, *(image.url for image in auction.images))
+            ]
+            await blobs.adjust_references(db, [], media_urls)
+            await db.commit()
+        except SQLAlchemyError as exc:
+            await db.rollback()
+            for line, *_ in batch:
+                self._fail(line, [f"Could not be saved: {exc.__class__.__name__}"])
+            return
+        await response_cache.invalidate(AUCTIONS_NAMESPACE)
+        for auction in auctions:
+            lifecycle.scheduler.watch(
+                auction.id, auction.status, auction.start_time, auction.end_time
+            )
+            self.report.auction_ids.append(auction.id)
+        self.report.created += len(auctions)
+
+    async def _resolve_categories(
+        self, slugs: list[str], problems: list[str]
+    ) -> list[models.Category]:
+        if self._categories is None:
+            categories = await self.db.scalars(select(models.Category))
+            self._categories = {category.slug: category for category in categories}
+        missing = [slug for slug in slugs if slug not in self._categories]
+        if missing:
+            problems.append(f"Unknown categories: {', '.join(missing)}")
+            return []
+        return [self._categories[slug] for slug in dict.fromkeys(slugs)]
+
+    async def _geocode(self, value: Optional[str]) -> Optional[geo.Point]:
+        key = geo.find_postal_code(value)
+        if key is None:
+            return None
+        cache_key = f"{key[0]}:{key[1]}"
+        if cache_key not in self._places:
+            self._places[cache_key] = await geo.geocode(self.db, value)
+        return self._places[cache_key]
+
+    async def _resolve_place(
+        self, line: int, auction_in: AuctionCreate, problems: list[str]
+    ) -> Optional[geo.Point]:
+        # Same precedence as a single create: coordinates, postal code, location.
+        if auction_in.latitude is not None or auction_in.longitude is not None:
+            if auction_in.latitude is None or auction_in.longitude is None:
+                problems.append("Send latitude and longitude together")
+                return None
+            return geo.Point(auction_in.latitude, auction_in.longitude)
+        if auction_in.postal_code:
+            point = await self._geocode(auction_in.postal_code)
+            if point is None:
+                self._warn(line, geo.not_geocoded(auction_in.postal_code))
+            return point
+        return await self._geocode(auction_in.location)
+
+    def _build(
+        self,
+        auction_in: AuctionCreate,
+        categories: list[models.Category],
+        point: Optional[geo.Point],
+        gallery: dict[str, models.MediaFile],
+    ) -> models.Auction:
+        auction = models.Auction(
+            title=auction_in.title,
+            description=auction_in.description,
+            starting_price=auction_in.starting_price,
+            current_price=auction_in.starting_price,
+            image_url=auction_in.image_url or next(iter(auction_in.gallery_urls or []), None),
+            location=auction_in.location,
+            postal_code=auction_in.postal_code,
+            latitude=point.latitude if point else None,
+            longitude=point.longitude if point else None,
+            start_time=auction_in.start_time,
+            end_time=auction_in.end_time,
+            sniping_extension_minutes=auction_in.sniping_extension_minutes,
+            sniping_window_minutes=auction_in.sniping_window_minutes,
+            status=lifecycle.initial_status(
+                auction_in.start_time, auction_in.end_time, datetime.utcnow()
+            ),
+            owner_id=self.owner_id,
+        )
+        # In the session before the categories, whose backref would add it.
+        self.db.add(auction)
+        auction.categories = categories
+        for position, url in enumerate(auction_in.gallery_urls or []):
+            image = models.AuctionImage(url=url, position=position)
+            media = gallery.get(url)
+            if media is not None:
+                image.width, image.height = media.width, media.height
+                image.thumbnail_url, image.medium_url = media.thumbnail_url, media.medium_url
+            auction.images.append(image)
+        return auction
+
+    async def _gallery_media(self, batch) -> dict[str, models.MediaFile]:
+        urls = {url for _, auction_in, *_ in batch for url in auction_in.gallery_urls or []}
+        if not urls:
+            return {}
+        media_files = await self.db.scalars(
+            select(models.MediaFile).where(models.MediaFile.url.in_(urls))
+        )
+        return {media_file.url: media_file for media_file in media_files}
+
+    def _warn(self, line: int, message: str) -> None:
+        if len(self.report.warnings) < MAX_REPORTED_ERRORS:
+            self.report.warnings.append(AuctionImportWarning(line=line, message=message))
+
+    def _fail(self, line: int, errors: list[str]) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(AuctionImportError(line=line, errors=errors))
+
+
+async def import_auctions(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    owner_id: int,
+    batch_size: int = 100,
+) -> AuctionImportReport:
+    reader = RowReader(fmt)
+    importer = AuctionImporter(db, owner_id, batch_size)
+    async for chunk in chunks:
+        for record in reader.feed(chunk):
+            await importer.add(record)
+    for record in reader.close():
+        await importer.add(record)
+    await importer.flush()
+    return importer.report
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode(rows: list[dict], fmt: str, header: bool) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({key: _export_value(value) for key, value in row.items()}) + "\n"
+            for row in rows
+        )
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+    if header:
+        writer.writeheader()
+    for row in rows:
+        writer.writerow(
+            {
+                key: LIST_SEPARATOR.join(value) if key in LIST_FIELDS else _export_value(value)
+                for key, value in row.items()
+            }
+        )
+    return out.getvalue()
+
+
+async def export_auctions(
+    db: AsyncSession, fmt: str, status: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Text chunks of every auction in id order, a page at a time."""
+    auctions = models.Auction.__table__
+    links = models.auction_category_table
+    categories = models.Category.__table__
+    images = models.AuctionImage.__table__
+    columns = [auctions.c[name] for name in EXPORT_FIELDS if name not in LIST_FIELDS]
+    last_id = 0
+    first = True
+    while True:
+        query = select(*columns).where(auctions.c.id > last_id)
+        if status:
+            query = query.where(auctions.c.status == status)
+        rows = (await db.execute(query.order_by(auctions.c.id).limit(EXPORT_BATCH))).all()
+        if not rows and not first:
+            return
+        ids = [row.id for row in rows]
+        slugs: dict[int, list[str]] = {auction_id: [] for auction_id in ids}
+        gallery: dict[int, list[str]] = {auction_id: [] for auction_id in ids}
+        if ids:
+            for auction_id, slug in await db.execute(
+                select(links.c.auction_id, categories.c.slug)
+                .join(categories, categories.c.id == links.c.category_id)
+                .where(links.c.auction_id.in_(ids))
+                .order_by(links.c.auction_id, categories.c.slug)
+            ):
+                slugs[auction_id].append(slug)
+            for auction_id, url in await db.execute(
+                select(images.c.auction_id, images.c.url)
+                .where(images.c.auction_id.in_(ids))
+                .order_by(images.c.auction_id, images.c.position)
+            ):
+                gallery[auction_id].append(url)
+        page = [
+            {
+                **row._asdict(),
+                "gallery_urls": gallery[row.id],
+                "category_slugs": slugs[row.id],
+            }
+            for row in rows
+        ]
+        yield _encode(page, fmt, header=first)
+        if len(rows) < EXPORT_BATCH:
+            return
+        first = False
+        last_id = ids[-1]
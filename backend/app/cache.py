@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .config import get_settings
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+
+class CacheBackend:
+    """Storage for cached response bodies plus per-namespace generations.
+
+    Invalidating a namespace bumps its generation; keys embed the generation,
+    so stale entries are simply never read again and age out on their own.
+    Methods are coroutines so a networked backend never blocks the event loop.
+    """
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: CachedBody, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def generation(self, namespace: str) -> int:
+        raise NotImplementedError
+
+    async def bump(self, namespace: str) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, CachedBody]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: CachedBody, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    async def bump(self, namespace: str) -> None:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class NullBackend(CacheBackend):
+    """Caches nothing; every read is rebuilt, and ETags still spare the transfer."""
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        return None
+
+    async def set(self, key: str, value: CachedBody, ttl: int) -> None:
+        pass
+
+    async def generation(self, namespace: str) -> int:
+        return 0
+
+    async def bump(self, namespace: str) -> None:
+        pass
+
+
+class RedisBackend(CacheBackend):
+    """Shared backend so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url: str) -> None:
+        try:
+            from redis import asyncio as redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("CACHE_URL requires the 'redis' package (4.2 or later)") from exc
+        self._client = redis.Redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        raw = await self._client.hmget(f"cache:{key}", "body", "etag")
+        if raw[0] is None:
+            return None
+        return CachedBody(raw[0], raw[1].decode())
+
+    async def set(self, key: str, value: CachedBody, ttl: int) -> None:
+        async with self._client.pipeline() as pipeline:
+            pipeline.hset(f"cache:{key}", mapping={"body": value.body, "etag": value.etag})
+            pipeline.expire(f"cache:{key}", ttl)
+            await pipeline.execute()
+
+    async def generation(self, namespace: str) -> int:
+        return int(await self._client.get(f"cache-gen:{namespace}") or 0)
+
+    async def bump(self, namespace: str) -> None:
+        await self._client.incr(f"cache-gen:{namespace}")
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend) -> None:
+        self.backend = backend
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self.invalidations: Counter[str] = Counter()
+
+    async def _key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:{await self.backend.generation(namespace)}:{key}"
+
+    async def get_or_build(
+        self,
+        namespace: str,
+        key: str,
+        ttl: int,
+        build: Callable[[], Union[Any, Awaitable[Any]]],
+    ) -> CachedBody:
+        full_key = await self._key(namespace, key)
+        cached = await self.backend.get(full_key)
+        if cached is not None:
+            self.hits[namespace] += 1
+            return cached
+        self.misses[namespace] += 1
+        payload = build()
+        if inspect.isawaitable(payload):
+            payload = await payload
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        cached = CachedBody(body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+        await self.backend.set(full_key, cached, ttl)
+        return cached
+
+    async def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            await self.backend.bump(namespace)
+            self.invalidations[namespace] += 1
+
+    def stats(self) -> dict[str, Any]:
+        namespaces = sorted({*self.hits, *self.misses, *self.invalidations})
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "namespaces": {
+                namespace: {
+                    "hits": self.hits[namespace],
+                    "misses": self.misses[namespace],
+                    "invalidations": self.invalidations[namespace],
+                }
+                for namespace in namespaces
+            },
+        }
+
+
+def json_response(request: Request, cached: CachedBody, cache_control: str) -> Response:
+    """Serve ``cached`` with validators, or a bare 304 if the client already has it."""
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match", "")
+    if cached.etag in {tag.strip() for tag in if_none_match.split(",")} or if_none_match == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+def _build_cache() -> ResponseCache:
+    settings = get_settings()
+    if settings.cache_url:
+        return ResponseCache(RedisBackend(settings.cache_url))
+    if settings.web_concurrency > 1:
+        # Invalidations would only reach the worker that handled the write.
+        return ResponseCache(NullBackend())
+    return ResponseCache(MemoryBackend(settings.cache_max_entries))
+
+
+response_cache = _build_cache()
+
+AUCTIONS_NAMESPACE = "auctions"
+CATALOG_NAMESPACE = "catalog"
+
+
+def auction_namespace(auction_id: int) -> str:
+    return f"auction:{auction_id}"
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Runtime configuration, read from the environment (or a ``.env`` file)."""
+
+    database_url: str = "sqlite:///./auction.db"
+    # Derived from database_url (aiosqlite / asyncpg) unless set explicitly.
+    async_database_url: Optional[str] = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_echo: bool = False
+
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+
+    # Response cache. CACHE_URL (redis://...) shares entries between workers;
+    # without it a single worker keeps its own LRU, and several workers
+    # (WEB_CONCURRENCY, the count uvicorn and gunicorn start) cache nothing,
+    # since one worker's LRU never sees another's invalidations.
+    cache_url: Optional[str] = None
+    web_concurrency: int = 1
+    cache_max_entries: int = 2048
+    cache_auction_ttl_seconds: int = 5
+    cache_catalog_ttl_seconds: int = 300
+
+    # How long a worker trusts a user's admin flag and token version before
+    # re-reading them; profile updates in the same worker take effect at once.
+    auth_principal_ttl_seconds: int = 60
+    access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 14
+
+    # Password hashing. The first scheme hashes new passwords; listing
+    # "argon2" first (needs argon2-cffi) migrates bcrypt users on login.
+    password_schemes: list[str] = ["bcrypt"]
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    # Hashes allowed to wait per worker before further logins queue in-process.
+    password_hash_queue: int = 8
+
+    # Processes rendering image uploads (0 renders on a thread instead).
+    image_workers: int = 2
+    # Largest accepted upload, checked while the body streams in.
+    max_upload_bytes: int = 15 * 1024 * 1024
+    # POST /media/auction/batch: files per request and total request size.
+    max_upload_batch_files: int = 60
+    max_upload_batch_bytes: int = 300 * 1024 * 1024
+    # Auctions inserted per transaction by bulk imports.
+    bulk_import_batch_size: int = 100
+    # Where uploads are kept: "local" (MEDIA_ROOT, app/uploads by default,
+    # served by this app) or "s3" (any S3-compatible store; /media URLs
+    # redirect to pre-signed downloads).
+    media_storage: str = "local"
+    media_root: Optional[str] = None
+    s3_bucket: Optional[str] = None
+    # For MinIO and other non-AWS stores, e.g. http://localhost:9000.
+    s3_endpoint_url: Optional[str] = None
+    s3_region: Optional[str] = None
+    # Unset falls back to boto3's credential chain (env, profile, instance role).
+    s3_access_key_id: Optional[str] = None
+    s3_secret_access_key: Optional[str] = None
+    s3_key_prefix: str = ""
+    s3_force_path_style: bool = False
+    s3_presign_seconds: int = 3600
+    # Hand media bytes to the fronting web server: "x-accel-redirect" (nginx,
+    # served from MEDIA_ACCEL_PREFIX) or "x-sendfile" (Apache, lighttpd).
+    media_accel: Optional[str] = None
+    media_accel_prefix: str = "/protected-media/"
+    # Cache lifetime for uploads stored before content addressing.
+    media_max_age_seconds: int = 86400
+
+    # Login throttling: attempts per client IP, failures per account.
+    login_ip_limit: int = 20
+    login_account_limit: int = 5
+    login_window_seconds: int = 300
+
+    # Run the auction lifecycle scheduler in this process. Safe to leave on in
+    # every worker; transitions are settled by whichever worker gets there first.
+    lifecycle_scheduler_enabled: bool = True
+    # How often the scheduler looks for due auctions written by other
+    # processes (another worker, the import-auctions command).
+    lifecycle_rescan_seconds: int = 60
+
+    # Proxy bidding steps: (price from which it applies, increment), ascending.
+    bid_increments: list[tuple[float, float]] = [
+        (0, 1),
+        (100, 5),
+        (1_000, 25),
+        (10_000, 100),
+        (50_000, 250),
+    ]
+
+    class Config:
+        env_file = ".env"
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
@@ -0,0 +1,294 @@
+"""Conversation threads and their inbox summaries.
+
+Every message belongs to the conversation for its participant pair and
+auction. Delivering a message keeps the conversation's last message and
+count, and each member's unread count, up to date. The inbox and a thread
+are therefore index range scans rather than scans of a user's whole history.
+Works on an ``AsyncSession`` or an ``AsyncConnection``; the caller commits.
+
+Each user also has a push topic. Once committed, delivered messages and read
+receipts are announced there with the affected unread counts, and a client
+that reconnects asks for what it missed after the last message id it saw.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, insert, or_, select, update
+
+from . import models
+from .realtime import hub, user_topic
+from .schemas import MessagePublic, UserPublic
+
+# A client further behind than this refetches over HTTP instead.
+RESUME_LIMIT = 200
+
+
+def participants(first_id: int, second_id: int) -> tuple[int, int]:
+    return (first_id, second_id) if first_id <= second_id else (second_id, first_id)
+
+
+async def _conversation_id(
+    db, user_low_id: int, user_high_id: int, auction_id: Optional[int], now: datetime
+) -> int:
+    conversations = models.Conversation.__table__
+    members = models.ConversationMember.__table__
+    existing = (
+        await db.execute(
+            select(conversations.c.id).where(
+                conversations.c.user_low_id == user_low_id,
+                conversations.c.user_high_id == user_high_id,
+                func.coalesce(conversations.c.auction_id, 0) == (auction_id or 0),
+            )
+        )
+    ).scalar()
+    if existing is not None:
+        return existing
+    # A concurrent first message between the same pair trips the unique
+    # index; the caller rolls back and delivers again.
+    conversation_id = (
+        await db.execute(
+            insert(conversations)
+            .values(
+                user_low_id=user_low_id,
+                user_high_id=user_high_id,
+                auction_id=auction_id,
+                message_count=0,
+                created_at=now,
+            )
+            .returning(conversations.c.id)
+        )
+    ).scalar_one()
+    await db.execute(
+        insert(members),
+        [
+            {"conversation_id": conversation_id, "user_id": user_id, "unread_count": 0}
+            for user_id in sorted({user_low_id, user_high_id})
+        ],
+    )
+    return conversation_id
+
+
+async def deliver(
+    db,
+    *,
+    sender_id: int,
+    recipient_id: int,
+    body: str,
+    auction_id: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """Store a message in its conversation and return the message id."""
+    now = now or datetime.utcnow()
+    conversations = models.Conversation.__table__
+    members = models.ConversationMember.__table__
+    messages = models.Message.__table__
+    conversation_id = await _conversation_id(
+        db, *participants(sender_id, recipient_id), auction_id, now
+    )
+    message_id = (
+        await db.execute(
+            insert(messages)
+            .values(
+                body=body,
+                auction_id=auction_id,
+                sender_id=sender_id,
+                recipient_id=recipient_id,
+                conversation_id=conversation_id,
+                created_at=now,
+            )
+            .returning(messages.c.id)
+        )
+    ).scalar_one()
+    await db.execute(
+        update(conversations)
+        .where(conversations.c.id == conversation_id)
+        .values(
+            last_message_id=message_id,
+            last_message_at=now,
+            message_count=conversations.c.message_count + 1,
+        )
+    )
+    await db.execute(
+        update(members)
+        .where(members.c.conversation_id == conversation_id)
+        .values(last_message_at=now)
+    )
+    await db.execute(
+        update(members)
+        .where(
+            members.c.conversation_id == conversation_id,
+            members.c.user_id == recipient_id,
+        )
+        .values(unread_count=members.c.unread_count + 1)
+    )
+    return message_id
+
+
+async def mark_read(db, conversation_id: int, user_id: int) -> Optional[datetime]:
+    """Clear the user's unread count; returns the read time if anything was unread."""
+    members = models.ConversationMember.__table__
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(members)
+        .where(
+            members.c.conversation_id == conversation_id,
+            members.c.user_id == user_id,
+            members.c.unread_count != 0,
+        )
+        .values(unread_count=0, last_read_at=now)
+    )
+    return now if result.rowcount else None
+
+
+async def _total_unread(db, user_ids: Iterable[int]) -> dict[int, int]:
+    members = models.ConversationMember.__table__
+    user_ids = set(user_ids)
+    totals = dict.fromkeys(user_ids, 0)
+    rows = await db.execute(
+        select(members.c.user_id, func.sum(members.c.unread_count))
+        .where(members.c.user_id.in_(user_ids))
+        .group_by(members.c.user_id)
+    )
+    for user_id, total in rows:
+        totals[user_id] = total or 0
+    return totals
+
+
+async def _message_events(
+    db, rows, audience: Optional[int] = None
+) -> list[tuple[int, dict[str, Any]]]:
+    """``(user_id, event)`` for each message and each participant (or just ``audience``)."""
+    if not rows:
+        return []
+    users = models.User.__table__
+    members = models.ConversationMember.__table__
+    user_ids = {row.sender_id for row in rows} | {row.recipient_id for row in rows}
+    people = {
+        row.id: UserPublic.from_orm(row)
+        for row in await db.execute(select(users).where(users.c.id.in_(user_ids)))
+    }
+    unread = {
+        (row.conversation_id, row.user_id): row.unread_count
+        for row in await db.execute(
+            select(members.c.conversation_id, members.c.user_id, members.c.unread_count).where(
+                members.c.conversation_id.in_({row.conversation_id for row in rows}),
+                members.c.user_id.in_(user_ids),
+            )
+        )
+    }
+    totals = await _total_unread(db, user_ids if audience is None else [audience])
+    events = []
+    for row in rows:
+        message = MessagePublic(
+            id=row.id,
+            body=row.body,
+            created_at=row.created_at,
+            auction_id=row.auction_id,
+            conversation_id=row.conversation_id,
+            sender=people[row.sender_id],
+            recipient=people[row.recipient_id],
+        ).dict()
+        for user_id in sorted({row.sender_id, row.recipient_id}):
+            if audience is not None and user_id != audience:
+                continue
+            events.append(
+                (
+                    user_id,
+                    {
+                        "type": "message",
+                        "message": message,
+                        "unread_count": unread.get((row.conversation_id, user_id), 0),
+                        "total_unread": totals[user_id],
+                    },
+                )
+            )
+    return events
+
+
+async def announce(db, message_ids: Iterable[int]) -> None:
+    """Push committed messages, with fresh unread counts, to both participants."""
+    messages = models.Message.__table__
+    rows = (
+        await db.execute(
+            select(messages).where(messages.c.id.in_(set(message_ids))).order_by(messages.c.id)
+        )
+    ).all()
+    if not any(
+        hub.listening(user_topic(user_id))
+        for row in rows
+        for user_id in (row.sender_id, row.recipient_id)
+    ):
+        return
+    for user_id, event in await _message_events(db, rows):
+        hub.publish(user_topic(user_id), event)
+
+
+async def missed_events(
+    db, user_id: int, last_seen_id: int
+) -> Optional[list[dict[str, Any]]]:
+    """Message events after ``last_seen_id``, or None if too many to replay."""
+    messages = models.Message.__table__
+    rows = (
+        await db.execute(
+            select(messages)
+            .where(
+                messages.c.id > last_seen_id,
+                or_(messages.c.sender_id == user_id, messages.c.recipient_id == user_id),
+            )
+            .order_by(messages.c.id)
+            .limit(RESUME_LIMIT + 1)
+        )
+    ).all()
+    if len(rows) > RESUME_LIMIT:
+        return None
+    return [event for _, event in await _message_events(db, rows, audience=user_id)]
+
+
+async def announce_read(
+    db, conversation_id: int, user_id: int, read_at: datetime
+) -> None:
+    """Tell the reader's other sessions and the counterpart that a thread was read."""
+    conversations = models.Conversation.__table__
+    conversation = (
+        await db.execute(
+            select(
+                conversations.c.user_low_id,
+                conversations.c.user_high_id,
+                conversations.c.last_message_id,
+            ).where(conversations.c.id == conversation_id)
+        )
+    ).one()
+    receipt = {
+        "type": "read",
+        "conversation_id": conversation_id,
+        "user_id": user_id,
+        "read_at": read_at,
+        "last_message_id": conversation.last_message_id,
+    }
+    if hub.listening(user_topic(user_id)):
+        totals = await _total_unread(db, [user_id])
+        hub.publish(
+            user_topic(user_id), {**receipt, "unread_count": 0, "total_unread": totals[user_id]}
+        )
+    for member_id in {conversation.user_low_id, conversation.user_high_id} - {user_id}:
+        hub.publish(user_topic(member_id), receipt)
+
+
+async def inbox_state(db, user_id: int) -> dict[str, Any]:
+    """Total unread and the newest message id, sent when a client connects."""
+    members = models.ConversationMember.__table__
+    conversations = models.Conversation.__table__
+    row = (
+        await db.execute(
+            select(
+                func.coalesce(func.sum(members.c.unread_count), 0),
+                func.max(conversations.c.last_message_id),
+            )
+            .select_from(members)
+            .join(conversations, conversations.c.id == members.c.conversation_id)
+            .where(members.c.user_id == user_id)
+        )
+    ).one()
+    return {"type": "snapshot", "total_unread": row[0], "last_message_id": row[1]}
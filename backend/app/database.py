@@ -1,40 +1,93 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
-from sqlalchemy import create_engine, text
-from sqlalchemy import inspect as sa_inspect
-from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-DATABASE_URL = "sqlite:///./auction.db"
+from .config import get_settings
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+settings = get_settings()
+DATABASE_URL = settings.database_url
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.get_driver_name() == driver:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(
+        hide_password=False
+    )
+
+
+ASYNC_DATABASE_URL = settings.async_database_url or _async_url(DATABASE_URL)
+
+
+def _engine_options(url: str) -> dict:
+    parsed = make_url(url)
+    options: dict = {"echo": settings.db_echo, "pool_pre_ping": True}
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        }
+        if parsed.database in (None, "", ":memory:"):
+            return options
+        if parsed.get_driver_name() == "aiosqlite":
+            # aiosqlite defaults to NullPool, which would reopen the file and
+            # replay the pragmas on every checkout.
+            options["poolclass"] = AsyncAdaptedQueuePool
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL lets catalog reads proceed while a bid transaction is writing.
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
-Base = declarative_base()
 
+def _register_sqlite_functions(dbapi_connection, connection_record) -> None:
+    # Imported here: app.geo depends on the models, which depend on this module.
+    from .geo import distance_miles
 
-def ensure_sqlite_schema() -> None:
-    inspector = sa_inspect(engine)
-    with engine.connect() as connection:
-        try:
-            user_columns = {column["name"] for column in inspector.get_columns("users")}
-        except NoSuchTableError:
-            return
-        if "location" not in user_columns:
-            connection.execute(text("ALTER TABLE users ADD COLUMN location VARCHAR"))
-        if "phone" not in user_columns:
-            connection.execute(text("ALTER TABLE users ADD COLUMN phone VARCHAR"))
-        if "avatar_url" not in user_columns:
-            connection.execute(text("ALTER TABLE users ADD COLUMN avatar_url VARCHAR"))
+    dbapi_connection.create_function("distance_miles", 4, distance_miles, deterministic=True)
 
-        auction_columns = {column["name"] for column in inspector.get_columns("auctions")}
-        if "location" not in auction_columns:
-            connection.execute(text("ALTER TABLE auctions ADD COLUMN location VARCHAR"))
+
+def _configure(sync_engine: Engine) -> None:
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+        event.listen(sync_engine, "connect", _register_sqlite_functions)
+
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_configure(engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+_configure(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+Base = declarative_base()
 
 
 @contextmanager
@@ -57,3 +110,8 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
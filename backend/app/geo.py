@@ -0,0 +1,256 @@
+"""Coordinates, offline postal-code geocoding and "near me" filters.
+
+Auctions carry a latitude and longitude, taken from the request or looked up
+by postal code in the ``postal_codes`` table. That table is filled from
+GeoNames postal-code dumps (tab-separated, one file per country): US ZIP codes
+and Canadian forward sortation areas (the first three characters of a postal
+code). A small seed of city-centre codes ships in ``app/data``; load the full
+dumps with ``python -m app.manage load-postal-codes``.
+
+Radius queries first narrow to the circle's bounding box through a spatial
+index, then compare great-circle distances. On SQLite the box is an R*Tree
+lookup kept current by triggers. Elsewhere the box is a range scan on
+latitude and longitude.
+"""
+from __future__ import annotations
+
+import csv
+import math
+import re
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import and_, column, delete, func, insert, select, table, text
+from sqlalchemy.engine import Connection
+
+from . import models
+
+EARTH_RADIUS_MILES = 3958.8
+BUNDLED_POSTAL_CODES = Path(__file__).resolve().parent / "data" / "postal_codes.txt"
+LOAD_BATCH = 1000
+
+_US_ZIP = r"(\d{5})(?:-\d{4})?"
+_CA_POSTAL = r"([ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z])(?:\s?\d[ABCEGHJ-NPRSTV-Z]\d)?"
+_CA_FULL = r"([ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z])\s?\d[ABCEGHJ-NPRSTV-Z]\d"
+_US_STATES = (
+    "AL|AK|AZ|AR|CA|CO|CT|DE|DC|FL|GA|HI|ID|IL|IN|IA|KS|KY|LA|ME|MD|MA|MI|MN|MS|MO|MT|"
+    "NE|NV|NH|NJ|NM|NY|NC|ND|OH|OK|OR|PA|RI|SC|SD|TN|TX|UT|VT|VA|WA|WV|WI|WY|PR|VI|GU"
+)
+_CA_PROVINCES = "AB|BC|MB|NB|NL|NS|NT|NU|ON|PE|QC|SK|YT"
+# Tried in order; within a pattern the last match wins, since addresses end
+# with the postal code and start with a street number.
+_POSTAL_PATTERNS = [
+    ("US", re.compile(rf"\b(?:{_US_STATES})\.?,?\s+{_US_ZIP}\b")),
+    ("CA", re.compile(rf"\b(?:{_CA_PROVINCES})\.?,?\s+{_CA_POSTAL}\b", re.IGNORECASE)),
+    # A full Canadian code (A1A 1A1) is distinctive enough on its own.
+    ("CA", re.compile(rf"\b{_CA_FULL}\b", re.IGNORECASE)),
+    # A bare number only where an address ends, never as the street number.
+    ("US", re.compile(rf"(?<=\S)[\s,]+{_US_ZIP}(?:,?\s*(?:USA?|United States))?$")),
+]
+
+locations = table(
+    "auction_locations",
+    column("id"),
+    column("min_lat"),
+    column("max_lat"),
+    column("min_lon"),
+    column("max_lon"),
+)
+
+
+class Point(NamedTuple):
+    latitude: float
+    longitude: float
+
+
+class Box(NamedTuple):
+    south: float
+    west: float
+    north: float
+    east: float
+
+
+def distance_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
+    """Great-circle distance by the haversine formula."""
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = math.radians(lat2 - lat1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(origin: Point, radius_miles: float) -> Box:
+    """The smallest latitude/longitude box holding the circle around ``origin``."""
+    dlat = math.degrees(radius_miles / EARTH_RADIUS_MILES)
+    cos_lat = math.cos(math.radians(origin.latitude))
+    # Near the poles the circle spans every longitude.
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    return Box(
+        max(-90.0, origin.latitude - dlat),
+        max(-180.0, origin.longitude - dlon),
+        min(90.0, origin.latitude + dlat),
+        min(180.0, origin.longitude + dlon),
+    )
+
+
+def find_postal_code(value: Optional[str]) -> Optional[tuple[str, str]]:
+    """The ``(country, code)`` of the US ZIP or Canadian postal code in ``value``.
+
+    ``value`` may be just the code or an address ending in one. A number that
+    starts an address is its street number, not a ZIP.
+    """
+    if not value:
+        return None
+    text = value.strip()
+    if re.fullmatch(_US_ZIP, text):
+        return "US", text[:5]
+    match = re.fullmatch(_CA_POSTAL, text, re.IGNORECASE)
+    if match:
+        return "CA", match.group(1).upper()
+    for country, pattern in _POSTAL_PATTERNS:
+        matches = list(pattern.finditer(text))
+        if matches:
+            return country, matches[-1].group(1).upper()
+    return None
+
+
+def not_geocoded(postal_code: str) -> str:
+    """Why a listing with ``postal_code`` was saved without coordinates."""
+    return (
+        f"Postal code {postal_code} is not in the geocoding table; "
+        "saved without coordinates, so distance searches will not find it"
+    )
+
+
+def _lookup(key: tuple[str, str]):
+    postal_codes = models.PostalCode.__table__
+    return select(postal_codes.c.latitude, postal_codes.c.longitude).where(
+        postal_codes.c.country == key[0], postal_codes.c.code == key[1]
+    )
+
+
+async def geocode(db, value: Optional[str]) -> Optional[Point]:
+    key = find_postal_code(value)
+    if key is None:
+        return None
+    row = (await db.execute(_lookup(key))).one_or_none()
+    return Point(*row) if row else None
+
+
+def geocode_sync(db, value: Optional[str]) -> Optional[Point]:
+    key = find_postal_code(value)
+    if key is None:
+        return None
+    row = db.execute(_lookup(key)).one_or_none()
+    return Point(*row) if row else None
+
+
+def route_miles(db, origin: Optional[str], destination: Optional[str]) -> Optional[float]:
+    """Straight-line miles between the postal codes in two addresses, if both are known."""
+    start, end = geocode_sync(db, origin), geocode_sync(db, destination)
+    if start is None or end is None:
+        return None
+    return round(distance_miles(*start, *end), 1)
+
+
+def read_geonames(path: Path) -> Iterable[dict]:
+    """Rows of a GeoNames postal-code dump (``US.txt``, ``CA.txt``, ...)."""
+    with path.open(newline="", encoding="utf-8") as handle:
+        for fields in csv.reader(handle, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(fields) < 11 or not fields[9] or not fields[10]:
+                continue
+            country, code = fields[0], fields[1].replace(" ", "").upper()
+            yield {
+                "country": country,
+                # Canadian codes are looked up by forward sortation area.
+                "code": code[:3] if country == "CA" else code,
+                "place": fields[2] or None,
+                "region": fields[4] or fields[3] or None,
+                "latitude": float(fields[9]),
+                "longitude": float(fields[10]),
+            }
+
+
+def load_postal_codes(connection: Connection, path: Path) -> int:
+    """Replace the codes of every country in ``path`` with its rows."""
+    postal_codes = models.PostalCode.__table__
+    rows = {(row["country"], row["code"]): row for row in read_geonames(path)}
+    countries = {country for country, _ in rows}
+    if countries:
+        connection.execute(delete(postal_codes).where(postal_codes.c.country.in_(countries)))
+    batch = list(rows.values())
+    for start in range(0, len(batch), LOAD_BATCH):
+        connection.execute(insert(postal_codes), batch[start:start + LOAD_BATCH])
+    return len(batch)
+
+
+def install_spatial_index(connection: Connection) -> None:
+    """Create the SQLite R*Tree over auction coordinates and fill it."""
+    statements = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS auction_locations
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)""",
+        """CREATE TRIGGER IF NOT EXISTS auction_locations_insert
+            AFTER INSERT ON auctions
+            WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+            INSERT INTO auction_locations
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS auction_locations_update
+            AFTER UPDATE OF latitude, longitude ON auctions BEGIN
+            DELETE FROM auction_locations WHERE id = old.id;
+            INSERT INTO auction_locations
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS auction_locations_delete
+            AFTER DELETE ON auctions BEGIN
+            DELETE FROM auction_locations WHERE id = old.id;
+        END""",
+        "DELETE FROM auction_locations",
+        """INSERT INTO auction_locations
+            SELECT id, latitude, latitude, longitude, longitude FROM auctions
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def within_box(box: Box, dialect: str):
+    """A filter on ``auctions`` for coordinates inside ``box``."""
+    auction = models.Auction
+    condition = and_(
+        auction.latitude.between(box.south, box.north),
+        auction.longitude.between(box.west, box.east),
+    )
+    if dialect == "sqlite":
+        # The R*Tree finds the candidates; it stores 32-bit floats rounded
+        # outwards, so the column comparison above trims the edges.
+        candidates = select(locations.c.id).where(
+            locations.c.max_lat >= box.south,
+            locations.c.min_lat <= box.north,
+            locations.c.max_lon >= box.west,
+            locations.c.min_lon <= box.east,
+        )
+        condition = and_(auction.id.in_(candidates), condition)
+    return condition
+
+
+def distance_expression(origin: Point, dialect: str):
+    """SQL for the distance in miles from ``origin`` to each auction."""
+    auction = models.Auction
+    if dialect == "sqlite":
+        # Registered on every connection in app.database; SQLite builds do not
+        # reliably include the math functions.
+        return func.distance_miles(
+            auction.latitude, auction.longitude, origin.latitude, origin.longitude
+        )
+    phi1 = math.radians(origin.latitude)
+    phi2 = func.radians(auction.latitude)
+    half_dphi = (func.radians(auction.latitude) - phi1) / 2
+    half_dlambda = (func.radians(auction.longitude) - math.radians(origin.longitude)) / 2
+    a = func.power(func.sin(half_dphi), 2) + math.cos(phi1) * func.cos(phi2) * func.power(
+        func.sin(half_dlambda), 2
+    )
+    return 2 * EARTH_RADIUS_MILES * func.asin(func.least(1.0, func.sqrt(a)))
@@ -0,0 +1,112 @@
+"""Web renditions for uploaded photos.
+
+Phone photos arrive as multi-megabyte JPEGs with EXIF (GPS included). Each
+upload is normalized in a process pool: orientation is applied, metadata is
+stripped from the stored original, and WebP renditions are written beside it
+as ``<name>.<rendition>.webp``.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps
+
+from .config import get_settings
+
+settings = get_settings()
+
+# Longest edge in pixels.
+RENDITIONS = {"thumb": 400, "medium": 1280}
+WEBP_QUALITY = 80
+# Formats whose originals are re-encoded to drop EXIF and other metadata.
+REENCODED_FORMATS = {
+    "JPEG": {"quality": 92, "optimize": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 90},
+}
+
+_executor: Optional[Executor] = None
+
+
+class ImageError(ValueError):
+    """The file is not an image Pillow can read, or could not be rendered."""
+
+
+class ProcessedImage(NamedTuple):
+    width: int
+    height: int
+    # Rendition name -> path of the written WebP file.
+    renditions: dict[str, str]
+
+
+def rendition_path(source: Path, name: str) -> Path:
+    return source.with_name(f"{source.stem}.{name}.webp")
+
+
+def is_rendition(path: Path) -> bool:
+    return any(path.name.endswith(f".{name}.webp") for name in RENDITIONS)
+
+
+def process_file(path: str, strip: bool = True) -> ProcessedImage:
+    """Strip metadata from ``path`` in place and write its renditions.
+
+    With ``strip`` false the file itself is left byte for byte as it is.
+
+    Any failure, including truncated pixel data found only while decoding and
+    decompression bombs, raises ``ImageError`` after removing partial output.
+    """
+    source = Path(path)
+    try:
+        return _process(source, strip)
+    except Exception as exc:
+        source.with_name(f".{source.name}.tmp").unlink(missing_ok=True)
+        for name in RENDITIONS:
+            rendition_path(source, name).unlink(missing_ok=True)
+        raise ImageError(f"{source.name} is not a readable image") from exc
+
+
+def _process(source: Path, strip: bool) -> ProcessedImage:
+    with Image.open(source) as image:
+        original_format = image.format
+        animated = getattr(image, "is_animated", False)
+        upright = ImageOps.exif_transpose(image)
+
+    if strip and original_format in REENCODED_FORMATS and not animated:
+        # Written to a temporary name first so readers never see half a file.
+        stripped = source.with_name(f".{source.name}.tmp")
+        upright.save(stripped, format=original_format, **REENCODED_FORMATS[original_format])
+        os.replace(stripped, source)
+
+    mode = "RGBA" if "A" in upright.getbands() else "RGB"
+    renditions = {}
+    for name, edge in RENDITIONS.items():
+        rendition = upright.convert(mode)
+        rendition.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        target = rendition_path(source, name)
+        rendition.save(target, format="WEBP", quality=WEBP_QUALITY, method=4)
+        renditions[name] = str(target)
+    return ProcessedImage(upright.width, upright.height, renditions)
+
+
+def executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.image_workers)
+    return _executor
+
+
+async def process(path: Path) -> ProcessedImage:
+    if settings.image_workers <= 0:
+        return await asyncio.to_thread(process_file, str(path))
+    return await asyncio.get_running_loop().run_in_executor(executor(), process_file, str(path))
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
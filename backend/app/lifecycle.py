@@ -0,0 +1,249 @@
+"""Drive auctions through upcoming -> active -> completed as their times pass.
+
+The scheduler keeps a min-heap of the next start or end time per auction and
+sleeps until the earliest one. Each transition is a conditional UPDATE that
+re-checks the clock against the row, so an end_time pushed back by an
+anti-sniping extension simply makes the close a no-op until the new time;
+``watch`` is called with the new end_time so the heap wakes up then. Several
+workers may run a scheduler against one database: only the one whose UPDATE
+matches settles the auction and sends the messages. Auctions written by other
+processes are found by a rescan every ``LIFECYCLE_RESCAN_SECONDS``.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from . import conversations, models
+from .cache import AUCTIONS_NAMESPACE, auction_namespace, response_cache
+from .config import get_settings
+from .database import async_engine
+from .realtime import auction_topic, hub
+
+logger = logging.getLogger(__name__)
+
+UPCOMING = "upcoming"
+ACTIVE = "active"
+COMPLETED = "completed"
+
+
+def status_for(start_time: datetime, end_time: datetime, now: datetime) -> str:
+    """The status an auction should have at ``now``, judged from its times alone."""
+    if now < start_time:
+        return UPCOMING
+    if now >= end_time:
+        return COMPLETED
+    return ACTIVE
+
+
+def initial_status(start_time: datetime, end_time: datetime, now: datetime) -> str:
+    """Status for a newly written auction; closing is always left to the scheduler."""
+    status = status_for(start_time, end_time, now)
+    return ACTIVE if status == COMPLETED else status
+
+
+class LifecycleScheduler:
+    def __init__(self) -> None:
+        self._heap: list[tuple[datetime, int]] = []
+        # Latest due time per auction; heap entries that disagree are stale.
+        self._due: dict[int, datetime] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(
+        self, auction_id: int, status: str, start_time: datetime, end_time: datetime
+    ) -> None:
+        """(Re)schedule the next transition for an auction whose times changed."""
+        if status == COMPLETED:
+            self.forget(auction_id)
+            return
+        due = start_time if status == UPCOMING else end_time
+        if self._due.get(auction_id) == due:
+            return
+        self._due[auction_id] = due
+        heapq.heappush(self._heap, (due, auction_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def forget(self, auction_id: int) -> None:
+        self._due.pop(auction_id, None)
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        await self._load(models.Auction.status != COMPLETED)
+        self._task = asyncio.create_task(self._run())
+
+    async def _load(self, condition) -> None:
+        auction = models.Auction
+        async with async_engine.connect() as connection:
+            rows = await connection.execute(
+                select(auction.id, auction.status, auction.start_time, auction.end_time).where(
+                    condition
+                )
+            )
+            for auction_id, status, start_time, end_time in rows:
+                self.watch(auction_id, status, start_time, end_time)
+
+    async def _rescan(self, horizon: datetime) -> None:
+        """Watch unfinished auctions whose next transition is due by ``horizon``."""
+        auction = models.Auction
+        await self._load(
+            or_(
+                and_(auction.status == UPCOMING, auction.start_time <= horizon),
+                and_(auction.status == ACTIVE, auction.end_time <= horizon),
+            )
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+
+    async def _run(self) -> None:
+        interval = timedelta(seconds=get_settings().lifecycle_rescan_seconds)
+        next_rescan = datetime.utcnow() + interval
+        while True:
+            self._wakeup.clear()
+            now = datetime.utcnow()
+            if now >= next_rescan:
+                next_rescan = now + interval
+                try:
+                    await self._rescan(next_rescan)
+                except Exception:
+                    logger.exception("Lifecycle rescan failed")
+            due_ids = []
+            while self._heap and self._heap[0][0] <= now:
+                due, auction_id = heapq.heappop(self._heap)
+                if self._due.get(auction_id) == due:
+                    del self._due[auction_id]
+                    due_ids.append(auction_id)
+            for auction_id in due_ids:
+                try:
+                    await self._advance(auction_id)
+                except Exception:
+                    logger.exception("Lifecycle transition failed for auction %s", auction_id)
+            if due_ids:
+                continue
+            wake_at = min(self._heap[0][0], next_rescan) if self._heap else next_rescan
+            timeout = (wake_at - now).total_seconds()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _advance(self, auction_id: int) -> None:
+        auctions = models.Auction.__table__
+        now = datetime.utcnow()
+        delivered: list[int] = []
+        async with async_engine.begin() as connection:
+            row = (
+                await connection.execute(
+                    select(
+                        auctions.c.status, auctions.c.start_time, auctions.c.end_time
+                    ).where(auctions.c.id == auction_id)
+                )
+            ).one_or_none()
+            if row is None or row.status == COMPLETED:
+                return
+            target = status_for(row.start_time, row.end_time, now)
+            event = {"type": "status", "auction_id": auction_id, "status": target}
+            if target == COMPLETED:
+                closed = await _close(connection, auction_id, now, delivered)
+                if closed is None:
+                    return
+                event.update(closed)
+            elif target != row.status:
+                await connection.execute(
+                    update(auctions)
+                    .where(auctions.c.id == auction_id, auctions.c.status == row.status)
+                    .values(status=target)
+                )
+        if target != COMPLETED:
+            # Not finished yet (or extended meanwhile): wait for the next edge.
+            self.watch(auction_id, target, row.start_time, row.end_time)
+            if target == row.status:
+                return
+        await response_cache.invalidate(AUCTIONS_NAMESPACE, auction_namespace(auction_id))
+        hub.publish(auction_topic(auction_id), event)
+        if delivered:
+            async with async_engine.connect() as connection:
+                await conversations.announce(connection, delivered)
+
+
+async def _close(
+    connection, auction_id: int, now: datetime, delivered: list[int]
+) -> Optional[dict]:
+    """Settle an ended auction and message the seller and winner.
+
+    The new message ids are appended to ``delivered``, to be announced once
+    the transaction commits.
+    """
+    auctions = models.Auction.__table__
+    bids = models.Bid.__table__
+    result = await connection.execute(
+        update(auctions)
+        .where(
+            auctions.c.id == auction_id,
+            auctions.c.status != COMPLETED,
+            auctions.c.end_time <= now,
+        )
+        .values(status=COMPLETED, closed_at=now)
+        .returning(auctions.c.title, auctions.c.owner_id)
+    )
+    closed = result.one_or_none()
+    if closed is None:
+        # Another worker closed it first, or a late bid extended it.
+        return None
+    # Read only after the guarded UPDATE holds the row: a bid that passed its
+    # own check before end_time has committed by now and must be counted,
+    # and no later bid can be accepted against a completed auction.
+    winner = (
+        await connection.execute(
+            select(bids.c.id, bids.c.bidder_id, bids.c.amount)
+            .where(bids.c.auction_id == auction_id)
+            .order_by(bids.c.amount.desc(), bids.c.id)
+            .limit(1)
+        )
+    ).one_or_none()
+    if winner is not None:
+        await connection.execute(
+            update(auctions).where(auctions.c.id == auction_id).values(winning_bid_id=winner.id)
+        )
+
+    if winner is None:
+        notes = [
+            (closed.owner_id, f'"{closed.title}" closed without any bids.'),
+        ]
+    else:
+        notes = [
+            (winner.bidder_id, f'You won "{closed.title}" with a bid of ${winner.amount:,.2f}.'),
+            (closed.owner_id, f'"{closed.title}" sold for ${winner.amount:,.2f}.'),
+        ]
+    for recipient_id, body in notes:
+        message_id = await conversations.deliver(
+            connection,
+            sender_id=closed.owner_id,
+            recipient_id=recipient_id,
+            body=body,
+            auction_id=auction_id,
+            now=now,
+        )
+        delivered.append(message_id)
+    return {
+        "closed_at": now,
+        "winning_bid_id": winner.id if winner else None,
+        "winning_amount": winner.amount if winner else None,
+    }
+
+
+scheduler = LifecycleScheduler()
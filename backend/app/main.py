@@ -1,13 +1,16 @@
 from __future__ import annotations
 
-from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from . import models
-from .database import Base, SessionLocal, engine, ensure_sqlite_schema
+from . import imaging, lifecycle, migrations, passwords
+from .blobs import UploadSizeLimit
+from .cache import response_cache
+from .config import get_settings
+from .database import engine
 from .routers import (
     auctions,
     auth,
@@ -19,68 +22,24 @@ from .routers import (
     subscriptions,
     users,
 )
+from .serving import MediaFiles, PresignedMedia
+from .storage import LocalStorage, media_storage
 
-Base.metadata.create_all(bind=engine)
-ensure_sqlite_schema()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Migrations run out of band (python -m app.migrations upgrade); workers
+    # only refuse to start against a schema older than the code.
+    migrations.ensure_current(engine)
+    if get_settings().lifecycle_scheduler_enabled:
+        await lifecycle.scheduler.start()
+    yield
+    await lifecycle.scheduler.stop()
+    passwords.shutdown()
+    imaging.shutdown()
 
-DEFAULT_CATEGORIES = [
-    {
-        "name": "Excavators",
-        "slug": "excavators",
-        "description": "Crawler, wheeled, and mini excavators for utility and heavy civil jobs.",
-    },
-    {
-        "name": "Dozers",
-        "slug": "dozers",
-        "description": "Finish and heavy dozers with GPS-ready grade control packages.",
-    },
-    {
-        "name": "Wheel Loaders",
-        "slug": "wheel-loaders",
-        "description": "Tool carriers and high-lift loaders for aggregates and yard work.",
-    },
-    {
-        "name": "Skid Steers",
-        "slug": "skid-steers",
-        "description": "Vertical and radial lift skid steers plus attachments.",
-    },
-    {
-        "name": "Agriculture",
-        "slug": "agriculture",
-        "description": "Combines, planters, sprayers, and specialty ag equipment.",
-    },
-    {
-        "name": "Trucks & Trailers",
-        "slug": "trucks-trailers",
-        "description": "Lowboys, dump trucks, and vocational tractors ready to haul.",
-    },
-    {
-        "name": "Crushing & Screening",
-        "slug": "crushing-screening",
-        "description": "Jaw, cone, and impact crushers with matching screen plants.",
-    },
-]
 
-
-def seed_default_categories() -> None:
-    with SessionLocal() as session:
-        existing = {
-            category.slug: category
-            for category in session.query(models.Category).all()
-        }
-        created = False
-        for payload in DEFAULT_CATEGORIES:
-            if payload["slug"] not in existing:
-                session.add(models.Category(**payload))
-                created = True
-        if created:
-            session.commit()
-
-
-seed_default_categories()
-
-app = FastAPI(title="FES Auction Platform")
+app = FastAPI(title="FES Auction Platform", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -89,6 +48,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadSizeLimit)
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -100,11 +60,17 @@ app.include_router(services.router)
 app.include_router(subscriptions.router)
 app.include_router(contact.router)
 
-upload_root = Path(__file__).resolve().parent / "uploads"
-upload_root.mkdir(parents=True, exist_ok=True)
-app.mount("/media", StaticFiles(directory=upload_root), name="media")
+if isinstance(media_storage, LocalStorage):
+    app.mount("/media", MediaFiles(directory=media_storage.root), name="media")
+else:
+    app.mount("/media", PresignedMedia(media_storage), name="media")
 
 
 @app.get("/health")
 def health_check() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@app.get("/health/cache")
+def cache_stats() -> dict:
+    return response_cache.stats()
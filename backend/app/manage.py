@@ -0,0 +1,244 @@
+"""Operational commands: ``python -m app.manage <command>``."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import mimetypes
+import secrets
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path, PurePosixPath
+
+from sqlalchemy import delete, select, update
+
+from . import bidding, blobs, bulk, geo, imaging, models, search
+from .config import get_settings
+from .database import AsyncSessionLocal, engine
+from .storage import IMMUTABLE_PREFIX, key_for, media_storage
+
+REPROCESS_BATCH = 32
+READ_CHUNK = 64 * 1024
+
+
+def repair_aggregates(args: argparse.Namespace) -> None:
+    with engine.begin() as connection:
+        count = bidding.recompute_aggregates(connection, args.auction)
+    print(f"recomputed aggregates for {count} auction(s)")
+
+
+def reprocess_media(args: argparse.Namespace) -> None:
+    stored = list(media_storage.keys())
+    keys = [key for key in stored if not imaging.is_rendition(PurePosixPath(key))]
+    if args.missing:
+        present = set(stored)
+        keys = [
+            key
+            for key in keys
+            if not all(blobs.rendition_key(key, name) in present for name in imaging.RENDITIONS)
+        ]
+    media_files = models.MediaFile.__table__
+    auction_images = models.AuctionImage.__table__
+    processed_count = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Originals are fetched to scratch space a batch at a time, so an
+        # object store is never mirrored to local disk all at once.
+        for start in range(0, len(keys), REPROCESS_BATCH):
+            batch = keys[start : start + REPROCESS_BATCH]
+            paths = [
+                blobs.incoming_dir() / f"{secrets.token_hex(8)}{PurePosixPath(key).suffix}"
+                for key in batch
+            ]
+            for key, path in zip(batch, paths):
+                media_storage.fetch(key, path)
+            # Blobs are served as immutable under their digest, so their originals
+            # are never rewritten; only the renditions and metadata are redone.
+            futures = [
+                pool.submit(imaging.process_file, str(path), not key.startswith(IMMUTABLE_PREFIX))
+                for key, path in zip(batch, paths)
+            ]
+            for key, path, future in zip(batch, paths, futures):
+                try:
+                    processed = future.result()
+                except imaging.ImageError as exc:
+                    print(f"skipped {key}: {exc}")
+                    blobs.discard_local(path)
+                    failed += 1
+                    continue
+                content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+                values = blobs.media_file_values(key, path, content_type, processed)
+                if key.startswith(IMMUTABLE_PREFIX):
+                    blobs.publish_renditions(key, processed)
+                    blobs.discard_local(path)
+                else:
+                    blobs.publish(key, path, content_type, processed)
+                with engine.begin() as connection:
+                    existing = connection.execute(
+                        select(media_files.c.id).where(media_files.c.url == values["url"])
+                    ).scalar()
+                    if existing is None:
+                        connection.execute(media_files.insert().values(**values))
+                    else:
+                        connection.execute(
+                            media_files.update().where(media_files.c.id == existing).values(**values)
+                        )
+                    connection.execute(
+                        update(auction_images)
+                        .where(auction_images.c.url == values["url"])
+                        .values(
+                            width=values["width"],
+                            height=values["height"],
+                            thumbnail_url=values["thumbnail_url"],
+                            medium_url=values["medium_url"],
+                        )
+                    )
+                processed_count += 1
+    print(f"processed {processed_count} file(s), skipped {failed}")
+
+
+def gc_media(args: argparse.Namespace) -> None:
+    """Delete uploads nothing references once they are older than the grace period."""
+    cutoff = datetime.utcnow() - timedelta(hours=args.grace_hours)
+    media_files = models.MediaFile.__table__
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(media_files.c.id, media_files.c.url).where(
+                media_files.c.ref_count <= 0, media_files.c.created_at < cutoff
+            )
+        ).all()
+        for row in rows:
+            blobs.discard(key_for(row.url))
+        if rows:
+            connection.execute(
+                delete(media_files).where(media_files.c.id.in_([row.id for row in rows]))
+            )
+    print(f"deleted {len(rows)} unreferenced upload(s)")
+
+
+def reindex_search(args: argparse.Namespace) -> None:
+    index = search.index_for(engine.dialect.name)
+    if index is None:
+        raise SystemExit(f"search is not supported on {engine.dialect.name}")
+    with engine.begin() as connection:
+        index.rebuild(connection)
+    print("rebuilt the auction search index")
+
+
+def load_postal_codes(args: argparse.Namespace) -> None:
+    with engine.begin() as connection:
+        for path in args.files:
+            count = geo.load_postal_codes(connection, path)
+            print(f"loaded {count} postal code(s) from {path}")
+
+
+async def _file_chunks(path: Path):
+    with path.open("rb") as handle:
+        while chunk := handle.read(READ_CHUNK):
+            yield chunk
+
+
+def import_auctions(args: argparse.Namespace) -> None:
+    fmt = args.format or bulk.format_for(args.file.suffix)
+    if fmt is None:
+        raise SystemExit("pass --format csv or --format ndjson")
+    with engine.connect() as connection:
+        owner_id = connection.execute(
+            select(models.User.id).where(
+                models.User.email == args.owner, models.User.is_admin.is_(True)
+            )
+        ).scalar()
+    if owner_id is None:
+        raise SystemExit(f"no admin account with email {args.owner}")
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await bulk.import_auctions(
+                db, _file_chunks(args.file), fmt, owner_id, args.batch_size
+            )
+
+    report = asyncio.run(run())
+    for warning in report.warnings:
+        print(f"line {warning.line}: {warning.message}", file=sys.stderr)
+    for error in report.errors:
+        print(f"line {error.line}: {'; '.join(error.errors)}", file=sys.stderr)
+    print(f"created {report.created} auction(s), {report.failed} row(s) failed")
+
+
+def export_auctions(args: argparse.Namespace) -> None:
+    async def run(out):
+        async with AsyncSessionLocal() as db:
+            async for chunk in bulk.export_auctions(db, args.format, args.status):
+                out.write(chunk)
+
+    if args.output is None:
+        asyncio.run(run(sys.stdout))
+        return
+    with args.output.open("w", encoding="utf-8", newline="") as out:
+        asyncio.run(run(out))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    repair = commands.add_parser(
+        "repair-aggregates", help="recompute auction bid aggregates from bid history"
+    )
+    repair.add_argument("--auction", type=int, default=None, help="only this auction id")
+    repair.set_defaults(handler=repair_aggregates)
+
+    reprocess = commands.add_parser(
+        "reprocess-media", help="regenerate renditions and metadata for uploaded images"
+    )
+    reprocess.add_argument(
+        "--missing", action="store_true", help="only files without every rendition"
+    )
+    reprocess.add_argument("--workers", type=int, default=None, help="processes to use")
+    reprocess.set_defaults(handler=reprocess_media)
+
+    gc = commands.add_parser("gc-media", help="delete uploads no listing or profile uses")
+    gc.add_argument(
+        "--grace-hours",
+        type=int,
+        default=24,
+        help="keep unreferenced uploads this recent (they may be about to be attached)",
+    )
+    gc.set_defaults(handler=gc_media)
+
+    reindex = commands.add_parser(
+        "reindex-search", help="rebuild the auction search index from the catalog"
+    )
+    reindex.set_defaults(handler=reindex_search)
+
+    postal = commands.add_parser(
+        "load-postal-codes",
+        help="load GeoNames postal-code dumps, replacing each country they cover",
+    )
+    postal.add_argument("files", nargs="+", type=Path, help="e.g. US.txt CA.txt")
+    postal.set_defaults(handler=load_postal_codes)
+
+    importer = commands.add_parser(
+        "import-auctions", help="create auctions from a CSV or NDJSON file"
+    )
+    importer.add_argument("file", type=Path)
+    importer.add_argument("--owner", required=True, help="email of the admin who owns them")
+    importer.add_argument(
+        "--format", choices=bulk.FORMATS, help="defaults to the file extension"
+    )
+    importer.add_argument(
+        "--batch-size", type=int, default=get_settings().bulk_import_batch_size
+    )
+    importer.set_defaults(handler=import_auctions)
+
+    exporter = commands.add_parser("export-auctions", help="write every auction as CSV or NDJSON")
+    exporter.add_argument("--format", choices=bulk.FORMATS, default="csv")
+    exporter.add_argument("--status", choices=("upcoming", "active", "completed"))
+    exporter.add_argument("--output", type=Path, help="defaults to standard output")
+    exporter.set_defaults(handler=export_auctions)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
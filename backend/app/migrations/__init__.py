@@ -0,0 +1,92 @@
+"""Versioned schema migrations.
+
+Scripts live in ``app/migrations/versions`` as ``vNNNN_<name>.py`` and expose
+``upgrade(connection)``. Applied versions are recorded in ``schema_version``.
+Run pending migrations with ``python -m app.migrations upgrade``; the API only
+checks at startup that the database is not behind the code.
+"""
+from __future__ import annotations
+
+import importlib
+import pkgutil
+from datetime import datetime
+from types import ModuleType
+from typing import NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from . import versions
+
+_metadata = MetaData()
+schema_version_table = Table(
+    "schema_version",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    module: ModuleType
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        if not info.name.startswith("v"):
+            continue
+        prefix, _, name = info.name.partition("_")
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        migrations.append(Migration(int(prefix[1:]), name, module))
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+def latest_version() -> int:
+    migrations = load_migrations()
+    return migrations[-1].version if migrations else 0
+
+
+def current_version(engine: Engine) -> int:
+    try:
+        with engine.connect() as connection:
+            return connection.execute(
+                select(func.max(schema_version_table.c.version))
+            ).scalar() or 0
+    except DBAPIError:
+        # No schema_version table yet.
+        return 0
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[Migration]:
+    """Apply pending migrations (up to ``target``), each in its own transaction."""
+    _metadata.create_all(bind=engine)
+    applied = []
+    current = current_version(engine)
+    for migration in load_migrations():
+        if migration.version <= current:
+            continue
+        if target is not None and migration.version > target:
+            break
+        with engine.begin() as connection:
+            migration.module.upgrade(connection)
+            connection.execute(
+                schema_version_table.insert().values(
+                    version=migration.version, applied_at=datetime.utcnow()
+                )
+            )
+        applied.append(migration)
+    return applied
+
+
+def ensure_current(engine: Engine) -> None:
+    current, expected = current_version(engine), latest_version()
+    if current < expected:
+        raise RuntimeError(
+            f"Database schema is at version {current} but the code expects {expected}; "
+            "run `python -m app.migrations upgrade`."
+        )
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import argparse
+
+from ..database import engine
+from . import current_version, latest_version, load_migrations, upgrade
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="stop at this version")
+    commands.add_parser("current", help="show the database schema version")
+    commands.add_parser("history", help="list known migrations")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade(engine, target=args.to)
+        for migration in applied:
+            print(f"applied {migration.version:04d} {migration.name}")
+        print(f"schema at version {current_version(engine)}")
+    elif args.command == "current":
+        print(f"{current_version(engine)} (latest {latest_version()})")
+    elif args.command == "history":
+        current = current_version(engine)
+        for migration in load_migrations():
+            marker = "x" if migration.version <= current else " "
+            print(f"[{marker}] {migration.version:04d} {migration.name}")
+
+
+if __name__ == "__main__":
+    main()
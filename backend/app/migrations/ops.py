@@ -0,0 +1,34 @@
+"""Idempotent schema operations for migration scripts.
+
+Migration 0001 creates missing tables from the current models, so on a
+fresh database later scripts find their columns and indexes already in
+place. Every operation therefore checks before it changes anything.
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+def column_names(connection: Connection, table: str) -> set[str]:
+    return {column["name"] for column in sa_inspect(connection).get_columns(table)}
+
+
+def add_column(connection: Connection, table: str, name: str, ddl: str) -> None:
+    """Add ``name`` to ``table`` unless it exists; ``ddl`` is the type and modifiers."""
+    if name not in column_names(connection, table):
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def create_index(
+    connection: Connection,
+    name: str,
+    table: str,
+    columns: list[str],
+    unique: bool = False,
+) -> None:
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    connection.execute(
+        text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    )
@@ -0,0 +1,16 @@
+"""Create the original tables and patch columns added before migrations existed."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ... import models  # noqa: F401  (registers the tables on Base.metadata)
+from ...database import Base
+from ..ops import add_column
+
+
+def upgrade(connection: Connection) -> None:
+    Base.metadata.create_all(bind=connection)
+    add_column(connection, "users", "location", "VARCHAR")
+    add_column(connection, "users", "phone", "VARCHAR")
+    add_column(connection, "users", "avatar_url", "VARCHAR")
+    add_column(connection, "auctions", "location", "VARCHAR")
@@ -0,0 +1,19 @@
+"""Index the columns the listing, bidding and inbox queries filter on."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ..ops import create_index
+
+
+def upgrade(connection: Connection) -> None:
+    # end_time and start_time are covered as the leading columns of the
+    # composite listing indexes.
+    create_index(connection, "ix_auctions_end_time_id", "auctions", ["end_time", "id"])
+    create_index(
+        connection, "ix_auctions_start_time_end_time", "auctions", ["start_time", "end_time"]
+    )
+    create_index(connection, "ix_auctions_current_price", "auctions", ["current_price"])
+    create_index(connection, "ix_bids_auction_id", "bids", ["auction_id"])
+    create_index(connection, "ix_messages_sender_id", "messages", ["sender_id"])
+    create_index(connection, "ix_messages_recipient_id", "messages", ["recipient_id"])
@@ -0,0 +1,53 @@
+"""Seed the equipment categories the catalog ships with."""
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+
+from ... import models
+
+DEFAULT_CATEGORIES = [
+    {
+        "name": "Excavators",
+        "slug": "excavators",
+        "description": "Crawler, wheeled, and mini excavators for utility and heavy civil jobs.",
+    },
+    {
+        "name": "Dozers",
+        "slug": "dozers",
+        "description": "Finish and heavy dozers with GPS-ready grade control packages.",
+    },
+    {
+        "name": "Wheel Loaders",
+        "slug": "wheel-loaders",
+        "description": "Tool carriers and high-lift loaders for aggregates and yard work.",
+    },
+    {
+        "name": "Skid Steers",
+        "slug": "skid-steers",
+        "description": "Vertical and radial lift skid steers plus attachments.",
+    },
+    {
+        "name": "Agriculture",
+        "slug": "agriculture",
+        "description": "Combines, planters, sprayers, and specialty ag equipment.",
+    },
+    {
+        "name": "Trucks & Trailers",
+        "slug": "trucks-trailers",
+        "description": "Lowboys, dump trucks, and vocational tractors ready to haul.",
+    },
+    {
+        "name": "Crushing & Screening",
+        "slug": "crushing-screening",
+        "description": "Jaw, cone, and impact crushers with matching screen plants.",
+    },
+]
+
+
+def upgrade(connection: Connection) -> None:
+    categories = models.Category.__table__
+    existing = set(connection.execute(select(categories.c.slug)).scalars())
+    missing = [payload for payload in DEFAULT_CATEGORIES if payload["slug"] not in existing]
+    if missing:
+        connection.execute(categories.insert(), missing)
@@ -0,0 +1,15 @@
+"""Denormalize bid_count, high_bidder_id, last_bid_at and version onto auctions."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ...bidding import recompute_aggregates
+from ..ops import add_column
+
+
+def upgrade(connection: Connection) -> None:
+    add_column(connection, "auctions", "bid_count", "INTEGER NOT NULL DEFAULT 0")
+    add_column(connection, "auctions", "high_bidder_id", "INTEGER REFERENCES users(id)")
+    add_column(connection, "auctions", "last_bid_at", "TIMESTAMP")
+    add_column(connection, "auctions", "version", "INTEGER NOT NULL DEFAULT 1")
+    recompute_aggregates(connection)
@@ -0,0 +1,12 @@
+"""Index bids for newest-first history pages per auction."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ..ops import create_index
+
+
+def upgrade(connection: Connection) -> None:
+    create_index(
+        connection, "ix_bids_auction_id_created_at", "bids", ["auction_id", "created_at", "id"]
+    )
@@ -0,0 +1,10 @@
+"""Track a per-user token version carried in access-token claims."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ..ops import add_column
+
+
+def upgrade(connection: Connection) -> None:
+    add_column(connection, "users", "token_version", "INTEGER NOT NULL DEFAULT 0")
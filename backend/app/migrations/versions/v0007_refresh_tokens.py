@@ -0,0 +1,10 @@
+"""Store hashed, rotating refresh tokens."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ... import models
+
+
+def upgrade(connection: Connection) -> None:
+    models.RefreshToken.__table__.create(bind=connection, checkfirst=True)
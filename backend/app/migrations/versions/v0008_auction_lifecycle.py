@@ -0,0 +1,45 @@
+"""Persist auction status, closed_at and winning_bid_id for the lifecycle scheduler."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.engine import Connection
+
+from ... import models
+from ..ops import add_column, create_index
+
+
+def upgrade(connection: Connection) -> None:
+    add_column(connection, "auctions", "status", "VARCHAR(16) NOT NULL DEFAULT 'upcoming'")
+    add_column(connection, "auctions", "closed_at", "TIMESTAMP")
+    add_column(connection, "auctions", "winning_bid_id", "INTEGER REFERENCES bids(id)")
+    create_index(
+        connection, "ix_auctions_status_end_time_id", "auctions", ["status", "end_time", "id"]
+    )
+
+    # Settle what already happened without notifying anyone; the scheduler
+    # only sends messages for auctions it closes itself.
+    auctions = models.Auction.__table__
+    bids = models.Bid.__table__
+    now = datetime.utcnow()
+    top_bid = (
+        select(bids.c.id)
+        .where(bids.c.auction_id == auctions.c.id)
+        .order_by(bids.c.amount.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    connection.execute(
+        update(auctions)
+        .where(auctions.c.end_time <= now, auctions.c.closed_at.is_(None))
+        .values(status="completed", closed_at=auctions.c.end_time, winning_bid_id=top_bid)
+    )
+    connection.execute(
+        update(auctions)
+        .where(and_(auctions.c.start_time <= now, auctions.c.end_time > now))
+        .values(status="active")
+    )
+    connection.execute(
+        update(auctions).where(auctions.c.start_time > now).values(status="upcoming")
+    )
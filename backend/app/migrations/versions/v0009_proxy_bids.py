@@ -0,0 +1,10 @@
+"""Store standing proxy (maximum) bids."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ... import models
+
+
+def upgrade(connection: Connection) -> None:
+    models.ProxyBid.__table__.create(bind=connection, checkfirst=True)
@@ -0,0 +1,15 @@
+"""Record image dimensions and rendition URLs for uploads and gallery images."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ... import models
+from ..ops import add_column
+
+
+def upgrade(connection: Connection) -> None:
+    models.MediaFile.__table__.create(bind=connection, checkfirst=True)
+    add_column(connection, "auction_images", "width", "INTEGER")
+    add_column(connection, "auction_images", "height", "INTEGER")
+    add_column(connection, "auction_images", "thumbnail_url", "VARCHAR")
+    add_column(connection, "auction_images", "medium_url", "VARCHAR")
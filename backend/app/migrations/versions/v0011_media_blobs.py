@@ -0,0 +1,30 @@
+"""Index uploads by content digest and count the rows that reference them.
+
+Files uploaded before this migration keep their random names and have no
+digest; their reference counts are backfilled from the images, auction heroes
+and avatars that already use them.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..ops import add_column, create_index
+
+
+def upgrade(connection: Connection) -> None:
+    add_column(connection, "media_files", "sha256", "VARCHAR(64)")
+    add_column(connection, "media_files", "ref_count", "INTEGER NOT NULL DEFAULT 0")
+    create_index(
+        connection, "ux_media_files_sha256", "media_files", ["sha256"], unique=True
+    )
+    connection.execute(
+        text(
+            """
+            UPDATE media_files SET ref_count =
+                (SELECT COUNT(*) FROM auction_images WHERE auction_images.url = media_files.url)
+              + (SELECT COUNT(*) FROM auctions WHERE auctions.image_url = media_files.url)
+              + (SELECT COUNT(*) FROM users WHERE users.avatar_url = media_files.url)
+            """
+        )
+    )
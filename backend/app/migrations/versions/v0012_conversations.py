@@ -0,0 +1,110 @@
+"""Group messages into conversations with per-member unread counts.
+
+Existing messages are threaded by participant pair and auction. Their history
+counts as read, so nobody's inbox lights up after the upgrade.
+"""
+from __future__ import annotations
+
+from sqlalchemy import case, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+
+from ... import models
+from ..ops import add_column, create_index
+
+
+def upgrade(connection: Connection) -> None:
+    models.Conversation.__table__.create(bind=connection, checkfirst=True)
+    models.ConversationMember.__table__.create(bind=connection, checkfirst=True)
+    add_column(connection, "messages", "conversation_id", "INTEGER REFERENCES conversations(id)")
+    create_index(
+        connection,
+        "ix_messages_conversation_id_created_at",
+        "messages",
+        ["conversation_id", "created_at", "id"],
+    )
+
+    messages = models.Message.__table__
+    conversations = models.Conversation.__table__
+    members = models.ConversationMember.__table__
+    low = case(
+        (messages.c.sender_id < messages.c.recipient_id, messages.c.sender_id),
+        else_=messages.c.recipient_id,
+    )
+    high = case(
+        (messages.c.sender_id < messages.c.recipient_id, messages.c.recipient_id),
+        else_=messages.c.sender_id,
+    )
+    unthreaded = messages.c.conversation_id.is_(None)
+
+    pairs = (
+        select(
+            low.label("user_low_id"),
+            high.label("user_high_id"),
+            messages.c.auction_id,
+            func.min(messages.c.created_at).label("created_at"),
+        )
+        .where(unthreaded)
+        .group_by(low, high, messages.c.auction_id)
+        .subquery()
+    )
+    new_pairs = select(pairs).where(
+        ~select(conversations.c.id)
+        .where(
+            conversations.c.user_low_id == pairs.c.user_low_id,
+            conversations.c.user_high_id == pairs.c.user_high_id,
+            func.coalesce(conversations.c.auction_id, 0)
+            == func.coalesce(pairs.c.auction_id, 0),
+        )
+        .exists()
+    )
+    connection.execute(
+        insert(conversations).from_select(
+            ["user_low_id", "user_high_id", "auction_id", "created_at"], new_pairs
+        )
+    )
+    connection.execute(
+        update(messages)
+        .where(unthreaded)
+        .values(
+            conversation_id=select(conversations.c.id)
+            .where(
+                conversations.c.user_low_id == low,
+                conversations.c.user_high_id == high,
+                func.coalesce(conversations.c.auction_id, 0)
+                == func.coalesce(messages.c.auction_id, 0),
+            )
+            .scalar_subquery()
+        )
+    )
+
+    in_conversation = messages.c.conversation_id == conversations.c.id
+    connection.execute(
+        update(conversations).values(
+            last_message_id=select(messages.c.id)
+            .where(in_conversation)
+            .order_by(messages.c.created_at.desc(), messages.c.id.desc())
+            .limit(1)
+            .scalar_subquery(),
+            last_message_at=select(func.max(messages.c.created_at))
+            .where(in_conversation)
+            .scalar_subquery(),
+            message_count=select(func.count()).where(in_conversation).scalar_subquery(),
+        )
+    )
+
+    for column in (conversations.c.user_low_id, conversations.c.user_high_id):
+        missing = select(
+            conversations.c.id, column, literal(0), conversations.c.last_message_at
+        ).where(
+            ~select(members.c.user_id)
+            .where(
+                members.c.conversation_id == conversations.c.id,
+                members.c.user_id == column,
+            )
+            .exists()
+        )
+        connection.execute(
+            insert(members).from_select(
+                ["conversation_id", "user_id", "unread_count", "last_message_at"], missing
+            )
+        )
@@ -0,0 +1,12 @@
+"""Full-text index over auction titles, descriptions, locations and categories."""
+from __future__ import annotations
+
+from sqlalchemy.engine import Connection
+
+from ... import search
+
+
+def upgrade(connection: Connection) -> None:
+    index = search.index_for(connection.dialect.name)
+    if index is not None:
+        index.install(connection)
@@ -0,0 +1,57 @@
+"""Coordinates on auctions, offline postal-code geocoding and a spatial index.
+
+Existing auctions and transport quotes whose free-text location mentions a
+known postal code are geocoded from it.
+"""
+from __future__ import annotations
+
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Connection
+
+from ... import geo, models
+from ..ops import add_column, create_index
+
+
+def upgrade(connection: Connection) -> None:
+    add_column(connection, "auctions", "postal_code", "VARCHAR(16)")
+    add_column(connection, "auctions", "latitude", "FLOAT")
+    add_column(connection, "auctions", "longitude", "FLOAT")
+    add_column(connection, "transport_quotes", "distance_miles", "FLOAT")
+    create_index(
+        connection, "ix_auctions_latitude_longitude", "auctions", ["latitude", "longitude"]
+    )
+    models.PostalCode.__table__.create(bind=connection, checkfirst=True)
+    postal_codes = models.PostalCode.__table__
+    if not connection.execute(select(func.count()).select_from(postal_codes)).scalar():
+        geo.load_postal_codes(connection, geo.BUNDLED_POSTAL_CODES)
+
+    auctions = models.Auction.__table__
+    rows = connection.execute(
+        select(auctions.c.id, auctions.c.location).where(
+            auctions.c.latitude.is_(None), auctions.c.location.is_not(None)
+        )
+    ).all()
+    for auction_id, location in rows:
+        point = geo.geocode_sync(connection, location)
+        if point is not None:
+            connection.execute(
+                update(auctions)
+                .where(auctions.c.id == auction_id)
+                .values(latitude=point.latitude, longitude=point.longitude)
+            )
+
+    quotes = models.TransportQuoteRequest.__table__
+    rows = connection.execute(
+        select(quotes.c.id, quotes.c.origin, quotes.c.destination).where(
+            quotes.c.distance_miles.is_(None)
+        )
+    ).all()
+    for quote_id, origin, destination in rows:
+        distance = geo.route_miles(connection, origin, destination)
+        if distance is not None:
+            connection.execute(
+                update(quotes).where(quotes.c.id == quote_id).values(distance_miles=distance)
+            )
+
+    if connection.dialect.name == "sqlite":
+        geo.install_spatial_index(connection)
@@ -8,11 +8,13 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Table,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
 
@@ -31,9 +33,13 @@ class User(Base):
     location = Column(String, nullable=True)
     phone = Column(String, nullable=True)
     avatar_url = Column(String, nullable=True)
+    # Bumped to invalidate every token issued to this user.
+    token_version = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    auctions = relationship("Auction", back_populates="owner")
+    auctions = relationship(
+        "Auction", back_populates="owner", foreign_keys="Auction.owner_id"
+    )
     bids = relationship("Bid", back_populates="bidder")
     sent_messages = relationship(
         "Message",
@@ -57,6 +63,9 @@ class User(Base):
         back_populates="user",
         cascade="all, delete-orphan",
     )
+    refresh_tokens = relationship(
+        "RefreshToken", back_populates="user", cascade="all, delete-orphan"
+    )
 
 
 auction_category_table = Table(
@@ -69,12 +78,24 @@ auction_category_table = Table(
 
 class Auction(Base):
     __tablename__ = "auctions"
+    __table_args__ = (
+        Index("ix_auctions_end_time_id", "end_time", "id"),
+        Index("ix_auctions_start_time_end_time", "start_time", "end_time"),
+        Index("ix_auctions_current_price", "current_price"),
+        Index("ix_auctions_status_end_time_id", "status", "end_time", "id"),
+        Index("ix_auctions_latitude_longitude", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=False)
     image_url = Column(String, nullable=True)
     location = Column(String, nullable=True)
+    # Coordinates given with the listing or geocoded from its postal code
+    # (app/geo.py); radius searches go through a spatial index on them.
+    postal_code = Column(String(16), nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     starting_price = Column(Float, nullable=False)
     current_price = Column(Float, nullable=False)
     start_time = Column(DateTime, nullable=False)
@@ -82,13 +103,33 @@ class Auction(Base):
     sniping_extension_minutes = Column(Integer, default=2, nullable=False)
     sniping_window_minutes = Column(Integer, default=2, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Maintained by the bid engine in the same transaction as each bid, so
+    # reads never have to aggregate the bids table.
+    bid_count = Column(Integer, default=0, server_default="0", nullable=False)
+    high_bidder_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    last_bid_at = Column(DateTime, nullable=True)
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+    # Advanced by the lifecycle scheduler (app/lifecycle.py) as start_time and
+    # end_time pass; closed_at and winning_bid_id are written when it closes.
+    status = Column(String(16), default="upcoming", server_default="upcoming", nullable=False)
+    closed_at = Column(DateTime, nullable=True)
+    winning_bid_id = Column(
+        Integer,
+        ForeignKey("bids.id", use_alter=True, name="fk_auctions_winning_bid_id", ondelete="SET NULL"),
+        nullable=True,
+    )
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
 
-    owner = relationship("User", back_populates="auctions")
-    bids = relationship("Bid", back_populates="auction", cascade="all, delete-orphan")
+    owner = relationship("User", back_populates="auctions", foreign_keys=[owner_id])
+    bids = relationship(
+        "Bid",
+        back_populates="auction",
+        cascade="all, delete-orphan",
+        foreign_keys="Bid.auction_id",
+    )
     images = relationship(
         "AuctionImage",
         back_populates="auction",
@@ -100,6 +141,9 @@ class Auction(Base):
         secondary=auction_category_table,
         back_populates="auctions",
     )
+    proxy_bids = relationship(
+        "ProxyBid", back_populates="auction", cascade="all, delete-orphan"
+    )
     transport_requests = relationship(
         "TransportQuoteRequest",
         back_populates="auction",
@@ -119,27 +163,53 @@ class Auction(Base):
 
 class Bid(Base):
     __tablename__ = "bids"
-    __table_args__ = (UniqueConstraint("auction_id", "amount", name="uq_bid_amount"),)
+    __table_args__ = (
+        UniqueConstraint("auction_id", "amount", name="uq_bid_amount"),
+        Index("ix_bids_auction_id_created_at", "auction_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=False)
+    auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=False, index=True)
     bidder_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
-    auction = relationship("Auction", back_populates="bids")
+    auction = relationship("Auction", back_populates="bids", foreign_keys=[auction_id])
     bidder = relationship("User", back_populates="bids")
 
 
+class ProxyBid(Base):
+    """A bidder's standing maximum; the engine bids on their behalf up to it."""
+
+    __tablename__ = "proxy_bids"
+    __table_args__ = (
+        UniqueConstraint("auction_id", "bidder_id", name="uq_proxy_bid_bidder"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=False, index=True)
+    bidder_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    max_amount = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Ties between equal maximums go to whoever set theirs first.
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    auction = relationship("Auction", back_populates="proxy_bids")
+
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     body = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=True)
-    sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sender_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=True)
 
     auction = relationship("Auction")
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
@@ -148,6 +218,59 @@ class Message(Base):
     )
 
 
+class Conversation(Base):
+    """The thread between two users, optionally about one auction."""
+
+    __tablename__ = "conversations"
+    __table_args__ = (
+        Index(
+            "ux_conversations_participants",
+            "user_low_id",
+            "user_high_id",
+            text("coalesce(auction_id, 0)"),
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # The participant pair, smaller user id first; equal for notes to oneself.
+    user_low_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_high_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=True)
+    last_message_id = Column(
+        Integer,
+        ForeignKey("messages.id", use_alter=True, name="fk_conversations_last_message_id"),
+        nullable=True,
+    )
+    last_message_at = Column(DateTime, nullable=True)
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    last_message = relationship("Message", foreign_keys=[last_message_id])
+    members = relationship("ConversationMember", back_populates="conversation")
+
+
+class ConversationMember(Base):
+    """A participant's view of a conversation: what they have not read yet.
+
+    ``last_message_at`` is copied from the conversation so the inbox is one
+    range scan of ``ix_conversation_members_inbox``.
+    """
+
+    __tablename__ = "conversation_members"
+    __table_args__ = (
+        Index("ix_conversation_members_inbox", "user_id", "last_message_at", "conversation_id"),
+    )
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_message_at = Column(DateTime, nullable=True)
+    last_read_at = Column(DateTime, nullable=True)
+
+    conversation = relationship("Conversation", back_populates="members")
+
+
 class AuctionImage(Base):
     __tablename__ = "auction_images"
 
@@ -155,10 +278,49 @@ class AuctionImage(Base):
     auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=False)
     url = Column(String, nullable=False)
     position = Column(Integer, default=0, nullable=False)
+    # Copied from the MediaFile for url when the gallery is saved.
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    thumbnail_url = Column(String, nullable=True)
+    medium_url = Column(String, nullable=True)
 
     auction = relationship("Auction", back_populates="images")
 
 
+class PostalCode(Base):
+    """Postal-code centroids for offline geocoding, loaded from GeoNames dumps."""
+
+    __tablename__ = "postal_codes"
+
+    country = Column(String(2), primary_key=True)
+    code = Column(String(10), primary_key=True)
+    place = Column(String, nullable=True)
+    region = Column(String, nullable=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+
+class MediaFile(Base):
+    """An uploaded image and the renditions generated from it."""
+
+    __tablename__ = "media_files"
+    __table_args__ = (Index("ux_media_files_sha256", "sha256", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, unique=True, nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    thumbnail_url = Column(String, nullable=True)
+    medium_url = Column(String, nullable=True)
+    # Digest of the uploaded bytes; the blob is stored under this name.
+    sha256 = Column(String(64), nullable=True)
+    # Auction images, auction heroes and avatars pointing at this file.
+    ref_count = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class EmailSubscription(Base):
     __tablename__ = "email_subscriptions"
 
@@ -195,6 +357,8 @@ class TransportQuoteRequest(Base):
     weight = Column(String, nullable=True)
     timeline = Column(String, nullable=True)
     notes = Column(Text, nullable=True)
+    # Straight-line miles between the postal codes in origin and destination.
+    distance_miles = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     auction_id = Column(Integer, ForeignKey("auctions.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -235,3 +399,23 @@ class ContactRequest(Base):
     topic = Column(String, nullable=True)
     message = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RefreshToken(Base):
+    """A rotating refresh token; only its SHA-256 digest is stored.
+
+    Every refresh replaces the token with a new one in the same family.
+    Presenting a token that was already replaced revokes the whole family.
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    family_id = Column(String(32), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+    user = relationship("User", back_populates="refresh_tokens")
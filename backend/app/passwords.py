@@ -0,0 +1,82 @@
+"""Password hashing off the event loop.
+
+bcrypt and argon2 are deliberately slow, so hashes are computed in a small
+process pool: a burst of logins then queues behind ``password_hash_workers``
+processes instead of occupying the threadpool and the GIL that bid and
+catalog requests need.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from .config import get_settings
+
+settings = get_settings()
+
+_context: Optional[CryptContext] = None
+_executor: Optional[Executor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def build_context(schemes: list[str], bcrypt_rounds: int) -> CryptContext:
+    # The first scheme hashes new passwords; the rest are still accepted and
+    # upgraded on the user's next successful login.
+    return CryptContext(schemes=schemes, deprecated="auto", bcrypt__rounds=bcrypt_rounds)
+
+
+def _init_worker(schemes: list[str], bcrypt_rounds: int) -> None:
+    global _context
+    _context = build_context(schemes, bcrypt_rounds)
+
+
+def _hash(password: str) -> str:
+    return _context.hash(password)
+
+
+def _verify(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return _context.verify_and_update(password, hashed)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            initializer=_init_worker,
+            initargs=(settings.password_schemes, settings.bcrypt_rounds),
+        )
+    return _executor
+
+
+async def _run(func, *args):
+    global _slots
+    if settings.password_hash_workers <= 0:
+        # No pool configured (tests, single-core boxes): hash on a thread.
+        if _context is None:
+            _init_worker(settings.password_schemes, settings.bcrypt_rounds)
+        return await asyncio.to_thread(func, *args)
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.password_hash_workers * settings.password_hash_queue)
+    async with _slots:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """Check ``password``; also return a replacement hash if ``hashed`` is outdated."""
+    return await _run(_verify, password, hashed)
+
+
+def shutdown() -> None:
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    _slots = None
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Optional
+
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+class Broker:
+    """Carries published events to every hub that has subscribers.
+
+    The default broker only reaches hubs in this process. A shared broker
+    (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) would forward ``publish`` to
+    the other workers and call ``hub.deliver`` for messages it receives.
+    """
+
+    def attach(self, hub: "EventHub") -> None:
+        self.hub = hub
+
+    def publish(self, topic: str, message: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    def publish(self, topic: str, message: str) -> None:
+        self.hub.deliver(topic, message)
+
+
+class Subscription(asyncio.Queue):
+    def __init__(self, overflow: Optional[str] = None) -> None:
+        super().__init__(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflow = overflow
+
+    def offer(self, message: str) -> None:
+        if not self.full():
+            self.put_nowait(message)
+        elif self.overflow is None:
+            # A watcher that cannot keep up only needs the latest state.
+            self.get_nowait()
+            self.put_nowait(message)
+        else:
+            while not self.empty():
+                self.get_nowait()
+            self.put_nowait(self.overflow)
+
+
+class EventHub:
+    """Fans events out to WebSocket subscribers, serializing each event once.
+
+    ``publish`` may be called from request threads; delivery is handed to the
+    event loop that owns the subscriber queues.
+    """
+
+    def __init__(self, broker: Optional[Broker] = None) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Subscription]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.broker = broker or InMemoryBroker()
+        self.broker.attach(self)
+
+    def subscribe(
+        self, topic: str, overflow: Optional[dict[str, Any]] = None
+    ) -> Subscription:
+        """Queue events for ``topic``.
+
+        A full queue drops its oldest event, which suits watchers that only need
+        the latest state. With ``overflow``, the backlog is replaced by that one
+        event instead, so a subscriber that needs every event knows to catch up.
+        """
+        queue = Subscription(encode_event(overflow) if overflow else None)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers[topic].add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                return
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def listening(self, topic: str) -> bool:
+        """Whether an event for ``topic`` could reach anyone, here or elsewhere."""
+        if not isinstance(self.broker, InMemoryBroker):
+            return True
+        with self._lock:
+            return topic in self._subscribers
+
+    def publish(self, topic: str, event: dict[str, Any]) -> None:
+        if not self.listening(topic):
+            return
+        self.broker.publish(topic, encode_event(event))
+
+    def deliver(self, topic: str, message: str) -> None:
+        with self._lock:
+            queues = list(self._subscribers.get(topic, ()))
+            loop = self._loop
+        if not queues or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(_offer_all, queues, message)
+
+
+def _offer_all(queues: list[Subscription], message: str) -> None:
+    for queue in queues:
+        queue.offer(message)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_event(event: dict[str, Any]) -> str:
+    return json.dumps(event, default=_json_default)
+
+
+def auction_topic(auction_id: int) -> str:
+    return f"auction:{auction_id}"
+
+
+def user_topic(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+hub = EventHub()
@@ -1,54 +1,193 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import asc, desc
-from sqlalchemy.orm import Session, selectinload
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, asc, desc, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from .. import models
-from ..auth import get_current_active_user, get_current_admin
-from ..database import get_db
+from .. import bidding, blobs, bulk, geo, lifecycle, models, search
+from ..auth import Principal, get_current_admin, get_current_principal
+from ..cache import AUCTIONS_NAMESPACE, auction_namespace, json_response, response_cache
+from ..config import get_settings
+from ..database import AsyncSessionLocal, async_engine, get_async_db
+from ..pagination import (
+    decode_cursor,
+    decode_rank_cursor,
+    encode_cursor,
+    encode_rank_cursor,
+)
+from ..realtime import auction_topic, encode_event, hub
 from ..schemas import (
     AuctionCreate,
     AuctionImagePublic,
+    AuctionImportReport,
+    AuctionPage,
     AuctionPublic,
+    AuctionSearchPage,
+    AuctionSearchResult,
+    AuctionSummary,
     AuctionUpdate,
+    BidPage,
     BidPublic,
+    BidReceipt,
     CategoryPublic,
+    ProxyBidCreate,
+    ProxyBidReceipt,
+    SearchFacet,
 )
 
 router = APIRouter(prefix="/auctions", tags=["auctions"])
 
+# How many of the newest bids the auction detail embeds; older history is
+# paged through GET /auctions/{id}/bids.
+RECENT_BIDS_LIMIT = 10
+
+# Cached bodies carry a time-dependent status, so they only live a few seconds
+# even without a write; clients revalidate every time via the ETag.
+AUCTION_CACHE_CONTROL = "no-cache"
+settings = get_settings()
+search_index = search.index_for(async_engine.dialect.name)
+
+
+async def _invalidate(auction_id: int) -> None:
+    await response_cache.invalidate(AUCTIONS_NAMESPACE, auction_namespace(auction_id))
 
-def _auction_query(db: Session):
-    return db.query(models.Auction).options(
+
+def _auction_select():
+    return select(models.Auction).options(
         selectinload(models.Auction.owner),
         selectinload(models.Auction.images),
-        selectinload(models.Auction.bids).selectinload(models.Bid.bidder),
         selectinload(models.Auction.categories),
     )
 
 
+async def _load_auction(
+    db: AsyncSession, auction_id: int, *options
+) -> Optional[models.Auction]:
+    result = await db.execute(
+        _auction_select()
+        .options(*options)
+        .where(models.Auction.id == auction_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+def _summary_select():
+    # Prefer the small rendition wherever the photo went through the pipeline.
+    hero_thumbnail = (
+        select(models.MediaFile.thumbnail_url)
+        .where(models.MediaFile.url == models.Auction.image_url)
+        .correlate(models.Auction)
+        .scalar_subquery()
+    )
+    first_image = (
+        select(func.coalesce(models.AuctionImage.thumbnail_url, models.AuctionImage.url))
+        .where(models.AuctionImage.auction_id == models.Auction.id)
+        .order_by(asc(models.AuctionImage.position))
+        .limit(1)
+        .correlate(models.Auction)
+        .scalar_subquery()
+    )
+    return select(
+        models.Auction.id,
+        models.Auction.title,
+        func.coalesce(hero_thumbnail, models.Auction.image_url, first_image).label(
+            "thumbnail_url"
+        ),
+        models.Auction.location,
+        models.Auction.latitude,
+        models.Auction.longitude,
+        models.Auction.current_price,
+        models.Auction.start_time,
+        models.Auction.end_time,
+        models.Auction.status,
+        models.Auction.bid_count,
+    )
+
+
+async def _category_slugs_for(
+    auction_ids: list[int], db: AsyncSession
+) -> dict[int, list[str]]:
+    slugs: dict[int, list[str]] = {auction_id: [] for auction_id in auction_ids}
+    if not auction_ids:
+        return slugs
+    rows = await db.execute(
+        select(models.auction_category_table.c.auction_id, models.Category.slug)
+        .join(
+            models.Category,
+            models.Category.id == models.auction_category_table.c.category_id,
+        )
+        .where(models.auction_category_table.c.auction_id.in_(auction_ids))
+        .order_by(asc(models.Category.name))
+    )
+    for auction_id, slug in rows:
+        slugs[auction_id].append(slug)
+    return slugs
+
+
+async def _bid_history(
+    db: AsyncSession,
+    auction_id: int,
+    limit: int,
+    before: Optional[tuple[datetime, int]] = None,
+) -> list[models.Bid]:
+    query = (
+        select(models.Bid)
+        .options(selectinload(models.Bid.bidder))
+        .where(models.Bid.auction_id == auction_id)
+    )
+    if before is not None:
+        created_at, bid_id = before
+        query = query.where(
+            or_(
+                models.Bid.created_at < created_at,
+                and_(models.Bid.created_at == created_at, models.Bid.id < bid_id),
+            )
+        )
+    query = query.order_by(desc(models.Bid.created_at), desc(models.Bid.id)).limit(limit)
+    return list((await db.scalars(query)).all())
+
+
 def _auction_status(auction: models.Auction, now: datetime) -> tuple[str, int]:
-    if now < auction.start_time:
-        return "upcoming", int((auction.start_time - now).total_seconds())
-    if now >= auction.end_time:
-        return "completed", 0
-    return "active", max(int((auction.end_time - now).total_seconds()), 0)
+    # The status itself is maintained by the lifecycle scheduler; only the
+    # countdown depends on the clock.
+    if auction.status == lifecycle.UPCOMING:
+        return auction.status, max(int((auction.start_time - now).total_seconds()), 0)
+    if auction.status == lifecycle.COMPLETED:
+        return auction.status, 0
+    return auction.status, max(int((auction.end_time - now).total_seconds()), 0)
+
+
+def _serialize_bid(bid: models.Bid) -> BidPublic:
+    return BidPublic(
+        id=bid.id,
+        amount=bid.amount,
+        created_at=bid.created_at,
+        bidder=bid.bidder,
+    )
 
 
-def _serialize_auction(auction: models.Auction, now: datetime) -> AuctionPublic:
+def _serialize_auction(
+    auction: models.Auction, recent_bids: list[models.Bid], now: datetime
+) -> AuctionPublic:
     status, time_remaining = _auction_status(auction, now)
-    bids = [
-        BidPublic(
-            id=bid.id,
-            amount=bid.amount,
-            created_at=bid.created_at,
-            bidder=bid.bidder,
-        )
-        for bid in sorted(auction.bids, key=lambda b: b.created_at, reverse=True)
-    ]
+    bids = [_serialize_bid(bid) for bid in recent_bids]
     categories = [
         CategoryPublic(
             id=category.id,
@@ -59,8 +198,7 @@ def _serialize_auction(auction: models.Auction, now: datetime) -> AuctionPublic:
         for category in sorted(auction.categories, key=lambda c: c.name.lower())
     ]
     gallery = [
-        AuctionImagePublic(id=image.id, url=image.url, position=image.position)
-        for image in auction.images
+        AuctionImagePublic.from_orm(image) for image in auction.images
     ]
     return AuctionPublic(
         id=auction.id,
@@ -69,6 +207,9 @@ def _serialize_auction(auction: models.Auction, now: datetime) -> AuctionPublic:
         starting_price=auction.starting_price,
         image_url=auction.image_url,
         location=auction.location,
+        postal_code=auction.postal_code,
+        latitude=auction.latitude,
+        longitude=auction.longitude,
         start_time=auction.start_time,
         end_time=auction.end_time,
         sniping_extension_minutes=auction.sniping_extension_minutes,
@@ -77,6 +218,12 @@ def _serialize_auction(auction: models.Auction, now: datetime) -> AuctionPublic:
         current_price=auction.current_price,
         created_at=auction.created_at,
         updated_at=auction.updated_at,
+        bid_count=auction.bid_count,
+        high_bidder_id=auction.high_bidder_id,
+        last_bid_at=auction.last_bid_at,
+        version=auction.version,
+        closed_at=auction.closed_at,
+        winning_bid_id=auction.winning_bid_id,
         bids=bids,
         gallery=gallery,
         status=status,
@@ -85,14 +232,64 @@ def _serialize_auction(auction: models.Auction, now: datetime) -> AuctionPublic:
     )
 
 
-def _load_categories(slugs: list[str], db: Session) -> list[models.Category]:
+def _serialize_summary(row, category_slugs: list[str], now: datetime) -> AuctionSummary:
+    status, time_remaining = _auction_status(row, now)
+    return AuctionSummary(
+        id=row.id,
+        title=row.title,
+        thumbnail_url=row.thumbnail_url,
+        location=row.location,
+        latitude=row.latitude,
+        longitude=row.longitude,
+        distance_miles=round(row.distance_miles, 1)
+        if getattr(row, "distance_miles", None) is not None
+        else None,
+        current_price=row.current_price,
+        start_time=row.start_time,
+        end_time=row.end_time,
+        status=status,
+        time_remaining_seconds=time_remaining,
+        bid_count=row.bid_count,
+        category_slugs=category_slugs,
+    )
+
+
+async def _auction_detail(db: AsyncSession, auction: models.Auction) -> AuctionPublic:
+    recent_bids = await _bid_history(db, auction.id, RECENT_BIDS_LIMIT)
+    return _serialize_auction(auction, recent_bids, datetime.utcnow())
+
+
+async def _gallery_images(urls: list[str], db: AsyncSession) -> list[models.AuctionImage]:
+    """Gallery rows for ``urls``, carrying dimensions and renditions of known uploads."""
+    media = {
+        media_file.url: media_file
+        for media_file in await db.scalars(
+            select(models.MediaFile).where(models.MediaFile.url.in_(urls))
+        )
+    }
+    images = []
+    for position, url in enumerate(urls):
+        image = models.AuctionImage(url=url, position=position)
+        if url in media:
+            image.width = media[url].width
+            image.height = media[url].height
+            image.thumbnail_url = media[url].thumbnail_url
+            image.medium_url = media[url].medium_url
+        images.append(image)
+    return images
+
+
+def _media_urls(auction: models.Auction) -> list[Optional[str]]:
+    """Upload URLs the auction holds a reference to: its hero and gallery."""
+    return [auction.image_url, *(image.url for image in auction.images)]
+
+
+async def _load_categories(slugs: list[str], db: AsyncSession) -> list[models.Category]:
     if not slugs:
         return []
     categories = (
-        db.query(models.Category)
-        .filter(models.Category.slug.in_(slugs))
-        .all()
-    )
+        await db.scalars(select(models.Category).where(models.Category.slug.in_(slugs)))
+    ).all()
     found = {category.slug: category for category in categories}
     missing = [slug for slug in slugs if slug not in found]
     if missing:
@@ -103,26 +300,313 @@ def _load_categories(slugs: list[str], db: Session) -> list[models.Category]:
     return [found[slug] for slug in slugs]
 
 
-@router.get("", response_model=list[AuctionPublic])
-def list_auctions(db: Session = Depends(get_db)) -> list[AuctionPublic]:
-    auctions = _auction_query(db).order_by(asc(models.Auction.end_time)).all()
+async def _locate(db: AsyncSession, auction: models.Auction, fields: dict) -> list[str]:
+    """Set coordinates from the location fields a create or update sent.
+
+    Explicit coordinates win. Otherwise they come from the postal code, or
+    from a postal code mentioned in the free-text location. A postal code the
+    geocoding table lacks leaves the listing without coordinates; the
+    returned warnings say so.
+    """
+    if "latitude" in fields or "longitude" in fields:
+        if (auction.latitude is None) != (auction.longitude is None):
+            raise HTTPException(status_code=400, detail="Send latitude and longitude together")
+        return []
+    if not {"postal_code", "location"} & fields.keys():
+        return []
+    warnings = []
+    if auction.postal_code:
+        point = await geo.geocode(db, auction.postal_code)
+        if point is None:
+            warnings.append(geo.not_geocoded(auction.postal_code))
+    else:
+        point = await geo.geocode(db, auction.location)
+    auction.latitude, auction.longitude = point or (None, None)
+    return warnings
+
+
+async def _origin(
+    db: AsyncSession, near: Optional[str], lat: Optional[float], lon: Optional[float]
+) -> Optional[geo.Point]:
+    if lat is not None or lon is not None:
+        if lat is None or lon is None:
+            raise HTTPException(status_code=400, detail="Send lat and lon together")
+        return geo.Point(lat, lon)
+    if near:
+        point = await geo.geocode(db, near)
+        if point is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Postal code {near} is not in the geocoding table",
+            )
+        return point
+    return None
+
+
+def _parse_bbox(bbox: Optional[str]) -> Optional[geo.Box]:
+    if bbox is None:
+        return None
+    try:
+        west, south, east, north = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="bbox is west,south,east,north in degrees"
+        ) from None
+    if not (-180 <= west <= east <= 180 and -90 <= south <= north <= 90):
+        raise HTTPException(status_code=400, detail="bbox is west,south,east,north in degrees")
+    return geo.Box(south, west, north, east)
+
+
+@router.get("", response_model=AuctionPage)
+async def list_auctions(
+    request: Request,
+    status: Optional[Literal["upcoming", "active", "completed"]] = None,
+    category: Optional[str] = None,
+    location: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    near: Optional[str] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_miles: Optional[float] = Query(None, gt=0, le=3000),
+    bbox: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(24, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    origin = await _origin(db, near, lat, lon)
+    if radius_miles is not None and origin is None:
+        raise HTTPException(status_code=400, detail="radius_miles needs near or lat and lon")
+    box = _parse_bbox(bbox)
+
+    async def build() -> AuctionPage:
+        return await _auction_page(
+            db,
+            status,
+            category,
+            location,
+            min_price,
+            max_price,
+            cursor,
+            limit,
+            origin=origin,
+            radius_miles=radius_miles,
+            box=box,
+        )
+
+    cached = await response_cache.get_or_build(
+        AUCTIONS_NAMESPACE,
+        "&".join(sorted(str(request.query_params).split("&"))),
+        settings.cache_auction_ttl_seconds,
+        build,
+    )
+    return json_response(request, cached, AUCTION_CACHE_CONTROL)
+
+
+async def _auction_page(
+    db: AsyncSession,
+    status: Optional[str],
+    category: Optional[str],
+    location: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    cursor: Optional[str],
+    limit: int,
+    origin: Optional[geo.Point] = None,
+    radius_miles: Optional[float] = None,
+    box: Optional[geo.Box] = None,
+) -> AuctionPage:
     now = datetime.utcnow()
-    return [_serialize_auction(auction, now) for auction in auctions]
+    query = _summary_select()
+    dialect = async_engine.dialect.name
+    if origin is not None:
+        distance = geo.distance_expression(origin, dialect)
+        query = query.add_columns(distance.label("distance_miles"))
+        if radius_miles is not None:
+            # The bounding box goes through the spatial index; the exact
+            # distance only has to be computed for what falls inside it.
+            query = query.where(
+                geo.within_box(geo.bounding_box(origin, radius_miles), dialect),
+                distance <= radius_miles,
+            )
+    if box is not None:
+        query = query.where(geo.within_box(box, dialect))
+    if status:
+        query = query.where(models.Auction.status == status)
+    if category:
+        query = query.where(
+            models.Auction.categories.any(models.Category.slug == category)
+        )
+    if location:
+        query = query.where(models.Auction.location.ilike(f"%{location}%"))
+    if min_price is not None:
+        query = query.where(models.Auction.current_price >= min_price)
+    if max_price is not None:
+        query = query.where(models.Auction.current_price <= max_price)
+    if cursor:
+        end_time, auction_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                models.Auction.end_time > end_time,
+                and_(
+                    models.Auction.end_time == end_time,
+                    models.Auction.id > auction_id,
+                ),
+            )
+        )
+
+    rows = (
+        await db.execute(
+            query.order_by(asc(models.Auction.end_time), asc(models.Auction.id)).limit(
+                limit + 1
+            )
+        )
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].end_time, rows[-1].id)
+    category_slugs = await _category_slugs_for([row.id for row in rows], db)
+    return AuctionPage(
+        items=[_serialize_summary(row, category_slugs[row.id], now) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/search", response_model=AuctionSearchPage)
+async def search_auctions(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[Literal["upcoming", "active", "completed"]] = None,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(24, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """Ranked full-text search; facets and the total come with the first page."""
+    if search_index is None:
+        raise HTTPException(status_code=501, detail="Search is not available on this database")
+    terms = search.parse_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query has no words")
+    after = decode_rank_cursor(cursor) if cursor else None
+
+    async def build() -> AuctionSearchPage:
+        return await _search_page(db, terms, status, category, after, limit)
+
+    cached = await response_cache.get_or_build(
+        AUCTIONS_NAMESPACE,
+        "search?" + "&".join(sorted(str(request.query_params).split("&"))),
+        settings.cache_auction_ttl_seconds,
+        build,
+    )
+    return json_response(request, cached, AUCTION_CACHE_CONTROL)
+
+
+async def _search_page(
+    db: AsyncSession,
+    terms: list[str],
+    status: Optional[str],
+    category: Optional[str],
+    after: Optional[tuple[float, int]],
+    limit: int,
+) -> AuctionSearchPage:
+    now = datetime.utcnow()
+    hits = await search_index.search(
+        db, terms, status=status, category=category, after=after, limit=limit + 1
+    )
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_rank_cursor(hits[-1].score, hits[-1].auction_id)
+    ids = [hit.auction_id for hit in hits]
+    rows = {
+        row.id: row
+        for row in await db.execute(_summary_select().where(models.Auction.id.in_(ids)))
+    }
+    category_slugs = await _category_slugs_for(ids, db)
+    items = [
+        AuctionSearchResult(
+            **_serialize_summary(rows[hit.auction_id], category_slugs[hit.auction_id], now).dict(),
+            title_html=hit.title_html,
+            snippet_html=hit.snippet_html,
+        )
+        for hit in hits
+        if hit.auction_id in rows
+    ]
+    page = AuctionSearchPage(items=items, next_cursor=next_cursor)
+    if after is None:
+        page.total = await search_index.count(db, terms, status=status, category=category)
+        page.facets = [
+            SearchFacet(slug=facet.slug, name=facet.name, count=facet.count)
+            for facet in await search_index.facets(db, terms, status=status)
+        ]
+    return page
+
+
+@router.post("/import", response_model=AuctionImportReport)
+async def import_auctions(
+    request: Request,
+    fmt: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin),
+) -> AuctionImportReport:
+    """Create auctions from a CSV or NDJSON request body, read as it streams in.
+
+    Valid rows are committed in batches of ``BULK_IMPORT_BATCH_SIZE`` and
+    invalid ones are reported by line, so a partly bad file still imports.
+    """
+    fmt = fmt or bulk.format_for(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass format",
+        )
+    return await bulk.import_auctions(
+        db, request.stream(), fmt, admin.id, settings.bulk_import_batch_size
+    )
+
+
+@router.get("/export")
+async def export_auctions(
+    fmt: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    status: Optional[Literal["upcoming", "active", "completed"]] = None,
+    admin: Principal = Depends(get_current_admin),
+) -> StreamingResponse:
+    async def body():
+        # The request's session is closed before a streamed body is sent.
+        async with AsyncSessionLocal() as db:
+            async for chunk in bulk.export_auctions(db, fmt, status):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=bulk.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="auctions.{fmt}"'},
+    )
 
 
 @router.get("/{auction_id}", response_model=AuctionPublic)
-def get_auction(auction_id: int, db: Session = Depends(get_db)) -> AuctionPublic:
-    auction = _auction_query(db).filter(models.Auction.id == auction_id).first()
-    if not auction:
-        raise HTTPException(status_code=404, detail="Auction not found")
-    return _serialize_auction(auction, datetime.utcnow())
+async def get_auction(
+    auction_id: int, request: Request, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    async def build() -> AuctionPublic:
+        auction = await _load_auction(db, auction_id)
+        if not auction:
+            raise HTTPException(status_code=404, detail="Auction not found")
+        return await _auction_detail(db, auction)
+
+    cached = await response_cache.get_or_build(
+        auction_namespace(auction_id), "detail", settings.cache_auction_ttl_seconds, build
+    )
+    return json_response(request, cached, AUCTION_CACHE_CONTROL)
 
 
 @router.post("", response_model=AuctionPublic, status_code=status.HTTP_201_CREATED)
-def create_auction(
+async def create_auction(
     auction_in: AuctionCreate,
-    db: Session = Depends(get_db),
-    admin: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin),
 ) -> AuctionPublic:
     if auction_in.end_time <= auction_in.start_time:
         raise HTTPException(status_code=400, detail="End time must be after start time")
@@ -134,36 +618,49 @@ def create_auction(
         current_price=auction_in.starting_price,
         image_url=auction_in.image_url,
         location=auction_in.location,
+        postal_code=auction_in.postal_code,
+        latitude=auction_in.latitude,
+        longitude=auction_in.longitude,
         start_time=auction_in.start_time,
         end_time=auction_in.end_time,
         sniping_extension_minutes=auction_in.sniping_extension_minutes,
         sniping_window_minutes=auction_in.sniping_window_minutes,
+        status=lifecycle.initial_status(
+            auction_in.start_time, auction_in.end_time, datetime.utcnow()
+        ),
         owner_id=admin.id,
     )
+    # In the session before the categories, whose backref would add it, and
+    # before adjust_references flushes.
+    db.add(auction)
     if auction_in.gallery_urls:
-        for idx, url in enumerate(auction_in.gallery_urls):
-            auction.images.append(models.AuctionImage(url=url, position=idx))
+        auction.images.extend(await _gallery_images(auction_in.gallery_urls, db))
         if not auction.image_url:
             auction.image_url = auction_in.gallery_urls[0]
-    auction.categories = _load_categories(auction_in.category_slugs, db)
-    db.add(auction)
-    db.commit()
-    db.refresh(auction)
-    fresh = _auction_query(db).filter(models.Auction.id == auction.id).first()
-    return _serialize_auction(fresh, datetime.utcnow())
+    auction.categories = await _load_categories(auction_in.category_slugs, db)
+    warnings = await _locate(db, auction, auction_in.dict(exclude_unset=True))
+    await blobs.adjust_references(db, [], _media_urls(auction))
+    await db.commit()
+    await _invalidate(auction.id)
+    fresh = await _load_auction(db, auction.id)
+    lifecycle.scheduler.watch(fresh.id, fresh.status, fresh.start_time, fresh.end_time)
+    detail = await _auction_detail(db, fresh)
+    detail.warnings = warnings
+    return detail
 
 
 @router.put("/{auction_id}", response_model=AuctionPublic)
-def update_auction(
+async def update_auction(
     auction_id: int,
     auction_update: AuctionUpdate,
-    db: Session = Depends(get_db),
-    admin: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin),
 ) -> AuctionPublic:
-    auction = _auction_query(db).filter(models.Auction.id == auction_id).first()
+    auction = await _load_auction(db, auction_id)
     if not auction:
         raise HTTPException(status_code=404, detail="Auction not found")
 
+    media_before = _media_urls(auction)
     update_data = auction_update.dict(exclude_unset=True)
     gallery_urls = update_data.pop("gallery_urls", None)
     category_slugs = update_data.pop("category_slugs", None)
@@ -172,66 +669,228 @@ def update_auction(
 
     if gallery_urls is not None:
         auction.images.clear()
-        for idx, url in enumerate(gallery_urls):
-            auction.images.append(models.AuctionImage(url=url, position=idx))
+        auction.images.extend(await _gallery_images(gallery_urls, db))
         if gallery_urls and not auction.image_url:
             auction.image_url = gallery_urls[0]
     if category_slugs is not None:
-        auction.categories = _load_categories(category_slugs, db)
+        auction.categories = await _load_categories(category_slugs, db)
+    warnings = await _locate(db, auction, update_data)
+    await blobs.adjust_references(db, media_before, _media_urls(auction))
+    rescheduled = "start_time" in update_data or "end_time" in update_data
+    if rescheduled:
+        now = datetime.utcnow()
+        settled = lifecycle.status_for(auction.start_time, auction.end_time, now)
+        # Moving the times of a closed auction into the future reopens it.
+        if auction.status != lifecycle.COMPLETED or settled != lifecycle.COMPLETED:
+            auction.status = lifecycle.initial_status(auction.start_time, auction.end_time, now)
+            auction.closed_at = None
+            auction.winning_bid_id = None
+    auction.version = models.Auction.version + 1
     db.add(auction)
-    db.commit()
-    db.refresh(auction)
-    fresh = _auction_query(db).filter(models.Auction.id == auction.id).first()
-    return _serialize_auction(fresh, datetime.utcnow())
+    await db.commit()
+    await _invalidate(auction.id)
+    fresh = await _load_auction(db, auction.id)
+    if rescheduled:
+        lifecycle.scheduler.watch(fresh.id, fresh.status, fresh.start_time, fresh.end_time)
+    detail = await _auction_detail(db, fresh)
+    detail.warnings = warnings
+    return detail
 
 
-@router.delete("/{auction_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_auction(
+@router.delete(
+    "/{auction_id}", status_code=status.HTTP_204_NO_CONTENT, response_model=None
+)
+async def delete_auction(
     auction_id: int,
-    db: Session = Depends(get_db),
-    admin: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    admin: Principal = Depends(get_current_admin),
 ) -> None:
-    auction = _auction_query(db).filter(models.Auction.id == auction_id).first()
+    # Cascaded collections must be loaded up front; there is no lazy loading
+    # on an AsyncSession.
+    auction = await _load_auction(
+        db,
+        auction_id,
+        selectinload(models.Auction.bids),
+        selectinload(models.Auction.proxy_bids),
+        selectinload(models.Auction.transport_requests),
+        selectinload(models.Auction.financing_applications),
+    )
     if not auction:
         raise HTTPException(status_code=404, detail="Auction not found")
-    db.delete(auction)
-    db.commit()
+    await blobs.adjust_references(db, _media_urls(auction), [])
+    await db.delete(auction)
+    await db.commit()
+    lifecycle.scheduler.forget(auction_id)
+    await _invalidate(auction_id)
+
+
+@router.get("/{auction_id}/bids", response_model=BidPage)
+async def list_bids(
+    auction_id: int,
+    before: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+) -> BidPage:
+    if await db.get(models.Auction, auction_id) is None:
+        raise HTTPException(status_code=404, detail="Auction not found")
+    cursor = decode_cursor(before) if before else None
+    bids = await _bid_history(db, auction_id, limit + 1, before=cursor)
+    next_cursor = None
+    if len(bids) > limit:
+        bids = bids[:limit]
+        next_cursor = encode_cursor(bids[-1].created_at, bids[-1].id)
+    return BidPage(items=[_serialize_bid(bid) for bid in bids], next_cursor=next_cursor)
+
+
+async def _publish_bids(
+    db: AsyncSession, auction: models.Auction, bids: list[models.Bid]
+) -> None:
+    """Announce each visible bid, oldest first, ending on the committed state."""
+    if not bids:
+        return
+    names = dict(
+        (
+            await db.execute(
+                select(models.User.id, models.User.display_name).where(
+                    models.User.id.in_({bid.bidder_id for bid in bids})
+                )
+            )
+        ).all()
+    )
+    for position, bid in enumerate(bids, start=1):
+        hub.publish(
+            auction_topic(auction.id),
+            {
+                "type": "bid",
+                "auction_id": auction.id,
+                "amount": bid.amount,
+                "current_price": bid.amount,
+                "bid_count": auction.bid_count - len(bids) + position,
+                "bidder": names.get(bid.bidder_id),
+                "created_at": bid.created_at,
+                "end_time": auction.end_time,
+            },
+        )
 
 
-@router.post("/{auction_id}/bids", response_model=AuctionPublic)
-def place_bid(
+@router.post("/{auction_id}/bids", response_model=BidReceipt)
+async def place_bid(
     auction_id: int,
     amount: float,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_active_user),
-) -> AuctionPublic:
-    auction = db.query(models.Auction).filter(models.Auction.id == auction_id).first()
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
+) -> BidReceipt:
+    bids, auction = await bidding.place_bid(db, auction_id, user.id, amount)
+    await _invalidate(auction_id)
+    bid = bids[0]
+    receipt = BidReceipt(
+        id=bid.id,
+        auction_id=auction_id,
+        amount=bid.amount,
+        created_at=bid.created_at,
+        current_price=auction.current_price,
+        bid_count=auction.bid_count,
+        end_time=auction.end_time,
+        high_bidder_id=auction.high_bidder_id,
+    )
+    await _publish_bids(db, auction, bids)
+    return receipt
+
+
+@router.get("/{auction_id}/proxy", response_model=ProxyBidReceipt)
+async def get_proxy_bid(
+    auction_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
+) -> ProxyBidReceipt:
+    row = (
+        await db.execute(
+            select(models.ProxyBid.max_amount, models.Auction)
+            .join(models.Auction, models.Auction.id == models.ProxyBid.auction_id)
+            .where(
+                models.ProxyBid.auction_id == auction_id,
+                models.ProxyBid.bidder_id == user.id,
+            )
+        )
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="No maximum bid on this auction")
+    max_amount, auction = row
+    return ProxyBidReceipt(
+        auction_id=auction_id,
+        max_amount=max_amount,
+        leading=auction.high_bidder_id == user.id,
+        current_price=auction.current_price,
+        bid_count=auction.bid_count,
+        end_time=auction.end_time,
+    )
+
+
+@router.put("/{auction_id}/proxy", response_model=ProxyBidReceipt)
+async def set_proxy_bid(
+    auction_id: int,
+    proxy_in: ProxyBidCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user: Principal = Depends(get_current_principal),
+) -> ProxyBidReceipt:
+    bids, auction, proxy = await bidding.set_proxy_bid(
+        db, auction_id, user.id, proxy_in.max_amount
+    )
+    if bids:
+        await _invalidate(auction_id)
+        await _publish_bids(db, auction, bids)
+    return ProxyBidReceipt(
+        auction_id=auction_id,
+        max_amount=proxy.max_amount,
+        leading=auction.high_bidder_id == user.id,
+        current_price=auction.current_price,
+        bid_count=auction.bid_count,
+        end_time=auction.end_time,
+        bids_placed=len(bids),
+    )
+
+
+@router.websocket("/{auction_id}/stream")
+async def stream_auction(
+    websocket: WebSocket, auction_id: int, db: AsyncSession = Depends(get_async_db)
+) -> None:
+    auction = await db.get(models.Auction, auction_id)
     if not auction:
-        raise HTTPException(status_code=404, detail="Auction not found")
+        await websocket.close(code=4404)
+        return
+    snapshot = {
+        "type": "snapshot",
+        "auction_id": auction_id,
+        "status": auction.status,
+        "current_price": auction.current_price,
+        "end_time": auction.end_time,
+    }
+    await db.close()
 
-    now = datetime.utcnow()
-    if now < auction.start_time:
-        raise HTTPException(status_code=400, detail="Auction has not started")
-    if now >= auction.end_time:
-        raise HTTPException(status_code=400, detail="Auction has ended")
-
-    highest_bid = (
-        db.query(models.Bid)
-        .filter(models.Bid.auction_id == auction_id)
-        .order_by(desc(models.Bid.amount))
-        .first()
-    )
-
-    minimum = highest_bid.amount if highest_bid else auction.starting_price
-    if amount <= minimum:
-        raise HTTPException(status_code=400, detail="Bid must be higher than current price")
-
-    bid = models.Bid(amount=amount, auction_id=auction_id, bidder_id=user.id)
-    auction.current_price = amount
-    auction.extend_for_anti_sniping(now)
-    db.add(bid)
-    db.add(auction)
-    db.commit()
-    db.refresh(auction)
-    fresh = _auction_query(db).filter(models.Auction.id == auction.id).first()
-    return _serialize_auction(fresh, datetime.utcnow())
+    await websocket.accept()
+    queue = hub.subscribe(auction_topic(auction_id))
+
+    async def forward_events() -> None:
+        try:
+            await websocket.send_text(encode_event(snapshot))
+            while True:
+                await websocket.send_text(await queue.get())
+        except (WebSocketDisconnect, RuntimeError):
+            return
+
+    async def wait_for_disconnect() -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    tasks = [
+        asyncio.create_task(forward_events()),
+        asyncio.create_task(wait_for_disconnect()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(auction_topic(auction_id), queue)
@@ -1,34 +1,114 @@
 from __future__ import annotations
 
-from datetime import timedelta
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from .. import models
-from ..auth import create_access_token, get_password_hash, verify_password
-from ..database import get_db
-from ..schemas import Token, UserCreate, UserPublic
+from .. import models, passwords
+from ..auth import (
+    Principal,
+    create_access_token,
+    decode_access_token,
+    get_current_admin,
+    get_current_principal,
+    hash_refresh_token,
+    new_refresh_token,
+    oauth2_scheme,
+    principal_cache,
+    principal_claims,
+    token_denylist,
+)
+from ..config import get_settings
+from ..database import get_async_db
+from ..schemas import RefreshRequest, Token, UserCreate, UserPublic
+from ..throttle import SlidingWindowLimiter, enforce
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+settings = get_settings()
+# Every login or registration counts against the client address; only failed
+# logins count against the account, so its owner is not locked out by success.
+ip_attempts = SlidingWindowLimiter(settings.login_ip_limit, settings.login_window_seconds)
+account_failures = SlidingWindowLimiter(
+    settings.login_account_limit, settings.login_window_seconds
+)
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _invalid_refresh_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _issue_tokens(
+    db: AsyncSession, user: models.User, family_id: Optional[str] = None
+) -> Token:
+    refresh_token, token_hash = new_refresh_token()
+    now = datetime.utcnow()
+    db.add(
+        models.RefreshToken(
+            user_id=user.id,
+            token_hash=token_hash,
+            family_id=family_id or uuid.uuid4().hex,
+            created_at=now,
+            expires_at=now + timedelta(days=settings.refresh_token_expire_days),
+        )
+    )
+    claims = principal_claims(user)
+    await db.commit()
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    return Token(
+        access_token=create_access_token(data=claims, expires_delta=access_token_expires),
+        expires_in=int(access_token_expires.total_seconds()),
+        refresh_token=refresh_token,
+    )
+
+
+async def _revoke_refresh_tokens(db: AsyncSession, *criteria) -> None:
+    await db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.revoked_at.is_(None), *criteria)
+        .values(revoked_at=datetime.utcnow())
+    )
+
 
 @router.post("/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
-def register(user_in: UserCreate, db: Session = Depends(get_db)) -> models.User:
-    existing_user = db.query(models.User).filter(models.User.email == user_in.email).first()
+async def register(
+    user_in: UserCreate, request: Request, db: AsyncSession = Depends(get_async_db)
+) -> models.User:
+    client_ip = _client_ip(request)
+    enforce(ip_attempts, client_ip)
+    ip_attempts.hit(client_ip)
+
+    existing_user = await db.scalar(
+        select(models.User.id).where(models.User.email == user_in.email)
+    )
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     is_admin = bool(user_in.is_admin)
     if is_admin:
-        existing_admin = db.query(models.User).filter(models.User.is_admin.is_(True)).first()
+        existing_admin = await db.scalar(
+            select(models.User.id).where(models.User.is_admin.is_(True)).limit(1)
+        )
         if existing_admin:
             raise HTTPException(status_code=403, detail="Admin already exists")
 
     db_user = models.User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await passwords.hash_password(user_in.password),
         display_name=user_in.display_name,
         bio=user_in.bio or "",
         location=user_in.location,
@@ -37,21 +117,112 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)) -> models.User:
         is_admin=is_admin,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 @router.post("/login", response_model=Token)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Token:
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    client_ip = _client_ip(request)
+    account = form_data.username.lower()
+    enforce(ip_attempts, client_ip)
+    enforce(account_failures, account)
+    ip_attempts.hit(client_ip)
+
+    user = await db.scalar(
+        select(models.User).where(models.User.email == form_data.username)
+    )
+    # Do not hold a connection while the hash is computed.
+    await db.commit()
+    verified, new_hash = (
+        await passwords.verify_password(form_data.password, user.hashed_password)
+        if user
+        else (False, None)
+    )
+    if not verified:
+        account_failures.hit(account)
         raise HTTPException(status_code=400, detail="Incorrect email or password")
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": str(user.id), "is_admin": user.is_admin},
-        expires_delta=access_token_expires,
+    account_failures.reset(account)
+    if new_hash:
+        user.hashed_password = new_hash
+    return await _issue_tokens(db, user)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshRequest, db: AsyncSession = Depends(get_async_db)) -> Token:
+    now = datetime.utcnow()
+    stored = await db.scalar(
+        select(models.RefreshToken)
+        .options(selectinload(models.RefreshToken.user))
+        .where(models.RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+    )
+    if stored is None or stored.expires_at <= now:
+        raise _invalid_refresh_token()
+    if stored.revoked_at is not None:
+        # A token that was already rotated came back: someone else holds a
+        # copy, so end the whole session rather than guess which side is real.
+        await _revoke_refresh_tokens(db, models.RefreshToken.family_id == stored.family_id)
+        await db.commit()
+        raise _invalid_refresh_token()
+
+    # Conditional on the token still being live, so two concurrent refreshes
+    # with the same token cannot both succeed.
+    result = await db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.id == stored.id, models.RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        raise _invalid_refresh_token()
+    return await _issue_tokens(db, stored.user, stored.family_id)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT, response_model=None)
+async def logout(
+    body: Optional[RefreshRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+) -> None:
+    token_data = decode_access_token(token)
+    if token_data and token_data.jti and token_data.expires_at:
+        token_denylist.revoke(token_data.jti, token_data.expires_at)
+    if body is not None:
+        family_id = await db.scalar(
+            select(models.RefreshToken.family_id).where(
+                models.RefreshToken.token_hash == hash_refresh_token(body.refresh_token),
+                models.RefreshToken.user_id == principal.id,
+            )
+        )
+        if family_id is not None:
+            await _revoke_refresh_tokens(db, models.RefreshToken.family_id == family_id)
+            await db.commit()
+
+
+@router.post(
+    "/users/{user_id}/revoke-sessions",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_model=None,
+)
+async def revoke_sessions(
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    _admin: Principal = Depends(get_current_admin),
+) -> None:
+    """Sign a user out everywhere: outstanding access and refresh tokens stop working."""
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(token_version=models.User.token_version + 1)
     )
-    return Token(access_token=access_token)
+    if result.rowcount != 1:
+        raise HTTPException(status_code=404, detail="User not found")
+    await _revoke_refresh_tokens(db, models.RefreshToken.user_id == user_id)
+    await db.commit()
+    principal_cache.invalidate(user_id)
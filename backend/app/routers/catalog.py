@@ -1,14 +1,20 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models
-from ..database import get_db
+from ..cache import CATALOG_NAMESPACE, json_response, response_cache
+from ..config import get_settings
+from ..database import get_async_db
 from ..schemas import CategoryPublic, SupportProgramPublic
 
 router = APIRouter(prefix="/catalog", tags=["catalog"])
 
+settings = get_settings()
+CATALOG_CACHE_CONTROL = f"public, max-age={settings.cache_catalog_ttl_seconds}"
+
 SUPPORT_PROGRAMS: list[SupportProgramPublic] = [
     SupportProgramPublic(
         slug="prime-haul",
@@ -41,14 +47,27 @@ SUPPORT_PROGRAMS: list[SupportProgramPublic] = [
 
 
 @router.get("/categories", response_model=list[CategoryPublic])
-def list_categories(db: Session = Depends(get_db)) -> list[CategoryPublic]:
-    return (
-        db.query(models.Category)
-        .order_by(models.Category.name.asc())
-        .all()
+async def list_categories(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    async def build() -> list[CategoryPublic]:
+        categories = await db.scalars(
+            select(models.Category).order_by(models.Category.name.asc())
+        )
+        return [CategoryPublic.from_orm(category) for category in categories]
+
+    cached = await response_cache.get_or_build(
+        CATALOG_NAMESPACE, "categories", settings.cache_catalog_ttl_seconds, build
     )
+    return json_response(request, cached, CATALOG_CACHE_CONTROL)
 
 
 @router.get("/support-programs", response_model=list[SupportProgramPublic])
-def list_support_programs() -> list[SupportProgramPublic]:
-    return SUPPORT_PROGRAMS
+async def list_support_programs(request: Request) -> Response:
+    cached = await response_cache.get_or_build(
+        CATALOG_NAMESPACE,
+        "support-programs",
+        settings.cache_catalog_ttl_seconds,
+        lambda: SUPPORT_PROGRAMS,
+    )
+    return json_response(request, cached, CATALOG_CACHE_CONTROL)
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
 
 from .. import models
-from ..auth import get_current_admin
+from ..auth import Principal, get_current_admin
 from ..database import get_db
 from ..schemas import ContactRequestCreate, ContactRequestPublic
 
@@ -34,7 +34,7 @@ def create_contact_request(
 @router.get("", response_model=list[ContactRequestPublic])
 def list_contact_requests(
     db: Session = Depends(get_db),
-    _admin: models.User = Depends(get_current_admin),
+    _admin: Principal = Depends(get_current_admin),
 ) -> list[ContactRequestPublic]:
     return (
         db.query(models.ContactRequest)
@@ -1,81 +1,225 @@
 from __future__ import annotations
 
-import mimetypes
-import secrets
-from pathlib import Path
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+import asyncio
+from typing import Optional
 
-from ..auth import get_current_active_user, get_current_admin
-from ..schemas import UploadResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-UPLOAD_ROOT = Path(__file__).resolve().parent.parent / "uploads"
-AVATAR_DIR = UPLOAD_ROOT / "avatars"
-AUCTION_DIR = UPLOAD_ROOT / "auctions"
+from .. import blobs, imaging, models
+from ..auth import get_current_admin, get_current_principal
+from ..cache import AUCTIONS_NAMESPACE, auction_namespace, response_cache
+from ..config import get_settings
+from ..database import get_async_db
+from ..schemas import AuctionImagePublic, BatchUploadResponse, UploadResponse
 
-for directory in (AVATAR_DIR, AUCTION_DIR):
-    directory.mkdir(parents=True, exist_ok=True)
-
-ALLOWED_CONTENT_TYPES = {
-    "image/jpeg",
-    "image/png",
-    "image/webp",
-    "image/gif",
-}
+settings = get_settings()
 
 router = APIRouter(prefix="/media", tags=["media"])
 
 
-def _extension_for(content_type: str) -> str:
-    extension = mimetypes.guess_extension(content_type)
-    if not extension:
-        if content_type == "image/jpeg":
-            return ".jpg"
-        if content_type == "image/png":
-            return ".png"
-        if content_type == "image/gif":
-            return ".gif"
-        if content_type == "image/webp":
-            return ".webp"
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Unsupported file type",
-        )
-    return extension
+async def _receive(upload: UploadFile) -> blobs.IncomingBlob:
+    return await run_in_threadpool(blobs.receive, upload.file, settings.max_upload_bytes)
 
 
-def _persist_upload(upload: UploadFile, directory: Path) -> tuple[str, int]:
-    if upload.content_type not in ALLOWED_CONTENT_TYPES:
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Unsupported file type",
+async def _render(incoming: blobs.IncomingBlob) -> models.MediaFile:
+    """Process a new upload and publish it to storage; the row is left unsaved.
+
+    The scratch copy is discarded however this ends.
+    """
+    try:
+        try:
+            processed = await imaging.process(incoming.path)
+        except imaging.ImageError:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="File is not a readable image",
+            ) from None
+        key = blobs.blob_key(incoming.sha256, incoming.extension)
+        values = blobs.media_file_values(key, incoming.path, incoming.content_type, processed)
+        await run_in_threadpool(blobs.publish, key, incoming.path, incoming.content_type, processed)
+    finally:
+        blobs.discard_local(incoming.path)
+    return models.MediaFile(**values, sha256=incoming.sha256)
+
+
+async def _discard_incoming(received: list[blobs.IncomingBlob]) -> None:
+    for incoming in received:
+        incoming.path.unlink(missing_ok=True)
+
+
+async def _leave_to_gc(db: AsyncSession, rendered: list[models.MediaFile]) -> None:
+    """Record blobs published for a failed batch as unreferenced uploads.
+
+    They are not deleted here: a concurrent upload of the same bytes publishes
+    to the same key and may already be using it. ``gc-media`` removes them
+    once they are past its grace period with ``ref_count`` still at zero.
+    Digests another request has recorded are skipped, as that request owns them.
+    """
+    media_files = models.MediaFile.__table__
+    columns = [
+        column.key
+        for column in media_files.columns
+        if column.key not in ("id", "ref_count", "created_at")
+    ]
+    for media in rendered:
+        try:
+            await db.execute(
+                insert(media_files).values({key: getattr(media, key) for key in columns})
+            )
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+
+
+async def _gather(awaitables, cleanup) -> list:
+    """Await all of ``awaitables``; if any fail, ``cleanup`` the successes and re-raise."""
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        await cleanup([result for result in results if not isinstance(result, BaseException)])
+        raise failures[0]
+    return results
+
+
+async def _store_upload(upload: UploadFile, db: AsyncSession) -> UploadResponse:
+    incoming = await _receive(upload)
+    existing = await db.scalar(
+        select(models.MediaFile).where(models.MediaFile.sha256 == incoming.sha256)
+    )
+    if existing is not None:
+        incoming.path.unlink(missing_ok=True)
+        return UploadResponse.from_orm(existing)
+
+    media = await _render(incoming)
+    db.add(media)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The same bytes were uploaded concurrently and the other request won;
+        # both wrote identical files to the same address.
+        await db.rollback()
+        media = await db.scalar(
+            select(models.MediaFile).where(models.MediaFile.sha256 == incoming.sha256)
         )
-    extension = _extension_for(upload.content_type)
-    filename = f"{secrets.token_hex(16)}{extension}"
-    destination = directory / filename
-    size = 0
-    with destination.open("wb") as buffer:
-        for chunk in iter(lambda: upload.file.read(1024 * 1024), b""):
-            size += len(chunk)
-            buffer.write(chunk)
-    upload.file.close()
-    relative_path = destination.relative_to(UPLOAD_ROOT)
-    url = f"/media/{relative_path.as_posix()}"
-    return url, size
+    return UploadResponse.from_orm(media)
 
 
 @router.post("/avatar", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
-def upload_avatar(
+async def upload_avatar(
     file: UploadFile = File(...),
-    user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_principal),
 ) -> UploadResponse:
-    url, size = _persist_upload(file, AVATAR_DIR)
-    return UploadResponse(url=url, content_type=file.content_type or "image/jpeg", size=size)
+    return await _store_upload(file, db)
 
 
 @router.post("/auction", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
-def upload_auction_media(
+async def upload_auction_media(
     file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
     admin=Depends(get_current_admin),
 ) -> UploadResponse:
-    url, size = _persist_upload(file, AUCTION_DIR)
-    return UploadResponse(url=url, content_type=file.content_type or "image/jpeg", size=size)
+    return await _store_upload(file, db)
+
+
+@router.post(
+    "/auction/batch", response_model=BatchUploadResponse, status_code=status.HTTP_201_CREATED
+)
+async def upload_auction_media_batch(
+    files: list[UploadFile] = File(...),
+    auction_id: Optional[int] = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+    admin=Depends(get_current_admin),
+) -> BatchUploadResponse:
+    """Store many photos in one request, optionally appending them to a gallery.
+
+    Items come back in upload order. With ``auction_id`` the photos become
+    that auction's next gallery positions, all in one transaction.
+    """
+    if len(files) > settings.max_upload_batch_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.max_upload_batch_files} files per batch",
+        )
+    auction = None
+    if auction_id is not None:
+        auction = await db.scalar(
+            select(models.Auction)
+            .options(selectinload(models.Auction.images))
+            .where(models.Auction.id == auction_id)
+        )
+        if auction is None:
+            raise HTTPException(status_code=404, detail="Auction not found")
+
+    received = await _gather(
+        [_receive(upload) for upload in files],
+        _discard_incoming,
+    )
+    digests = {incoming.sha256 for incoming in received}
+    media_by_digest = {
+        media.sha256: media
+        for media in await db.scalars(
+            select(models.MediaFile).where(models.MediaFile.sha256.in_(digests))
+        )
+    }
+    # One new blob per digest; repeats within the batch and known files are dropped.
+    new_uploads = {}
+    for incoming in received:
+        if incoming.sha256 in media_by_digest or incoming.sha256 in new_uploads:
+            incoming.path.unlink(missing_ok=True)
+        else:
+            new_uploads[incoming.sha256] = incoming
+    rendered = await _gather(
+        [_render(incoming) for incoming in new_uploads.values()],
+        lambda succeeded: _leave_to_gc(db, succeeded),
+    )
+    for media in rendered:
+        db.add(media)
+        media_by_digest[media.sha256] = media
+    try:
+        await db.flush()
+    except IntegrityError:
+        # Another request stored some of the same bytes first. Its rows point
+        # at the blobs just published (same content, same keys), so they stay.
+        await db.rollback()
+        await _leave_to_gc(db, rendered)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Some of these files were uploaded concurrently; retry the batch",
+        ) from None
+    items = [media_by_digest[incoming.sha256] for incoming in received]
+
+    gallery = []
+    if auction is not None:
+        position = max((image.position for image in auction.images), default=-1) + 1
+        for offset, media in enumerate(items):
+            gallery.append(
+                models.AuctionImage(
+                    url=media.url,
+                    position=position + offset,
+                    width=media.width,
+                    height=media.height,
+                    thumbnail_url=media.thumbnail_url,
+                    medium_url=media.medium_url,
+                )
+            )
+        auction.images.extend(gallery)
+        added_urls = [media.url for media in items]
+        if not auction.image_url:
+            auction.image_url = items[0].url
+            added_urls.append(items[0].url)
+        await blobs.adjust_references(db, [], added_urls)
+        auction.version = models.Auction.version + 1
+    await db.commit()
+    if auction is not None:
+        await response_cache.invalidate(AUCTIONS_NAMESPACE, auction_namespace(auction.id))
+    return BatchUploadResponse(
+        items=[UploadResponse.from_orm(media) for media in items],
+        auction_id=auction_id,
+        gallery=[AuctionImagePublic.from_orm(image) for image in gallery],
+    )
@@ -1,67 +1,306 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+import asyncio
+import json
+from typing import Optional
 
-from .. import models
-from ..auth import get_current_active_user
-from ..database import get_db
-from ..schemas import MessageCreate, MessagePublic
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from sqlalchemy import and_, desc, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from .. import conversations, models
+from ..auth import Principal, get_current_principal, principal_for_token
+from ..database import AsyncSessionLocal, get_async_db
+from ..pagination import decode_cursor, encode_cursor
+from ..realtime import encode_event, hub, user_topic
+from ..schemas import (
+    ConversationPage,
+    ConversationSummary,
+    MessageCreate,
+    MessagePage,
+    MessagePublic,
+    UserPublic,
+)
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
 
+def _message_select():
+    return select(models.Message).options(
+        selectinload(models.Message.sender),
+        selectinload(models.Message.recipient),
+    )
+
+
 @router.get("", response_model=list[MessagePublic])
-def list_messages(
+async def list_messages(
     with_user_id: int | None = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> list[MessagePublic]:
-    query = db.query(models.Message).filter(
+    query = _message_select().where(
         or_(
             models.Message.sender_id == current_user.id,
             models.Message.recipient_id == current_user.id,
         )
     )
     if with_user_id is not None:
-        query = query.filter(
+        query = query.where(
             or_(
                 models.Message.sender_id == with_user_id,
                 models.Message.recipient_id == with_user_id,
             )
         )
-    messages = query.order_by(models.Message.created_at.desc()).all()
+    messages = (await db.scalars(query.order_by(models.Message.created_at.desc()))).all()
     return messages
 
 
 @router.post("", response_model=MessagePublic)
-def send_message(
+async def send_message(
     message_in: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
 ) -> models.Message:
-    recipient = (
-        db.query(models.User).filter(models.User.id == message_in.recipient_id).first()
-    )
+    recipient = await db.get(models.User, message_in.recipient_id)
     if not recipient:
         raise HTTPException(status_code=404, detail="Recipient not found")
 
     if message_in.auction_id is not None:
-        auction = (
-            db.query(models.Auction)
-            .filter(models.Auction.id == message_in.auction_id)
-            .first()
-        )
+        auction = await db.get(models.Auction, message_in.auction_id)
         if not auction:
             raise HTTPException(status_code=404, detail="Auction not found")
-    message = models.Message(
-        body=message_in.body,
-        auction_id=message_in.auction_id,
-        sender_id=current_user.id,
-        recipient_id=message_in.recipient_id,
+    # Retried once: the first message between two users can race another
+    # request creating the same conversation.
+    for attempt in range(2):
+        try:
+            message_id = await conversations.deliver(
+                db,
+                sender_id=current_user.id,
+                recipient_id=message_in.recipient_id,
+                body=message_in.body,
+                auction_id=message_in.auction_id,
+            )
+            await db.commit()
+            break
+        except IntegrityError:
+            await db.rollback()
+            if attempt:
+                raise
+    await conversations.announce(db, [message_id])
+    return (
+        await db.scalars(_message_select().where(models.Message.id == message_id))
+    ).one()
+
+
+@router.get("/conversations", response_model=ConversationPage)
+async def list_conversations(
+    before: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+) -> ConversationPage:
+    """The inbox: conversations newest-first, with unread counts."""
+    members = models.ConversationMember
+    query = (
+        select(members)
+        .options(
+            selectinload(members.conversation).selectinload(models.Conversation.last_message),
+            selectinload(members.conversation).selectinload(models.Conversation.members),
+        )
+        .where(members.user_id == current_user.id, members.last_message_at.is_not(None))
+    )
+    if before:
+        moment, conversation_id = decode_cursor(before)
+        query = query.where(
+            or_(
+                members.last_message_at < moment,
+                and_(
+                    members.last_message_at == moment,
+                    members.conversation_id < conversation_id,
+                ),
+            )
+        )
+    rows = list(
+        (
+            await db.scalars(
+                query.order_by(
+                    desc(members.last_message_at), desc(members.conversation_id)
+                ).limit(limit + 1)
+            )
+        ).all()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].last_message_at, rows[-1].conversation_id)
+
+    def counterpart_id(row: models.ConversationMember) -> int:
+        conversation = row.conversation
+        if conversation.user_low_id == current_user.id:
+            return conversation.user_high_id
+        return conversation.user_low_id
+
+    users = {
+        user.id: user
+        for user in await db.scalars(
+            select(models.User).where(models.User.id.in_({counterpart_id(row) for row in rows}))
+        )
+    }
+    return ConversationPage(
+        items=[
+            _serialize_conversation(row, users[counterpart_id(row)]) for row in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/conversations/{conversation_id}", response_model=MessagePage)
+async def list_conversation_messages(
+    conversation_id: int,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal),
+) -> MessagePage:
+    """A thread newest-first; reading its newest page marks it read."""
+    member = await db.get(models.ConversationMember, (conversation_id, current_user.id))
+    if member is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    query = _message_select().where(models.Message.conversation_id == conversation_id)
+    if before:
+        moment, message_id = decode_cursor(before)
+        query = query.where(
+            or_(
+                models.Message.created_at < moment,
+                and_(models.Message.created_at == moment, models.Message.id < message_id),
+            )
+        )
+    messages = list(
+        (
+            await db.scalars(
+                query.order_by(desc(models.Message.created_at), desc(models.Message.id)).limit(
+                    limit + 1
+                )
+            )
+        ).all()
+    )
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id)
+    if before is None and member.unread_count:
+        await _mark_read(db, conversation_id, current_user.id)
+    return MessagePage(
+        items=[MessagePublic.from_orm(message) for message in messages],
+        next_cursor=next_cursor,
+    )
+
+
+def _serialize_conversation(
+    member: models.ConversationMember, counterpart: models.User
+) -> ConversationSummary:
+    conversation = member.conversation
+    last_message = conversation.last_message
+    counterpart_member = next(
+        (other for other in conversation.members if other.user_id == counterpart.id), None
     )
-    db.add(message)
-    db.commit()
-    db.refresh(message)
-    return message
+    return ConversationSummary(
+        id=conversation.id,
+        counterpart=UserPublic.from_orm(counterpart),
+        auction_id=conversation.auction_id,
+        last_message_at=conversation.last_message_at,
+        last_message_body=last_message.body if last_message else None,
+        last_sender_id=last_message.sender_id if last_message else None,
+        message_count=conversation.message_count,
+        unread_count=member.unread_count,
+        counterpart_last_read_at=counterpart_member.last_read_at if counterpart_member else None,
+    )
+
+
+async def _mark_read(db: AsyncSession, conversation_id: int, user_id: int) -> None:
+    read_at = await conversations.mark_read(db, conversation_id, user_id)
+    await db.commit()
+    if read_at is not None:
+        await conversations.announce_read(db, conversation_id, user_id, read_at)
+
+
+@router.websocket("/stream")
+async def stream_messages(
+    websocket: WebSocket,
+    token: str = "",
+    last_seen_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+) -> None:
+    """Push new messages, unread counts and read receipts for the caller.
+
+    Browsers cannot set headers on a WebSocket, so the access token comes in
+    the query string. With ``last_seen_id``, messages after it are replayed
+    first. Replayed and live events can overlap; clients drop message ids they
+    already have. A ``resync`` event means events were lost and the client
+    should refetch its inbox over HTTP.
+
+    Clients send ``{"type": "read", "conversation_id": ...}`` to mark a
+    conversation read while it is open.
+    """
+    principal = await principal_for_token(token, db) if token else None
+    if principal is None:
+        await websocket.close(code=4401)
+        return
+    topic = user_topic(principal.id)
+    # Subscribed before reading the backlog so nothing falls between the two.
+    queue = hub.subscribe(topic, overflow={"type": "resync"})
+    try:
+        backlog = []
+        if last_seen_id is not None:
+            backlog = await conversations.missed_events(db, principal.id, last_seen_id)
+        snapshot = await conversations.inbox_state(db, principal.id)
+        await db.close()
+        await websocket.accept()
+    except BaseException:
+        hub.unsubscribe(topic, queue)
+        raise
+
+    async def forward_events() -> None:
+        try:
+            await websocket.send_text(encode_event(snapshot))
+            if backlog is None:
+                await websocket.send_text(encode_event({"type": "resync"}))
+            else:
+                for event in backlog:
+                    await websocket.send_text(encode_event(event))
+            while True:
+                await websocket.send_text(await queue.get())
+        except (WebSocketDisconnect, RuntimeError):
+            return
+
+    async def receive_commands() -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                command = json.loads(message.get("text") or "")
+                conversation_id = int(command["conversation_id"])
+            except (ValueError, TypeError, KeyError):
+                continue
+            if command.get("type") != "read":
+                continue
+            async with AsyncSessionLocal() as session:
+                member = await session.get(
+                    models.ConversationMember, (conversation_id, principal.id)
+                )
+                if member is not None and member.unread_count:
+                    await _mark_read(session, conversation_id, principal.id)
+
+    tasks = [
+        asyncio.create_task(forward_events()),
+        asyncio.create_task(receive_commands()),
+    ]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(topic, queue)
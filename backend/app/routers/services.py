@@ -3,8 +3,8 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from .. import models
-from ..auth import get_current_admin, get_current_user_optional
+from .. import geo, models
+from ..auth import Principal, get_current_admin, get_current_principal_optional
 from ..database import get_db
 from ..schemas import (
     FinancingApplicationCreate,
@@ -24,7 +24,7 @@ router = APIRouter(prefix="/services", tags=["services"])
 def request_transport_quote(
     quote_in: TransportQuoteCreate,
     db: Session = Depends(get_db),
-    user: models.User | None = Depends(get_current_user_optional),
+    user: Principal | None = Depends(get_current_principal_optional),
 ) -> TransportQuotePublic:
     if quote_in.auction_id is not None:
         auction = (
@@ -44,6 +44,7 @@ def request_transport_quote(
         weight=quote_in.weight,
         timeline=quote_in.timeline,
         notes=quote_in.notes,
+        distance_miles=geo.route_miles(db, quote_in.origin, quote_in.destination),
         auction_id=quote_in.auction_id,
         user_id=user.id if user else None,
     )
@@ -59,7 +60,7 @@ def request_transport_quote(
 )
 def list_transport_quotes(
     db: Session = Depends(get_db),
-    _admin: models.User = Depends(get_current_admin),
+    _admin: Principal = Depends(get_current_admin),
 ) -> list[TransportQuotePublic]:
     return (
         db.query(models.TransportQuoteRequest)
@@ -76,7 +77,7 @@ def list_transport_quotes(
 def submit_financing_application(
     application_in: FinancingApplicationCreate,
     db: Session = Depends(get_db),
-    user: models.User | None = Depends(get_current_user_optional),
+    user: Principal | None = Depends(get_current_principal_optional),
 ) -> FinancingApplicationPublic:
     if application_in.auction_id is not None:
         auction = (
@@ -109,7 +110,7 @@ def submit_financing_application(
 )
 def list_financing_applications(
     db: Session = Depends(get_db),
-    _admin: models.User = Depends(get_current_admin),
+    _admin: Principal = Depends(get_current_admin),
 ) -> list[FinancingApplicationPublic]:
     return (
         db.query(models.FinancingApplication)
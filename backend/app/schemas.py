@@ -12,11 +12,21 @@ from pydantic import BaseModel, EmailStr, Field
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    expires_in: Optional[int] = None
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
     user_id: int
     is_admin: bool
+    display_name: Optional[str] = None
+    token_version: int = 0
+    jti: Optional[str] = None
+    expires_at: Optional[int] = None
 
 
 class UserBase(BaseModel):
@@ -56,6 +66,11 @@ class AuctionBase(BaseModel):
     starting_price: float
     image_url: Optional[str] = None
     location: Optional[str] = None
+    # Coordinates win; otherwise they are looked up from postal_code, or from a
+    # postal code found in location.
+    postal_code: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     start_time: datetime
     end_time: datetime
     sniping_extension_minutes: int = Field(2, ge=1, le=30)
@@ -72,6 +87,9 @@ class AuctionUpdate(BaseModel):
     description: Optional[str]
     image_url: Optional[str]
     location: Optional[str]
+    postal_code: Optional[str]
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
     start_time: Optional[datetime]
     end_time: Optional[datetime]
     sniping_extension_minutes: Optional[int]
@@ -80,6 +98,27 @@ class AuctionUpdate(BaseModel):
     category_slugs: Optional[list[str]]
 
 
+class AuctionImportError(BaseModel):
+    # Line in the uploaded file where the row starts.
+    line: int
+    errors: list[str] = Field(default_factory=list)
+
+
+class AuctionImportWarning(BaseModel):
+    # The row was imported; this notes something it lacks.
+    line: int
+    message: str
+
+
+class AuctionImportReport(BaseModel):
+    created: int = 0
+    failed: int = 0
+    auction_ids: list[int] = Field(default_factory=list)
+    # The first failed rows; ``failed`` counts them all.
+    errors: list[AuctionImportError] = Field(default_factory=list)
+    warnings: list[AuctionImportWarning] = Field(default_factory=list)
+
+
 class BidPublic(BaseModel):
     id: int
     amount: float
@@ -90,10 +129,45 @@ class BidPublic(BaseModel):
         orm_mode = True
 
 
+class BidPage(BaseModel):
+    items: list[BidPublic] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class BidReceipt(BaseModel):
+    id: int
+    auction_id: int
+    amount: float
+    created_at: datetime
+    current_price: float
+    bid_count: int
+    end_time: datetime
+    # May differ from the bidder when a standing proxy answered the bid.
+    high_bidder_id: Optional[int] = None
+
+
+class ProxyBidCreate(BaseModel):
+    max_amount: float = Field(..., gt=0)
+
+
+class ProxyBidReceipt(BaseModel):
+    auction_id: int
+    max_amount: float
+    leading: bool
+    current_price: float
+    bid_count: int
+    end_time: datetime
+    bids_placed: int = 0
+
+
 class AuctionImagePublic(BaseModel):
     id: int
     url: str
     position: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -105,16 +179,68 @@ class AuctionPublic(AuctionBase):
     current_price: float
     created_at: datetime
     updated_at: datetime
+    bid_count: int = 0
+    high_bidder_id: Optional[int] = None
+    last_bid_at: Optional[datetime] = None
+    version: int = 1
+    closed_at: Optional[datetime] = None
+    winning_bid_id: Optional[int] = None
     bids: list[BidPublic] = Field(default_factory=list)
     gallery: list[AuctionImagePublic] = Field(default_factory=list)
     status: str
     time_remaining_seconds: int
     categories: list["CategoryPublic"] = Field(default_factory=list)
+    # Only on create and update responses, e.g. a postal code that could not
+    # be geocoded.
+    warnings: list[str] = Field(default_factory=list)
 
     class Config:
         orm_mode = True
 
 
+class AuctionSummary(BaseModel):
+    id: int
+    title: str
+    thumbnail_url: Optional[str]
+    location: Optional[str]
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    # Only when the listing was filtered by distance from a point.
+    distance_miles: Optional[float] = None
+    current_price: float
+    start_time: datetime
+    end_time: datetime
+    status: str
+    time_remaining_seconds: int
+    bid_count: int
+    category_slugs: list[str] = Field(default_factory=list)
+
+
+class AuctionPage(BaseModel):
+    items: list[AuctionSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class AuctionSearchResult(AuctionSummary):
+    # HTML-escaped text with matches wrapped in <mark>.
+    title_html: str
+    snippet_html: str
+
+
+class SearchFacet(BaseModel):
+    slug: str
+    name: str
+    count: int
+
+
+class AuctionSearchPage(BaseModel):
+    items: list[AuctionSearchResult] = Field(default_factory=list)
+    facets: list[SearchFacet] = Field(default_factory=list)
+    # Only on the first page; later pages leave these empty.
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
 class CategoryPublic(BaseModel):
     id: int
     name: str
@@ -136,6 +262,7 @@ class MessagePublic(BaseModel):
     body: str
     created_at: datetime
     auction_id: Optional[int]
+    conversation_id: Optional[int] = None
     sender: UserPublic
     recipient: UserPublic
 
@@ -143,10 +270,46 @@ class MessagePublic(BaseModel):
         orm_mode = True
 
 
+class MessagePage(BaseModel):
+    items: list[MessagePublic] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+class ConversationSummary(BaseModel):
+    id: int
+    counterpart: UserPublic
+    auction_id: Optional[int] = None
+    last_message_at: Optional[datetime] = None
+    last_message_body: Optional[str] = None
+    last_sender_id: Optional[int] = None
+    message_count: int = 0
+    unread_count: int = 0
+    counterpart_last_read_at: Optional[datetime] = None
+
+
+class ConversationPage(BaseModel):
+    items: list[ConversationSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
 class UploadResponse(BaseModel):
     url: str
     content_type: str
     size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class BatchUploadResponse(BaseModel):
+    items: list[UploadResponse] = Field(default_factory=list)
+    auction_id: Optional[int] = None
+    # Gallery rows added to the auction, when one was given.
+    gallery: list[AuctionImagePublic] = Field(default_factory=list)
 
 
 class EmailSubscriptionCreate(BaseModel):
@@ -177,6 +340,7 @@ class TransportQuoteCreate(BaseModel):
 
 class TransportQuotePublic(TransportQuoteCreate):
     id: int
+    distance_miles: Optional[float] = None
     created_at: datetime
 
     class Config:
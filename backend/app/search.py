@@ -0,0 +1,272 @@
+"""Full-text search over the auction catalog.
+
+A ``SearchIndex`` owns both the index and the queries against it. The SQLite
+implementation keeps an FTS5 table of each auction's title, description,
+location and category names. Triggers on ``auctions``, ``auction_category_links``
+and ``categories`` keep it current in the same transaction as the write. Bids
+only touch price columns, so they never rewrite the index. Results are ranked
+by BM25 with title matches weighted highest.
+
+Other databases plug in a ``SearchIndex`` of their own (Postgres: a
+``tsvector`` column with a GIN index, ``ts_rank_cd`` and ``ts_headline``) and
+return it from ``index_for``.
+"""
+from __future__ import annotations
+
+import html
+import re
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Bounds the work one query can ask of the index.
+MAX_TERMS = 16
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Markers the index wraps around hits, swapped for <mark> after escaping. A
+# listing that itself contains one only gains a stray highlight.
+_OPEN, _CLOSE = "\x02", "\x03"
+
+
+class SearchHit(NamedTuple):
+    auction_id: int
+    # Opaque to callers: only the index that produced it orders by it.
+    score: float
+    title_html: str
+    snippet_html: str
+
+
+class Facet(NamedTuple):
+    slug: str
+    name: str
+    count: int
+
+
+def parse_terms(query: str) -> list[str]:
+    """The words of a user query; punctuation and operators are dropped."""
+    return [word.lower() for word in _WORD.findall(query)][:MAX_TERMS]
+
+
+def markup(fragment: Optional[str]) -> str:
+    """Escape indexed text and turn the match markers into ``<mark>`` tags."""
+    escaped = html.escape(fragment or "")
+    return escaped.replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+class SearchIndex:
+    def install(self, connection: Connection) -> None:
+        """Create the index and whatever keeps it in sync, then fill it."""
+        raise NotImplementedError
+
+    def rebuild(self, connection: Connection) -> None:
+        raise NotImplementedError
+
+    async def search(
+        self,
+        db,
+        terms: list[str],
+        *,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        after: Optional[tuple[float, int]] = None,
+        limit: int = 24,
+    ) -> list[SearchHit]:
+        """Best matches first, continuing after the ``(score, id)`` of a previous hit."""
+        raise NotImplementedError
+
+    async def count(
+        self,
+        db,
+        terms: list[str],
+        *,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> int:
+        raise NotImplementedError
+
+    async def facets(
+        self, db, terms: list[str], *, status: Optional[str] = None
+    ) -> list[Facet]:
+        """Matches per category, ignoring any category filter so every choice shows its count."""
+        raise NotImplementedError
+
+
+def _categories_of(auction_id: str) -> str:
+    return (
+        "(SELECT coalesce(group_concat(categories.name, ' '), '')"
+        " FROM auction_category_links"
+        " JOIN categories ON categories.id = auction_category_links.category_id"
+        f" WHERE auction_category_links.auction_id = {auction_id})"
+    )
+
+
+class SqliteSearchIndex(SearchIndex):
+    table = "auction_search"
+    # bm25 weights for title, description, location and categories.
+    weights = (10.0, 1.0, 2.0, 4.0)
+    snippet_tokens = 24
+
+    def _ddl(self) -> list[str]:
+        table = self.table
+        return [
+            f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(
+                title, description, location, categories,
+                tokenize = 'porter unicode61 remove_diacritics 2'
+            )""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_auction_insert
+                AFTER INSERT ON auctions BEGIN
+                INSERT INTO {table} (rowid, title, description, location, categories)
+                VALUES (new.id, new.title, new.description, coalesce(new.location, ''),
+                        {_categories_of("new.id")});
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_auction_update
+                AFTER UPDATE OF title, description, location ON auctions BEGIN
+                UPDATE {table}
+                SET title = new.title,
+                    description = new.description,
+                    location = coalesce(new.location, '')
+                WHERE rowid = new.id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_auction_delete
+                AFTER DELETE ON auctions BEGIN
+                DELETE FROM {table} WHERE rowid = old.id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_link_insert
+                AFTER INSERT ON auction_category_links BEGIN
+                UPDATE {table} SET categories = {_categories_of("new.auction_id")}
+                WHERE rowid = new.auction_id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_link_delete
+                AFTER DELETE ON auction_category_links BEGIN
+                UPDATE {table} SET categories = {_categories_of("old.auction_id")}
+                WHERE rowid = old.auction_id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_category_rename
+                AFTER UPDATE OF name ON categories BEGIN
+                UPDATE {table} SET categories = {_categories_of(f"{table}.rowid")}
+                WHERE rowid IN (
+                    SELECT auction_id FROM auction_category_links WHERE category_id = new.id
+                );
+            END""",
+        ]
+
+    def install(self, connection: Connection) -> None:
+        for statement in self._ddl():
+            connection.execute(text(statement))
+        self.rebuild(connection)
+
+    def rebuild(self, connection: Connection) -> None:
+        table = self.table
+        connection.execute(text(f"DELETE FROM {table}"))
+        connection.execute(
+            text(
+                f"""INSERT INTO {table} (rowid, title, description, location, categories)
+                SELECT auctions.id, auctions.title, auctions.description,
+                       coalesce(auctions.location, ''), {_categories_of("auctions.id")}
+                FROM auctions"""
+            )
+        )
+        connection.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+
+    @staticmethod
+    def _match(terms: list[str]) -> str:
+        # Every word must appear; the last one may be a prefix of a longer word
+        # so results keep up while the user is still typing.
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    def _filtered(
+        self, columns: str, status: Optional[str], category: Optional[str]
+    ) -> str:
+        table = self.table
+        sql = f"SELECT {columns} FROM {table}"
+        if status:
+            sql += f" JOIN auctions ON auctions.id = {table}.rowid"
+        sql += f" WHERE {table} MATCH :match"
+        if status:
+            sql += " AND auctions.status = :status"
+        if category:
+            sql += (
+                " AND EXISTS (SELECT 1 FROM auction_category_links"
+                " JOIN categories ON categories.id = auction_category_links.category_id"
+                f" WHERE auction_category_links.auction_id = {table}.rowid"
+                " AND categories.slug = :category)"
+            )
+        return sql
+
+    async def search(
+        self,
+        db,
+        terms: list[str],
+        *,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        after: Optional[tuple[float, int]] = None,
+        limit: int = 24,
+    ) -> list[SearchHit]:
+        table = self.table
+        weights = ", ".join(str(weight) for weight in self.weights)
+        ranked = self._filtered(
+            f"{table}.rowid AS auction_id,"
+            f" bm25({table}, {weights}) AS score,"
+            f" highlight({table}, 0, char(2), char(3)) AS title,"
+            f" snippet({table}, 1, char(2), char(3), '…', {self.snippet_tokens}) AS snippet",
+            status,
+            category,
+        )
+        # bm25 is lower for better matches, so pages continue upwards.
+        sql = f"SELECT auction_id, score, title, snippet FROM ({ranked})"
+        params = {"match": self._match(terms), "status": status, "category": category}
+        if after is not None:
+            sql += (
+                " WHERE score > :after_score"
+                " OR (score = :after_score AND auction_id > :after_id)"
+            )
+            params.update(after_score=after[0], after_id=after[1])
+        sql += " ORDER BY score, auction_id LIMIT :limit"
+        params["limit"] = limit
+        rows = await db.execute(text(sql), params)
+        return [
+            SearchHit(row.auction_id, row.score, markup(row.title), markup(row.snippet))
+            for row in rows
+        ]
+
+    async def count(
+        self,
+        db,
+        terms: list[str],
+        *,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> int:
+        sql = self._filtered("count(*)", status, category)
+        params = {"match": self._match(terms), "status": status, "category": category}
+        return (await db.execute(text(sql), params)).scalar_one()
+
+    async def facets(
+        self, db, terms: list[str], *, status: Optional[str] = None
+    ) -> list[Facet]:
+        table = self.table
+        sql = (
+            "SELECT categories.slug, categories.name, count(*) AS hits"
+            f" FROM {table}"
+            f" JOIN auction_category_links ON auction_category_links.auction_id = {table}.rowid"
+            " JOIN categories ON categories.id = auction_category_links.category_id"
+        )
+        if status:
+            sql += f" JOIN auctions ON auctions.id = {table}.rowid"
+        sql += f" WHERE {table} MATCH :match"
+        if status:
+            sql += " AND auctions.status = :status"
+        sql += " GROUP BY categories.id ORDER BY hits DESC, categories.name"
+        rows = await db.execute(text(sql), {"match": self._match(terms), "status": status})
+        return [Facet(row.slug, row.name, row.hits) for row in rows]
+
+
+def index_for(dialect: str) -> Optional[SearchIndex]:
+    """The search index for a database dialect, or None where search is unsupported."""
+    if dialect == "sqlite":
+        return SqliteSearchIndex()
+    return None
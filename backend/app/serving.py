@@ -0,0 +1,189 @@
+"""Serving uploaded media.
+
+With local storage, ``MediaFiles`` replaces a plain ``StaticFiles`` mount.
+Content-addressed blobs never change, so they are cached for a year as
+``immutable``. Clients get ``304`` responses for conditional requests and
+``206`` responses for single byte ranges. With ``MEDIA_ACCEL`` set, the worker
+only resolves the path and returns an ``X-Accel-Redirect`` or ``X-Sendfile``
+header. The fronting web server then streams the bytes, including ranges and
+revalidation.
+
+With S3 storage, ``PresignedMedia`` answers ``/media/<key>`` with a redirect
+to a pre-signed URL. Browsers cache the redirect, so repeat views never reach
+the app.
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+from typing import Optional
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+from .config import get_settings
+from .storage import S3Storage, cache_control_for
+
+settings = get_settings()
+
+ACCEL_HEADERS = {"x-accel-redirect": "X-Accel-Redirect", "x-sendfile": "X-Sendfile"}
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(value: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """The inclusive ``(start, end)`` of a single-range ``Range`` header.
+
+    Returns ``None`` when the whole file should be sent, which includes
+    headers this server does not understand and multi-range requests.
+    """
+    if not value or not value.startswith("bytes="):
+        return None
+    spec = value[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, _, last = spec.partition("-")
+    try:
+        start = int(first) if first else None
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start is None:
+        # "bytes=-N" is the last N bytes.
+        if not end:
+            raise RangeNotSatisfiable(value)
+        return max(size - end, 0), size - 1
+    end = size - 1 if end is None else min(end, size - 1)
+    if start > end or start >= size:
+        raise RangeNotSatisfiable(value)
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """A ``206`` carrying ``[start, end]`` of a file, read off the event loop."""
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self, path: str, start: int, end: int, size: int, headers: dict[str, str]
+    ) -> None:
+        super().__init__(
+            status_code=206,
+            headers={
+                **headers,
+                "content-range": f"bytes {start}-{end}/{size}",
+                "content-length": str(end - start + 1),
+            },
+        )
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, "rb") as file:
+            await file.seek(self.start)
+            while remaining:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": remaining > 0}
+                )
+        if remaining:
+            # The file shrank underneath us; end the body rather than hang.
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class MediaFiles(StaticFiles):
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = os.fspath(full_path)
+        key = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        headers = {"cache-control": cache_control_for(key, settings.media_max_age_seconds)}
+        if settings.media_accel:
+            return self.accel_response(key, full_path, headers)
+
+        request_headers = Headers(scope=scope)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers.update(headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if status_code != 200:
+            return response
+        response.headers["accept-ranges"] = "bytes"
+
+        if_range = request_headers.get("if-range")
+        if if_range and if_range not in (
+            response.headers["etag"],
+            response.headers["last-modified"],
+        ):
+            return response
+        size = stat_result.st_size
+        try:
+            byte_range = parse_range(request_headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={**headers, "content-range": f"bytes */{size}"},
+            )
+        if byte_range is None:
+            return response
+        range_headers = {
+            key: response.headers[key]
+            for key in ("cache-control", "etag", "last-modified", "accept-ranges", "content-type")
+        }
+        return FileRangeResponse(full_path, *byte_range, size, range_headers)
+
+    def accel_response(self, key: str, full_path: str, headers: dict[str, str]) -> Response:
+        header = ACCEL_HEADERS[settings.media_accel.lower()]
+        if header == "X-Accel-Redirect":
+            target = settings.media_accel_prefix.rstrip("/") + "/" + key
+        else:
+            target = full_path
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return Response(headers={**headers, header: target}, media_type=media_type)
+
+
+class PresignedMedia:
+    """Redirect ``/media/<key>`` to a pre-signed URL on the object store."""
+
+    def __init__(self, storage: S3Storage) -> None:
+        self.storage = storage
+        # Reused until comfortably before the signature expires.
+        self.max_age = max(storage.presign_seconds // 2, 0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = Response(status_code=405, headers={"allow": "GET, HEAD"})
+        else:
+            key = scope["path"][len(scope.get("root_path", "")):].lstrip("/")
+            if not key or ".." in key.split("/"):
+                response = Response(status_code=404)
+            else:
+                # Signing is local computation; nothing is fetched here.
+                response = RedirectResponse(
+                    self.storage.presigned_url(key),
+                    status_code=307,
+                    headers={"cache-control": f"private, max-age={self.max_age}"},
+                )
+        await response(scope, receive, send)
@@ -0,0 +1,204 @@
+"""Where uploaded media lives.
+
+Media is addressed by key (``blobs/ab/<sha256>.jpg``) and exposed to clients
+as ``/media/<key>``, which is what the database stores. With the local driver
+that path is served from ``MEDIA_ROOT`` by this app. With the S3 driver it
+answers with a redirect to a pre-signed URL, and the bytes come straight from
+the object store. Every app node can then share one bucket.
+"""
+from __future__ import annotations
+
+import os
+import secrets
+import shutil
+from pathlib import Path, PurePosixPath
+from typing import Iterator, Optional
+
+from .config import get_settings
+
+DEFAULT_ROOT = Path(__file__).resolve().parent / "uploads"
+URL_PREFIX = "/media/"
+
+# Objects under blobs/ are named by their content and never change.
+IMMUTABLE_PREFIX = "blobs/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def media_url(key: str) -> str:
+    return f"{URL_PREFIX}{key}"
+
+
+def key_for(url: str) -> Optional[str]:
+    """The storage key behind a ``/media/...`` URL, or None for other URLs."""
+    if not url.startswith(URL_PREFIX):
+        return None
+    key = PurePosixPath(url[len(URL_PREFIX):])
+    if key.is_absolute() or ".." in key.parts:
+        return None
+    return key.as_posix()
+
+
+def cache_control_for(key: str, max_age: int) -> str:
+    if key.startswith(IMMUTABLE_PREFIX):
+        return IMMUTABLE_CACHE_CONTROL
+    # Files uploaded before content addressing can be rewritten in place.
+    return f"public, max-age={max_age}"
+
+
+class Storage:
+    """A flat namespace of immutable-by-convention objects."""
+
+    def put(self, key: str, path: Path, content_type: str) -> None:
+        """Store the local file ``path`` under ``key``; ``path`` is consumed."""
+        raise NotImplementedError
+
+    def fetch(self, key: str, path: Path) -> None:
+        """Copy the object to the local file ``path``."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, path: Path, content_type: str) -> None:
+        destination = self.path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # Moved beside the destination first so readers never see half a file,
+        # even when the scratch directory is on another filesystem.
+        staged = destination.with_name(f".{destination.name}.{secrets.token_hex(4)}.tmp")
+        shutil.move(path, staged)
+        os.replace(staged, destination)
+
+    def fetch(self, key: str, path: Path) -> None:
+        shutil.copyfile(self.path(key), path)
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        for path in sorted(self.root.rglob("*")):
+            if path.is_file() and not path.name.startswith("."):
+                key = path.relative_to(self.root).as_posix()
+                if key.startswith(prefix):
+                    yield key
+
+
+class S3Storage(Storage):
+    """Any S3-compatible store: AWS, MinIO, Ceph, R2 and the like.
+
+    Files over ``multipart_threshold`` are sent as multipart uploads in
+    parallel parts; downloads are pre-signed GET URLs valid for
+    ``presign_seconds``.
+    """
+
+    multipart_threshold = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        key_prefix: str = "",
+        force_path_style: bool = False,
+        presign_seconds: int = 3600,
+        max_age: int = 86400,
+    ) -> None:
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError("MEDIA_STORAGE=s3 requires the 'boto3' package") from exc
+        self.bucket = bucket
+        self.key_prefix = key_prefix
+        self.presign_seconds = presign_seconds
+        self.max_age = max_age
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": "path" if force_path_style else "auto"},
+            ),
+        )
+        self._transfer = TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_threshold,
+        )
+
+    def _object(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    def put(self, key: str, path: Path, content_type: str) -> None:
+        self._client.upload_file(
+            str(path),
+            self.bucket,
+            self._object(key),
+            ExtraArgs={
+                "ContentType": content_type,
+                "CacheControl": cache_control_for(key, self.max_age),
+            },
+            Config=self._transfer,
+        )
+        path.unlink(missing_ok=True)
+
+    def fetch(self, key: str, path: Path) -> None:
+        self._client.download_file(self.bucket, self._object(key), str(path))
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self._object(key))
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=self._object(prefix))
+        for page in pages:
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.key_prefix):]
+
+    def presigned_url(self, key: str) -> str:
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object(key)},
+            ExpiresIn=self.presign_seconds,
+        )
+
+
+def _build_storage() -> Storage:
+    settings = get_settings()
+    if settings.media_storage == "s3":
+        if not settings.s3_bucket:
+            raise RuntimeError("MEDIA_STORAGE=s3 requires S3_BUCKET")
+        return S3Storage(
+            settings.s3_bucket,
+            endpoint_url=settings.s3_endpoint_url,
+            region=settings.s3_region,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            key_prefix=settings.s3_key_prefix,
+            force_path_style=settings.s3_force_path_style,
+            presign_seconds=settings.s3_presign_seconds,
+            max_age=settings.media_max_age_seconds,
+        )
+    if settings.media_storage != "local":
+        raise RuntimeError(f"Unknown MEDIA_STORAGE {settings.media_storage!r}")
+    return LocalStorage(Path(settings.media_root) if settings.media_root else DEFAULT_ROOT)
+
+
+media_storage = _build_storage()
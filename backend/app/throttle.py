@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+
+class SlidingWindowLimiter:
+    """Counts events per key over the last ``window`` seconds."""
+
+    def __init__(self, limit: int, window: float) -> None:
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._events: defaultdict[str, deque[float]] = defaultdict(deque)
+
+    def _trim(self, key: str, now: float) -> deque[float]:
+        events = self._events[key]
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+        return events
+
+    def retry_after(self, key: str) -> Optional[int]:
+        """Seconds until ``key`` may try again, or None if it is under the limit."""
+        now = time.monotonic()
+        with self._lock:
+            events = self._trim(key, now)
+            if len(events) < self.limit:
+                return None
+            return max(int(events[0] + self.window - now) + 1, 1)
+
+    def hit(self, key: str) -> None:
+        with self._lock:
+            self._events[key].append(time.monotonic())
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+
+def enforce(limiter: SlidingWindowLimiter, key: str) -> None:
+    retry_after = limiter.retry_after(key)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,177 @@
+"""Fire concurrent bids at one lot and check the auction stays consistent.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bid_storm
+    python -m benchmarks.bid_storm --threads 128 --bids 10000
+
+The app is served by uvicorn on a local port and every client thread posts
+bids over HTTP, so requests race exactly as they would from real browsers.
+The run fails unless every response is a 200 or a 409, ``bid_count`` matches
+the number of bid rows, and the bid history rises strictly. The database is
+a throwaway file unless ``DATABASE_URL`` is already set.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    _workdir = tempfile.mkdtemp(prefix="fes-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/bench.db"
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app import migrations, models  # noqa: E402
+from app.auth import create_access_token, principal_claims  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+# Shared so most bids outbid the one before and late arrivals lose with a 409.
+_amounts = itertools.count(1)
+
+
+def _seed(bidder_count: int) -> tuple[int, list[str]]:
+    migrations.upgrade(engine)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        owner = models.User(email="seller@example.com", hashed_password="x", display_name="Seller")
+        bidders = [
+            models.User(
+                email=f"bidder{index}@example.com", hashed_password="x", display_name=f"Bidder {index}"
+            )
+            for index in range(bidder_count)
+        ]
+        db.add_all([owner, *bidders])
+        db.flush()
+        auction = models.Auction(
+            title="Storm lot",
+            description="Benchmark lot",
+            starting_price=0,
+            current_price=0,
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(days=1),
+            owner_id=owner.id,
+        )
+        db.add(auction)
+        db.commit()
+        return auction.id, [create_access_token(principal_claims(bidder)) for bidder in bidders]
+
+
+def _serve() -> tuple[uvicorn.Server, threading.Thread, str]:
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    host, port = listener.getsockname()
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [listener]})
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://{host}:{port}"
+
+
+def _bidder(
+    base_url: str, auction_id: int, token: str, bids: int, statuses: Counter, lock: threading.Lock
+) -> None:
+    seen: Counter = Counter()
+    headers = {"Authorization": f"Bearer {token}"}
+    with httpx.Client(base_url=base_url, headers=headers, timeout=60) as client:
+        for _ in range(bids):
+            response = client.post(f"/auctions/{auction_id}/bids", params={"amount": next(_amounts)})
+            seen[response.status_code] += 1
+    with lock:
+        statuses.update(seen)
+
+
+def _check(auction_id: int, statuses: Counter) -> list[str]:
+    problems = [
+        f"{count} responses with status {code}"
+        for code, count in sorted(statuses.items())
+        if code not in (200, 409)
+    ]
+    with SessionLocal() as db:
+        auction = db.get(models.Auction, auction_id)
+        history = db.execute(
+            select(models.Bid.amount, models.Bid.bidder_id)
+            .where(models.Bid.auction_id == auction_id)
+            .order_by(models.Bid.id)
+        ).all()
+    if auction.bid_count != len(history):
+        problems.append(f"bid_count is {auction.bid_count} but {len(history)} bids were stored")
+    if len(history) != statuses[200]:
+        problems.append(f"{statuses[200]} bids were accepted but {len(history)} were stored")
+    for (before, _), (after, _) in zip(history, history[1:]):
+        if after <= before:
+            problems.append(f"bid history falls from {before:.2f} to {after:.2f}")
+            break
+    if history:
+        top_amount, top_bidder = history[-1]
+        if (auction.current_price, auction.high_bidder_id) != (top_amount, top_bidder):
+            problems.append(
+                f"auction shows {auction.current_price:.2f} by user {auction.high_bidder_id}, "
+                f"last bid is {top_amount:.2f} by user {top_bidder}"
+            )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--bids", type=int, default=3000, help="total across all threads")
+    parser.add_argument("--bidders", type=int, default=8)
+    args = parser.parse_args()
+
+    auction_id, tokens = _seed(args.bidders)
+    server, server_thread, base_url = _serve()
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+    share, extra = divmod(args.bids, args.threads)
+    threads = [
+        threading.Thread(
+            target=_bidder,
+            args=(
+                base_url,
+                auction_id,
+                tokens[index % len(tokens)],
+                share + (index < extra),
+                statuses,
+                lock,
+            ),
+        )
+        for index in range(args.threads)
+    ]
+    started = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.should_exit = True
+        server_thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = "  ".join(f"{code}={count}" for code, count in sorted(statuses.items()))
+    print(f"threads={args.threads} bids={sum(statuses.values())}  {summary}")
+    print(f"bids/s:   {sum(statuses.values()) / elapsed:10.1f}")
+    problems = _check(auction_id, statuses)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        raise SystemExit(1)
+    print("ok: bid_count matches the bid rows and the history rises strictly")
+
+
+if __name__ == "__main__":
+    main()
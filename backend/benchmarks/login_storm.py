@@ -0,0 +1,122 @@
+"""Measure bid latency while the same worker is flooded with logins.
+
+Run from ``backend/``::
+
+    python -m benchmarks.login_storm
+    PASSWORD_HASH_WORKERS=0 python -m benchmarks.login_storm   # hash on threads
+
+Requests go through the ASGI app in-process, so bids and logins share one
+event loop exactly as they would in a single uvicorn worker. The database is
+a throwaway file unless ``DATABASE_URL`` is already set.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    _workdir = tempfile.mkdtemp(prefix="fes-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/bench.db"
+# The storm would otherwise be throttled away after a few attempts.
+os.environ.setdefault("LOGIN_IP_LIMIT", "1000000")
+os.environ.setdefault("LOGIN_ACCOUNT_LIMIT", "1000000")
+
+import httpx  # noqa: E402
+
+from app import migrations, models, passwords  # noqa: E402
+from app.auth import create_access_token, principal_claims  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+# Shared so every bid in the run outbids the one before it.
+_amounts = itertools.count(1)
+
+
+async def _seed() -> tuple[int, str]:
+    migrations.upgrade(engine)
+    hashed = await passwords.hash_password(PASSWORD)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        bidder = models.User(email="bidder@example.com", hashed_password=hashed, display_name="Bidder")
+        db.add(bidder)
+        db.flush()
+        auction = models.Auction(
+            title="Storm lot",
+            description="Benchmark lot",
+            starting_price=0,
+            current_price=0,
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(days=1),
+            owner_id=bidder.id,
+        )
+        db.add(auction)
+        db.commit()
+        return auction.id, create_access_token(principal_claims(bidder))
+
+
+async def _bidder(
+    client: httpx.AsyncClient, auction_id: int, token: str, seconds: float
+) -> list[float]:
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.post(
+            f"/auctions/{auction_id}/bids",
+            params={"amount": next(_amounts)},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return latencies
+
+
+async def _login_storm(client: httpx.AsyncClient, seconds: float, counter: list[int]) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        await client.post(
+            "/auth/login", data={"username": "bidder@example.com", "password": PASSWORD}
+        )
+        counter[0] += 1
+
+
+def _report(label: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<14} bids={len(latencies):6d}  p50={p50:7.1f}ms  p99={p99:7.1f}ms")
+
+
+async def run(args: argparse.Namespace) -> None:
+    auction_id, token = await _seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        _report("baseline", await _bidder(client, auction_id, token, args.seconds))
+        logins = [0]
+        storm = [
+            asyncio.create_task(_login_storm(client, args.seconds, logins))
+            for _ in range(args.logins)
+        ]
+        latencies = await _bidder(client, auction_id, token, args.seconds)
+        await asyncio.gather(*storm)
+        _report("login storm", latencies)
+        print(f"logins/s: {logins[0] / args.seconds:.1f} ({args.logins} concurrent clients)")
+    passwords.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Check ``bidding.resolve_proxies`` against a proxy war fought one step at a time.
+
+Run from ``backend/``::
+
+    python -m benchmarks.proxy_war
+    python -m benchmarks.proxy_war --cases 1000000 --seed 7
+
+The reference war lets each outbid proxy answer with one increment over the
+price (or its whole maximum, if that is less) until nobody can answer. Cases
+are drawn from a seeded generator that favours equal maximums, prices and
+maximums on and around the ``BID_INCREMENTS`` boundaries, and proxies that
+already lead or are already beaten. Both must name the same winner. The price
+must match exactly whenever the runner-up reached its maximum in the war;
+otherwise the war stops on the increment ladder somewhere between the
+runner-up's maximum and one increment past it, and ``resolve_proxies``
+charges the full increment (see its docstring), so only that range is checked.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from typing import Optional
+
+from app.bidding import increment_for, resolve_proxies
+from app.config import get_settings
+
+# Bidder id of a plain bid already standing when the proxies are resolved.
+EXPLICIT_BIDDER = 99
+
+
+def _war(
+    price: float, high_bidder_id: Optional[int], proxies: list[tuple[int, float]]
+) -> tuple[float, Optional[int], Optional[float]]:
+    """Final price and leader, and the runner-up's last bid in the war, if any."""
+    rank = {bidder: index for index, (bidder, _) in enumerate(proxies)}
+    runner_id = proxies[1][0] if len(proxies) > 1 else None
+    runner_bid = None
+    # Only a lead taken during the war can be claimed at an equal amount; a
+    # bid standing beforehand has to be beaten outright.
+    fought = False
+    while True:
+        for bidder, maximum in proxies:
+            if bidder == high_bidder_id:
+                continue
+            amount = round(min(maximum, price + increment_for(price)), 2)
+            if amount > price:
+                break
+            if fought and amount == price and rank[bidder] < rank[high_bidder_id]:
+                # Equal maximums: the earlier proxy keeps the lead.
+                break
+        else:
+            return price, high_bidder_id, runner_bid
+        price, high_bidder_id, fought = amount, bidder, True
+        if bidder == runner_id:
+            runner_bid = amount
+
+
+def _money(rng: random.Random, boundaries: list[float]) -> float:
+    if rng.random() < 0.5:
+        edge = rng.choice(boundaries)
+        return max(0.0, round(edge + rng.choice([-1, -0.01, 0, 0.01, 1]) * rng.randint(0, 3), 2))
+    return round(rng.uniform(0, rng.choice(boundaries[1:]) * 1.2), rng.choice([0, 2]))
+
+
+def _case(
+    rng: random.Random, boundaries: list[float]
+) -> tuple[float, Optional[int], list[tuple[int, float]]]:
+    maximums: list[float] = []
+    for _ in range(rng.randint(1, 4)):
+        if maximums and rng.random() < 0.3:
+            maximums.append(rng.choice(maximums))
+        else:
+            maximums.append(_money(rng, boundaries))
+    bidders = rng.sample(range(1, 10), len(maximums))
+    # Stable sort: among equal maximums the earlier proxy keeps precedence.
+    proxies = sorted(zip(bidders, maximums), key=lambda proxy: -proxy[1])
+    price = min(_money(rng, boundaries), max(maximums) + rng.choice([0, 0, 1]))
+    if rng.random() < 0.3:
+        price = rng.choice(maximums)
+    high_bidder_id = rng.choice([None, EXPLICIT_BIDDER, *bidders])
+    return price, high_bidder_id, proxies
+
+
+def _problems(
+    price: float, high_bidder_id: Optional[int], proxies: list[tuple[int, float]]
+) -> tuple[list[str], bool]:
+    """What is wrong with the resolution, and whether the price had to match exactly."""
+    problems = []
+    bids = resolve_proxies(price, high_bidder_id, proxies)
+    maximums = dict(proxies)
+    previous = price
+    for bidder, amount in bids:
+        if amount <= previous:
+            problems.append(f"bid {amount} by {bidder} does not beat {previous}")
+        if amount > maximums[bidder]:
+            problems.append(f"bid {amount} by {bidder} exceeds its maximum")
+        previous = amount
+    resolved_price, resolved_leader = bids[-1][::-1] if bids else (price, high_bidder_id)
+
+    war_price, war_leader, runner_bid = _war(price, high_bidder_id, proxies)
+    exact = len(proxies) == 1 or proxies[1][1] <= price or runner_bid == proxies[1][1]
+    if resolved_leader != war_leader:
+        problems.append(f"leader {resolved_leader}, war leader {war_leader}")
+    elif exact:
+        if resolved_price != war_price:
+            problems.append(f"price {resolved_price}, war price {war_price}")
+    else:
+        # The runner-up was in contention but the ladder stepped over its
+        # maximum before it could bid it.
+        leader_max, runner_max = proxies[0][1], proxies[1][1]
+        ceiling = round(min(leader_max, runner_max + increment_for(runner_max)), 2)
+        if not runner_max <= war_price <= resolved_price <= ceiling:
+            problems.append(
+                f"price {resolved_price}, war price {war_price}, "
+                f"runner-up maximum {runner_max}"
+            )
+    return problems, exact
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    boundaries = [float(threshold) for threshold, _ in get_settings().bid_increments]
+    boundaries.append(boundaries[-1] * 2)
+    failures = exact = 0
+    for _ in range(args.cases):
+        case = _case(rng, boundaries)
+        problems, matched = _problems(*case)
+        exact += matched
+        if problems:
+            failures += 1
+            if failures <= 10:
+                print(f"FAIL {case}: {'; '.join(problems)}")
+    if failures:
+        raise SystemExit(f"{failures} of {args.cases} cases failed")
+    print(f"ok: {args.cases} cases agree with the step-by-step war (seed {args.seed})")
+    print(f"    {exact} at exactly the war's price, {args.cases - exact} within its last step")
+
+
+if __name__ == "__main__":
+    main()
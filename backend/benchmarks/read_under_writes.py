@@ -0,0 +1,123 @@
+"""Measure catalog read throughput while bids are being written.
+
+Run from ``backend/``::
+
+    python -m benchmarks.read_under_writes
+    SQLITE_JOURNAL_MODE=DELETE SQLITE_SYNCHRONOUS=FULL python -m benchmarks.read_under_writes
+
+The database is a throwaway file unless ``DATABASE_URL`` is already set.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    _workdir = tempfile.mkdtemp(prefix="fes-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/bench.db"
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app import bidding, migrations, models  # noqa: E402
+from app.database import AsyncSessionLocal, SessionLocal, engine  # noqa: E402
+
+
+def _seed(auction_count: int) -> list[int]:
+    migrations.upgrade(engine)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", display_name="Bench")
+        db.add(owner)
+        db.flush()
+        auctions = [
+            models.Auction(
+                title=f"Lot {index}",
+                description="Benchmark lot",
+                starting_price=0,
+                current_price=0,
+                start_time=now - timedelta(hours=1),
+                end_time=now + timedelta(days=1, minutes=index),
+                owner_id=owner.id,
+            )
+            for index in range(auction_count)
+        ]
+        db.add_all(auctions)
+        db.commit()
+        return [auction.id for auction in auctions]
+
+
+async def _writer(auction_ids: list[int], stop: threading.Event, counter: list[int]) -> None:
+    amount = 1.0
+    while not stop.is_set():
+        for auction_id in auction_ids:
+            async with AsyncSessionLocal() as db:
+                try:
+                    await bidding.place_bid(db, auction_id, 1, amount)
+                    counter[0] += 1
+                except HTTPException:
+                    pass
+        amount += 1
+
+
+def _run_writers(
+    auction_ids: list[int], stop: threading.Event, counters: list[list[int]]
+) -> None:
+    async def run() -> None:
+        await asyncio.gather(*(_writer(auction_ids, stop, counter) for counter in counters))
+
+    asyncio.run(run())
+
+
+def _reader(stop: threading.Event, counter: list[int]) -> None:
+    query = (
+        select(models.Auction.id, models.Auction.current_price, models.Auction.end_time)
+        .order_by(models.Auction.end_time, models.Auction.id)
+        .limit(24)
+    )
+    while not stop.is_set():
+        with SessionLocal() as db:
+            db.execute(query).all()
+            db.execute(select(func.count(models.Bid.id))).scalar()
+        counter[0] += 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--auctions", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    auction_ids = _seed(args.auctions)
+    stop = threading.Event()
+    # One counter per thread so the totals need no locking.
+    reads = [[0] for _ in range(args.readers)]
+    writes = [[0] for _ in range(args.writers)]
+    threads = [
+        threading.Thread(target=_reader, args=(stop, counter)) for counter in reads
+    ] + [threading.Thread(target=_run_writers, args=(auction_ids, stop, writes))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    print(f"journal_mode={journal_mode} readers={args.readers} writers={args.writers}")
+    print(f"reads/s:  {sum(c[0] for c in reads) / elapsed:10.1f}")
+    print(f"bids/s:   {sum(c[0] for c in writes) / elapsed:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
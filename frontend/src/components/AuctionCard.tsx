@@ -1,16 +1,17 @@
 import dayjs from "dayjs";
 import duration from "dayjs/plugin/duration";
 import relativeTime from "dayjs/plugin/relativeTime";
-import { useMemo, useState } from "react";
+import { useMemo } from "react";
 import { Link } from "react-router-dom";
 
-import { Auction } from "../types";
+import { AuctionSearchResult, AuctionSummary, Category } from "../types";
 
 dayjs.extend(relativeTime);
 dayjs.extend(duration);
 
 type Props = {
-  auction: Auction;
+  auction: AuctionSummary | AuctionSearchResult;
+  categories?: Category[];
 };
 
 const statusLabel: Record<string, string> = {
@@ -19,10 +20,11 @@ const statusLabel: Record<string, string> = {
   completed: "Closed"
 };
 
-export function AuctionCard({ auction }: Props) {
-  const [showDetails, setShowDetails] = useState(false);
+export function AuctionCard({ auction, categories = [] }: Props) {
   const closing = dayjs(auction.end_time).format("MMM D, YYYY h:mm A");
-  const starting = dayjs(auction.start_time).format("MMM D, YYYY h:mm A");
+  const categoryNames = auction.category_slugs.map(
+    (slug) => categories.find((category) => category.slug === slug)?.name ?? slug
+  );
 
   const timeRemaining = useMemo(() => {
     if (auction.status === "completed") {
@@ -37,14 +39,12 @@ export function AuctionCard({ auction }: Props) {
     return `${hours}h ${minutes}m left`;
   }, [auction]);
 
-  const gallery = auction.gallery.slice(0, 4);
-
   return (
     <article className="search_result grid">
       <div className="grid_element">
         <div className="img_section">
-          {auction.image_url ? (
-            <img className="search_result_image" src={auction.image_url} alt={auction.title} />
+          {auction.thumbnail_url ? (
+            <img className="search_result_image" src={auction.thumbnail_url} alt={auction.title} />
           ) : (
             <div className="image-placeholder">Photo coming soon</div>
           )}
@@ -59,19 +59,28 @@ export function AuctionCard({ auction }: Props) {
             <button className="favorite fa fa-star-o" type="button" />
           </div>
           <h3 className="h3">
-            <Link to={`/auctions/${auction.id}`}>{auction.title}</Link>
+            {"title_html" in auction ? (
+              // Escaped by the API; only the <mark> tags are markup.
+              <Link to={`/auctions/${auction.id}`} dangerouslySetInnerHTML={{ __html: auction.title_html }} />
+            ) : (
+              <Link to={`/auctions/${auction.id}`}>{auction.title}</Link>
+            )}
           </h3>
+          {"snippet_html" in auction && auction.snippet_html && (
+            <p className="search-snippet" dangerouslySetInnerHTML={{ __html: auction.snippet_html }} />
+          )}
           <div className={`post-location-snippet ${auction.location ? "" : "no-location"}`}>
             <i className="fa fa-map-marker" aria-hidden />
             {auction.location ?? "Location provided after contact"}
+            {auction.distance_miles !== null && ` · ${Math.round(auction.distance_miles)} mi away`}
           </div>
-          {auction.categories.length > 0 && (
+          {categoryNames.length > 0 && (
             <ul className="category-chip-row">
-              {auction.categories.slice(0, 3).map((category) => (
-                <li key={category.id}>{category.name}</li>
+              {categoryNames.slice(0, 3).map((name) => (
+                <li key={name}>{name}</li>
               ))}
-              {auction.categories.length > 3 && (
-                <li className="more-chip">+{auction.categories.length - 3}</li>
+              {categoryNames.length > 3 && (
+                <li className="more-chip">+{categoryNames.length - 3}</li>
               )}
             </ul>
           )}
@@ -79,38 +88,12 @@ export function AuctionCard({ auction }: Props) {
             <strong>Current bid:</strong> ${auction.current_price.toLocaleString()}
           </div>
           <div className="post-extra-container">
-            Seller: {auction.owner.display_name}
+            {auction.bid_count} bids received · Closes {closing}
           </div>
-          <div className={`post-details-container${showDetails ? " expanded" : ""}`}>
-            <button className="details-toggle" type="button" onClick={() => setShowDetails((value) => !value)}>
-              Listing details
-            </button>
-            <div className="details-content">
-              <p>
-                {auction.description.length > 280
-                  ? `${auction.description.slice(0, 280)}…`
-                  : auction.description}
-              </p>
-              <ul>
-                <li>Opens: {starting}</li>
-                <li>Closes: {closing}</li>
-                <li>{auction.bids.length} bids received</li>
-                <li>Anti-sniping window: {auction.sniping_window_minutes} min</li>
-              </ul>
-            </div>
-          </div>
-          {gallery.length > 1 && (
-            <div className="gallery-strip">
-              {gallery.map((image) => (
-                <img key={image.id} src={image.url} alt={`${auction.title} thumbnail`} />
-              ))}
-            </div>
-          )}
           <div className="hidden-xs row-fluid bpad">
             <Link className="btn btn-default view-details" to={`/auctions/${auction.id}`}>
               View listing
             </Link>
-            <span className="posted_meta_data">Updated {dayjs(auction.updated_at).fromNow()}</span>
           </div>
         </div>
       </div>
@@ -4,14 +4,22 @@ import { User } from "../types";
 
 type AuthState = {
   token: string | null;
+  refreshToken: string | null;
+  expiresAt: number | null;
   user: User | null;
 };
 
+type TokenResponse = {
+  access_token: string;
+  expires_in?: number | null;
+  refresh_token?: string | null;
+};
+
 type AuthContextValue = {
   token: string | null;
   user: User | null;
   isAuthenticated: boolean;
-  login: (token: string) => void;
+  login: (tokens: TokenResponse) => void;
   logout: () => void;
   refreshProfile: () => Promise<void>;
 };
@@ -20,29 +28,85 @@ const AuthContext = createContext<AuthContextValue | undefined>(undefined);
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
+// Refresh this long before the access token expires.
+const REFRESH_MARGIN_MS = 60_000;
+
 export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
   const [authState, setAuthState] = useState<AuthState>(() => {
     const savedToken = localStorage.getItem("fes_token");
+    const savedRefreshToken = localStorage.getItem("fes_refresh_token");
+    const savedExpiresAt = localStorage.getItem("fes_token_expires_at");
     const savedUser = localStorage.getItem("fes_user");
     return {
       token: savedToken,
+      refreshToken: savedRefreshToken,
+      expiresAt: savedExpiresAt ? Number(savedExpiresAt) : null,
       user: savedUser ? JSON.parse(savedUser) : null,
     };
   });
 
   const isAuthenticated = Boolean(authState.token);
 
-  const login = useCallback((token: string) => {
-    localStorage.setItem("fes_token", token);
-    setAuthState((prev) => ({ ...prev, token }));
+  const login = useCallback((tokens: TokenResponse) => {
+    const expiresAt = tokens.expires_in ? Date.now() + tokens.expires_in * 1000 : null;
+    localStorage.setItem("fes_token", tokens.access_token);
+    if (tokens.refresh_token) {
+      localStorage.setItem("fes_refresh_token", tokens.refresh_token);
+    }
+    if (expiresAt) {
+      localStorage.setItem("fes_token_expires_at", String(expiresAt));
+    }
+    setAuthState((prev) => ({
+      ...prev,
+      token: tokens.access_token,
+      refreshToken: tokens.refresh_token ?? prev.refreshToken,
+      expiresAt,
+    }));
   }, []);
 
-  const logout = useCallback(() => {
+  const clearSession = useCallback(() => {
     localStorage.removeItem("fes_token");
+    localStorage.removeItem("fes_refresh_token");
+    localStorage.removeItem("fes_token_expires_at");
     localStorage.removeItem("fes_user");
-    setAuthState({ token: null, user: null });
+    setAuthState({ token: null, refreshToken: null, expiresAt: null, user: null });
   }, []);
 
+  const logout = useCallback(() => {
+    if (authState.token) {
+      fetch(`${API_BASE}/auth/logout`, {
+        method: "POST",
+        headers: {
+          Authorization: `Bearer ${authState.token}`,
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify(
+          authState.refreshToken ? { refresh_token: authState.refreshToken } : null
+        ),
+      }).catch(() => undefined);
+    }
+    clearSession();
+  }, [authState.token, authState.refreshToken, clearSession]);
+
+  useEffect(() => {
+    if (!authState.refreshToken || !authState.expiresAt) return;
+    const refreshToken = authState.refreshToken;
+    const delay = Math.max(authState.expiresAt - Date.now() - REFRESH_MARGIN_MS, 0);
+    const timer = window.setTimeout(async () => {
+      const response = await fetch(`${API_BASE}/auth/refresh`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+      });
+      if (!response.ok) {
+        clearSession();
+        return;
+      }
+      login(await response.json());
+    }, delay);
+    return () => window.clearTimeout(timer);
+  }, [authState.refreshToken, authState.expiresAt, login, clearSession]);
+
   const refreshProfile = useCallback(async () => {
     if (!authState.token) return;
     const response = await fetch(`${API_BASE}/users/me`, {
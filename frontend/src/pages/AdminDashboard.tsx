@@ -3,12 +3,12 @@ import dayjs from "dayjs";
 import { useState } from "react";
 
 import { useAuth } from "../context/AuthContext";
-import { Auction, Category } from "../types";
+import { Auction, AuctionImportReport, AuctionPage, AuctionSummary, BatchUploadResponse, Category } from "../types";
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
-async function fetchAdminAuctions(token: string): Promise<Auction[]> {
-  const response = await fetch(`${API_BASE}/auctions`, {
+async function fetchAdminAuctions(token: string): Promise<AuctionSummary[]> {
+  const response = await fetch(`${API_BASE}/auctions?limit=100`, {
     headers: {
       Authorization: `Bearer ${token}`
     }
@@ -16,7 +16,8 @@ async function fetchAdminAuctions(token: string): Promise<Auction[]> {
   if (!response.ok) {
     throw new Error("Failed to load auctions");
   }
-  return response.json();
+  const page: AuctionPage = await response.json();
+  return page.items;
 }
 
 async function fetchCategories(): Promise<Category[]> {
@@ -42,6 +43,7 @@ export function AdminDashboard() {
     description: "",
     image_url: "",
     location: "",
+    postal_code: "",
     starting_price: 0,
     start_time: dayjs().add(1, "hour").format("YYYY-MM-DDTHH:mm"),
     end_time: dayjs().add(2, "hour").format("YYYY-MM-DDTHH:mm"),
@@ -72,6 +74,7 @@ export function AdminDashboard() {
         },
         body: JSON.stringify({
           ...form,
+          postal_code: form.postal_code.trim() || null,
           starting_price: Number(form.starting_price),
           sniping_extension_minutes: Number(form.sniping_extension_minutes),
           sniping_window_minutes: Number(form.sniping_window_minutes),
@@ -95,13 +98,46 @@ export function AdminDashboard() {
     }
   });
 
-  const handleGalleryUpload = async (file: File) => {
-    if (!token) return;
+  // The file goes up as the raw request body; the API parses it as it streams.
+  const importMutation = useMutation({
+    mutationFn: async (file: File) => {
+      const format = file.name.toLowerCase().endsWith(".csv") ? "csv" : "ndjson";
+      const response = await fetch(`${API_BASE}/auctions/import?format=${format}`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+        body: file
+      });
+      if (!response.ok) {
+        const message = await response.json().catch(() => ({ detail: "Import failed" }));
+        throw new Error(message.detail);
+      }
+      return response.json() as Promise<AuctionImportReport>;
+    },
+    onSuccess: () => {
+      queryClient.invalidateQueries({ queryKey: ["admin-auctions"] });
+      queryClient.invalidateQueries({ queryKey: ["auctions"] });
+    }
+  });
+
+  const handleExport = async (format: "csv" | "ndjson") => {
+    const response = await fetch(`${API_BASE}/auctions/export?format=${format}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    });
+    if (!response.ok) return;
+    const link = document.createElement("a");
+    link.href = URL.createObjectURL(await response.blob());
+    link.download = `auctions.${format}`;
+    link.click();
+    URL.revokeObjectURL(link.href);
+  };
+
+  const handleGalleryUpload = async (files: File[]) => {
+    if (!token || files.length === 0) return;
     const formData = new FormData();
-    formData.append("file", file);
+    files.forEach((file) => formData.append("files", file));
     setUploading(true);
     try {
-      const response = await fetch(`${API_BASE}/media/auction`, {
+      const response = await fetch(`${API_BASE}/media/auction/batch`, {
         method: "POST",
         headers: { Authorization: `Bearer ${token}` },
         body: formData,
@@ -110,10 +146,11 @@ export function AdminDashboard() {
         const message = await response.json().catch(() => ({ detail: "Upload failed" }));
         throw new Error(message.detail);
       }
-      const data = await response.json();
-      setGallery((current) => [...current, data.url]);
-      if (!form.image_url) {
-        setForm((prev) => ({ ...prev, image_url: data.url }));
+      const data: BatchUploadResponse = await response.json();
+      const urls = data.items.map((item) => item.url);
+      setGallery((current) => [...current, ...urls.filter((url) => !current.includes(url))]);
+      if (!form.image_url && urls.length > 0) {
+        setForm((prev) => ({ ...prev, image_url: urls[0] }));
       }
     } catch (error) {
       console.error(error);
@@ -147,6 +184,14 @@ export function AdminDashboard() {
             placeholder="City, State"
           />
         </label>
+        <label>
+          ZIP / postal code
+          <input
+            value={form.postal_code}
+            onChange={(event) => setForm({ ...form, postal_code: event.target.value })}
+            placeholder="Used for distance search"
+          />
+        </label>
         <fieldset className="checkbox-fieldset">
           <legend>Categories</legend>
           <p className="muted">
@@ -192,13 +237,15 @@ export function AdminDashboard() {
             <input
               type="file"
               accept="image/*"
+              multiple
               onChange={(event) => {
-                if (event.target.files?.[0]) {
-                  handleGalleryUpload(event.target.files[0]);
+                if (event.target.files?.length) {
+                  handleGalleryUpload(Array.from(event.target.files));
+                  event.target.value = "";
                 }
               }}
             />
-            {uploading ? "Uploading…" : "Add photo"}
+            {uploading ? "Uploading…" : "Add photos"}
           </label>
           {gallery.length > 0 && (
             <div className="thumb-row">
@@ -259,11 +306,72 @@ export function AdminDashboard() {
         <button onClick={() => createMutation.mutate()} disabled={createMutation.isLoading}>
           {createMutation.isLoading ? "Creating…" : "Create auction"}
         </button>
+        {(createMutation.data as Auction | undefined)?.warnings?.map((warning) => (
+          <p key={warning} className="muted">
+            {warning}
+          </p>
+        ))}
         {createMutation.error && (
           <p style={{ color: "tomato" }}>{(createMutation.error as Error).message}</p>
         )}
       </div>
 
+      <div className="form-card">
+        <h2>Bulk import &amp; export</h2>
+        <p className="muted">
+          Upload a CSV with a header row or an NDJSON file (one listing per line) using the same fields as the form.
+          Separate categories and gallery URLs with <code>|</code> in CSV.
+        </p>
+        <label>
+          Import file
+          <input
+            type="file"
+            accept=".csv,.ndjson,.jsonl"
+            disabled={importMutation.isLoading}
+            onChange={(event) => {
+              const file = event.target.files?.[0];
+              if (file) importMutation.mutate(file);
+              event.target.value = "";
+            }}
+          />
+        </label>
+        {importMutation.isLoading && <p className="muted">Importing…</p>}
+        {importMutation.error && <p style={{ color: "tomato" }}>{(importMutation.error as Error).message}</p>}
+        {importMutation.data && (
+          <div>
+            <p>
+              Created {importMutation.data.created} listing(s); {importMutation.data.failed} row(s) skipped.
+            </p>
+            {importMutation.data.warnings.length > 0 && (
+              <ul className="muted">
+                {importMutation.data.warnings.map((warning) => (
+                  <li key={warning.line}>
+                    Line {warning.line}: {warning.message}
+                  </li>
+                ))}
+              </ul>
+            )}
+            {importMutation.data.errors.length > 0 && (
+              <ul className="muted">
+                {importMutation.data.errors.map((error) => (
+                  <li key={error.line}>
+                    Line {error.line}: {error.errors.join("; ")}
+                  </li>
+                ))}
+              </ul>
+            )}
+          </div>
+        )}
+        <div className="hero-actions">
+          <button type="button" className="ghost-btn" onClick={() => handleExport("csv")}>
+            Export CSV
+          </button>
+          <button type="button" className="ghost-btn" onClick={() => handleExport("ndjson")}>
+            Export NDJSON
+          </button>
+        </div>
+      </div>
+
       <section>
         <h2>Existing listings</h2>
         {data?.length ? (
@@ -287,9 +395,7 @@ export function AdminDashboard() {
                   <td>${auction.current_price.toFixed(2)}</td>
                   <td>{dayjs(auction.end_time).format("MMM D, YYYY h:mm A")}</td>
                   <td className="muted">
-                    {auction.categories.length
-                      ? auction.categories.map((category) => category.name).join(", ")
-                      : "—"}
+                    {auction.category_slugs.length ? auction.category_slugs.join(", ") : "—"}
                   </td>
                 </tr>
               ))}
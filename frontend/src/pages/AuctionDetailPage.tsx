@@ -1,13 +1,13 @@
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import dayjs from "dayjs";
 import relativeTime from "dayjs/plugin/relativeTime";
-import { useMemo, useState } from "react";
+import { useEffect, useMemo, useState } from "react";
 import { useParams } from "react-router-dom";
 
 import { FinancingApplicationForm } from "../components/forms/FinancingApplicationForm";
 import { TransportQuoteForm } from "../components/forms/TransportQuoteForm";
 import { useAuth } from "../context/AuthContext";
-import { Auction, Bid } from "../types";
+import { Auction, Bid, BidReceipt, ProxyBidReceipt } from "../types";
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
@@ -60,11 +60,25 @@ async function fetchAuction(id: string, token: string | null): Promise<Auction>
   return response.json();
 }
 
+type AuctionStreamEvent =
+  | {
+      type: "snapshot" | "bid";
+      auction_id: number;
+      current_price: number;
+      bid_count?: number;
+      end_time: string;
+    }
+  | {
+      type: "status";
+      auction_id: number;
+      status: Auction["status"];
+    };
+
 async function placeBidRequest(
   auctionId: number,
   amount: number,
   token: string
-): Promise<Auction> {
+): Promise<BidReceipt> {
   const response = await fetch(`${API_BASE}/auctions/${auctionId}/bids?amount=${amount}`, {
     method: "POST",
     headers: {
@@ -79,6 +93,26 @@ async function placeBidRequest(
   return response.json();
 }
 
+async function setProxyBidRequest(
+  auctionId: number,
+  maxAmount: number,
+  token: string
+): Promise<ProxyBidReceipt> {
+  const response = await fetch(`${API_BASE}/auctions/${auctionId}/proxy`, {
+    method: "PUT",
+    headers: {
+      Authorization: `Bearer ${token}`,
+      "Content-Type": "application/json"
+    },
+    body: JSON.stringify({ max_amount: maxAmount })
+  });
+  if (!response.ok) {
+    const message = await response.json().catch(() => ({ detail: "Maximum bid failed" }));
+    throw new Error(message.detail ?? "Maximum bid failed");
+  }
+  return response.json();
+}
+
 export function AuctionDetailPage() {
   const { id } = useParams<{ id: string }>();
   const { token, isAuthenticated, user } = useAuth();
@@ -93,12 +127,45 @@ export function AuctionDetailPage() {
     enabled: Boolean(id)
   });
 
+  useEffect(() => {
+    if (!id) return;
+    const socket = new WebSocket(`${API_BASE.replace(/^http/, "ws")}/auctions/${id}/stream`);
+    socket.onmessage = (message) => {
+      const event: AuctionStreamEvent = JSON.parse(message.data);
+      if (event.type === "status") {
+        // Opening or closing changes more than the stream carries (winner, messages).
+        queryClient.invalidateQueries({ queryKey: ["auction", id] });
+        queryClient.invalidateQueries({ queryKey: ["auctions"] });
+        return;
+      }
+      queryClient.setQueryData<Auction>(["auction", id], (current) =>
+        current
+          ? {
+              ...current,
+              current_price: event.current_price,
+              bid_count: event.bid_count ?? current.bid_count,
+              end_time: event.end_time,
+            }
+          : current
+      );
+    };
+    return () => socket.close();
+  }, [id, queryClient]);
+
   const mutation = useMutation({
     mutationFn: (amount: number) => placeBidRequest(Number(id), amount, token!),
-    onSuccess: (updatedAuction) => {
-      queryClient.setQueryData(["auction", id], updatedAuction);
+    onSuccess: (receipt) => {
+      queryClient.invalidateQueries({ queryKey: ["auction", id] });
+      queryClient.invalidateQueries({ queryKey: ["auctions"] });
+      setBidAmount(receipt.current_price + 1);
+    }
+  });
+
+  const proxyMutation = useMutation({
+    mutationFn: (maxAmount: number) => setProxyBidRequest(Number(id), maxAmount, token!),
+    onSuccess: () => {
+      queryClient.invalidateQueries({ queryKey: ["auction", id] });
       queryClient.invalidateQueries({ queryKey: ["auctions"] });
-      setBidAmount(updatedAuction.current_price + 1);
     }
   });
 
@@ -144,13 +211,18 @@ export function AuctionDetailPage() {
 
   const startingAmount = highestBid ? highestBid.amount + 1 : data.starting_price + 1;
   const heroImage = selectedImage ?? data.image_url ?? data.gallery[0]?.url ?? null;
+  const renditions = new Map(data.gallery.map((image) => [image.url, image]));
 
   return (
     <section className="detail-layout">
       <div className="detail-left">
         <div className="media-gallery">
           {heroImage ? (
-            <img className="hero" src={heroImage} alt={data.title} />
+            <img
+              className="hero"
+              src={renditions.get(heroImage)?.medium_url ?? heroImage}
+              alt={data.title}
+            />
           ) : (
             <div className="hero placeholder">Photos coming soon</div>
           )}
@@ -165,7 +237,10 @@ export function AuctionDetailPage() {
                   type="button"
                   onClick={() => setSelectedImage(url!)}
                 >
-                  <img src={url!} alt={`${data.title} thumbnail`} />
+                  <img
+                    src={renditions.get(url!)?.thumbnail_url ?? url!}
+                    alt={`${data.title} thumbnail`}
+                  />
                 </button>
               ))}
           </div>
@@ -201,7 +276,7 @@ export function AuctionDetailPage() {
             </div>
             <div>
               <span className="summary-label">Bids</span>
-              <span>{data.bids.length}</span>
+              <span>{data.bid_count}</span>
             </div>
           </section>
           <p className="description">{data.description}</p>
@@ -272,7 +347,23 @@ export function AuctionDetailPage() {
             <button onClick={() => mutation.mutate(bidAmount || startingAmount)} disabled={mutation.isLoading}>
               {mutation.isLoading ? "Submitting…" : "Submit bid"}
             </button>
+            <button
+              className="ghost-btn"
+              onClick={() => proxyMutation.mutate(bidAmount || startingAmount)}
+              disabled={proxyMutation.isLoading}
+            >
+              {proxyMutation.isLoading ? "Saving…" : "Bid automatically up to this amount"}
+            </button>
+            {proxyMutation.data && (
+              <p className="muted">
+                Maximum ${proxyMutation.data.max_amount.toFixed(2)} saved ·{" "}
+                {proxyMutation.data.leading ? "you are the high bidder" : "you have been outbid"}
+              </p>
+            )}
             {mutation.error && <p className="error-text">{(mutation.error as Error).message}</p>}
+            {proxyMutation.error && (
+              <p className="error-text">{(proxyMutation.error as Error).message}</p>
+            )}
           </div>
         ) : (
           <div className="signin-card">
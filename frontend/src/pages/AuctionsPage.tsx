@@ -1,14 +1,19 @@
-import { useMutation, useQuery } from "@tanstack/react-query";
-import { useMemo, useState } from "react";
+import { useInfiniteQuery, useMutation, useQuery } from "@tanstack/react-query";
+import { useEffect, useMemo, useState } from "react";
 
 import { AuctionCard } from "../components/AuctionCard";
 import { useAuth } from "../context/AuthContext";
-import { Auction, Category, SupportProgram } from "../types";
+import { AuctionPage, AuctionSearchPage, AuctionSummary, Category, SupportProgram } from "../types";
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
-async function fetchAuctions(token: string | null): Promise<Auction[]> {
-  const response = await fetch(`${API_BASE}/auctions`, {
+async function fetchAuctions(token: string | null, near: string, radius: number): Promise<AuctionSummary[]> {
+  const params = new URLSearchParams({ limit: "100" });
+  if (near) {
+    params.set("near", near);
+    params.set("radius_miles", String(radius));
+  }
+  const response = await fetch(`${API_BASE}/auctions?${params}`, {
     headers: token
       ? {
           Authorization: `Bearer ${token}`
@@ -16,11 +21,33 @@ async function fetchAuctions(token: string | null): Promise<Auction[]> {
       : undefined
   });
   if (!response.ok) {
-    throw new Error("Failed to load auctions");
+    const message = await response.json().catch(() => ({ detail: "Failed to load auctions" }));
+    throw new Error(message.detail);
+  }
+  const page: AuctionPage = await response.json();
+  return page.items;
+}
+
+async function searchAuctions(
+  query: string,
+  status: string,
+  category: string | null,
+  cursor?: string
+): Promise<AuctionSearchPage> {
+  const params = new URLSearchParams({ q: query });
+  if (status !== "all") params.set("status", status);
+  if (category) params.set("category", category);
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${API_BASE}/auctions/search?${params}`);
+  if (!response.ok) {
+    throw new Error("Search failed");
   }
   return response.json();
 }
 
+const SEARCH_DEBOUNCE_MS = 250;
+const RADIUS_CHOICES = [25, 50, 100, 250, 500];
+
 async function fetchCategories(): Promise<Category[]> {
   const response = await fetch(`${API_BASE}/catalog/categories`);
   if (!response.ok) {
@@ -76,9 +103,14 @@ export function AuctionsPage() {
   const [searchTerm, setSearchTerm] = useState("");
   const [email, setEmail] = useState("");
   const [selectedCategory, setSelectedCategory] = useState<string | null>(null);
+  const [query, setQuery] = useState("");
+  const [postalCode, setPostalCode] = useState("");
+  const [near, setNear] = useState("");
+  const [radius, setRadius] = useState(100);
   const { data, error, isLoading } = useQuery({
-    queryKey: ["auctions"],
-    queryFn: () => fetchAuctions(token ?? null)
+    queryKey: ["auctions", near, radius],
+    queryFn: () => fetchAuctions(token ?? null, near, radius),
+    keepPreviousData: true
   });
   const { data: categories } = useQuery({
     queryKey: ["categories"],
@@ -89,19 +121,43 @@ export function AuctionsPage() {
     queryFn: fetchSupportPrograms,
   });
 
+  useEffect(() => {
+    const timer = setTimeout(() => setQuery(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  useEffect(() => {
+    const timer = setTimeout(() => setNear(postalCode.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [postalCode]);
+
+  // Text queries go to the ranked server-side index; facet counts come from
+  // the first page and label the category pills.
+  const search = useInfiniteQuery({
+    queryKey: ["auction-search", query, statusFilter, selectedCategory],
+    queryFn: ({ pageParam }) => searchAuctions(query, statusFilter, selectedCategory, pageParam),
+    getNextPageParam: (page: AuctionSearchPage) => page.next_cursor ?? undefined,
+    enabled: query !== "",
+    keepPreviousData: true
+  });
+  const searching = query !== "";
+  const facetCounts = useMemo(() => {
+    const first = search.data?.pages[0];
+    return new Map(first?.facets.map((facet) => [facet.slug, facet.count]) ?? []);
+  }, [search.data]);
+
   const filteredAuctions = useMemo(() => {
+    if (searching) {
+      return (search.data?.pages ?? []).flatMap((page) => page.items);
+    }
     if (!data) return [];
     return data.filter((auction) => {
       const matchesStatus = statusFilter === "all" || auction.status === statusFilter;
-      const matchesSearch = [auction.title, auction.location ?? "", auction.description]
-        .join(" ")
-        .toLowerCase()
-        .includes(searchTerm.toLowerCase());
       const matchesCategory =
-        !selectedCategory || auction.categories.some((category) => category.slug === selectedCategory);
-      return matchesStatus && matchesSearch && matchesCategory;
+        !selectedCategory || auction.category_slugs.includes(selectedCategory);
+      return matchesStatus && matchesCategory;
     });
-  }, [data, searchTerm, statusFilter, selectedCategory]);
+  }, [data, searching, search.data, statusFilter, selectedCategory]);
 
   const signupMutation = useMutation({
     mutationFn: async () => {
@@ -125,7 +181,7 @@ export function AuctionsPage() {
     return <p>Loading auctions…</p>;
   }
 
-  if (error) {
+  if (error && !near) {
     return <p>Unable to load auctions.</p>;
   }
 
@@ -164,6 +220,26 @@ export function AuctionsPage() {
             onChange={(event) => setSearchTerm(event.target.value)}
           />
         </div>
+        <div className="near-filter">
+          <input
+            placeholder="ZIP / postal code"
+            value={postalCode}
+            onChange={(event) => setPostalCode(event.target.value)}
+            aria-label="Near postal code"
+          />
+          <select
+            value={radius}
+            onChange={(event) => setRadius(Number(event.target.value))}
+            aria-label="Search radius"
+          >
+            {RADIUS_CHOICES.map((miles) => (
+              <option key={miles} value={miles}>
+                within {miles} mi
+              </option>
+            ))}
+          </select>
+          {error && near && <small className="error-text">{(error as Error).message}</small>}
+        </div>
         <div className="status-tabs">
           {(["all", "active", "upcoming", "completed"] as const).map((status) => (
             <button
@@ -200,6 +276,7 @@ export function AuctionsPage() {
               onClick={() => setSelectedCategory(category.slug)}
             >
               {category.name}
+              {searching && ` (${facetCounts.get(category.slug) ?? 0})`}
             </button>
           ))}
         </div>
@@ -212,12 +289,17 @@ export function AuctionsPage() {
 
       <div className="card-grid">
         {filteredAuctions.map((auction) => (
-          <AuctionCard key={auction.id} auction={auction} />
+          <AuctionCard key={auction.id} auction={auction} categories={categories ?? []} />
         ))}
         {filteredAuctions.length === 0 && (
           <p className="muted">No auctions match your filters yet. Try another search term.</p>
         )}
       </div>
+      {searching && search.hasNextPage && (
+        <button className="secondary" onClick={() => search.fetchNextPage()} disabled={search.isFetchingNextPage}>
+          {search.isFetchingNextPage ? "Loading…" : "More results"}
+        </button>
+      )}
 
       <section className="newsletter-card" id="stay-informed">
         <h2>Get the next drop in your inbox</h2>
@@ -90,7 +90,7 @@ export function AuthPage() {
         throw new Error("Login failed");
       }
       const token = await loginResponse.json();
-      login(token.access_token);
+      login(token);
       await refreshProfile();
       navigate("/");
     } catch (err) {
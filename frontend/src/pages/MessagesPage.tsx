@@ -1,17 +1,33 @@
-import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
+import { InfiniteData, useInfiniteQuery, useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import dayjs from "dayjs";
 import relativeTime from "dayjs/plugin/relativeTime";
-import { useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 
 import { useAuth } from "../context/AuthContext";
-import { Message } from "../types";
+import { ConversationPage, Message, MessagePage } from "../types";
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
 dayjs.extend(relativeTime);
 
-async function fetchMessages(token: string): Promise<Message[]> {
-  const response = await fetch(`${API_BASE}/messages`, {
+async function fetchConversations(token: string): Promise<ConversationPage> {
+  const response = await fetch(`${API_BASE}/messages/conversations?limit=50`, {
+    headers: {
+      Authorization: `Bearer ${token}`
+    }
+  });
+  if (!response.ok) {
+    throw new Error("Failed to load conversations");
+  }
+  return response.json();
+}
+
+async function fetchThread(token: string, conversationId: number, before?: string): Promise<MessagePage> {
+  const params = new URLSearchParams({ limit: "50" });
+  if (before) {
+    params.set("before", before);
+  }
+  const response = await fetch(`${API_BASE}/messages/conversations/${conversationId}?${params}`, {
     headers: {
       Authorization: `Bearer ${token}`
     }
@@ -22,6 +38,22 @@ async function fetchMessages(token: string): Promise<Message[]> {
   return response.json();
 }
 
+type MessageStreamEvent =
+  | { type: "snapshot"; total_unread: number; last_message_id: number | null }
+  | { type: "message"; message: Message; unread_count: number; total_unread: number }
+  | {
+      type: "read";
+      conversation_id: number;
+      user_id: number;
+      read_at: string;
+      last_message_id: number | null;
+      unread_count?: number;
+      total_unread?: number;
+    }
+  | { type: "resync" };
+
+const RECONNECT_DELAY_MS = 3000;
+
 const messagingTips = [
   "Send inspection photos or PDF reports to keep the conversation in one place.",
   "Share preferred pickup windows and transport requirements early.",
@@ -34,36 +66,154 @@ export function MessagesPage() {
   const [recipientId, setRecipientId] = useState<number | "">("");
   const [body, setBody] = useState("");
   const [auctionId, setAuctionId] = useState<number | "">("");
-  const [activeConversation, setActiveConversation] = useState<number | "all">("all");
+  const [activeConversation, setActiveConversation] = useState<number | null>(null);
+  const [totalUnread, setTotalUnread] = useState(0);
+  const activeRef = useRef<number | null>(null);
+  const lastSeenId = useRef<number | null>(null);
+  const seenIds = useRef(new Set<number>());
+  const applyMessageRef = useRef<(message: Message, unreadCount?: number) => void>();
+  activeRef.current = activeConversation;
 
-  const { data } = useQuery({
-    queryKey: ["messages"],
-    queryFn: () => fetchMessages(token!),
+  const { data: inbox } = useQuery({
+    queryKey: ["conversations"],
+    queryFn: () => fetchConversations(token!),
     enabled: Boolean(token)
   });
+  const conversations = inbox?.items ?? [];
+
+  useEffect(() => {
+    if (activeConversation === null && conversations.length > 0) {
+      setActiveConversation(conversations[0].id);
+      setRecipientId(conversations[0].counterpart.id);
+    }
+  }, [activeConversation, conversations]);
 
-  const conversations = useMemo(() => {
-    if (!data || !user) return [];
-    const map = new Map<number, { counterpart: Message["sender"]; lastMessage: Message }>();
-    data.forEach((message) => {
-      const counterpart = message.sender.id === user.id ? message.recipient : message.sender;
-      const existing = map.get(counterpart.id);
-      if (!existing || dayjs(message.created_at).isAfter(existing.lastMessage.created_at)) {
-        map.set(counterpart.id, { counterpart, lastMessage: message });
+  const thread = useInfiniteQuery({
+    queryKey: ["conversation", activeConversation],
+    queryFn: ({ pageParam }) => fetchThread(token!, activeConversation!, pageParam),
+    getNextPageParam: (page: MessagePage) => page.next_cursor ?? undefined,
+    enabled: Boolean(token) && activeConversation !== null
+  });
+
+  // New messages, unread counts and read receipts arrive over one socket per
+  // user. After a drop it reconnects with the last message id it saw and the
+  // server replays only what was missed.
+  useEffect(() => {
+    if (!token) return;
+    let socket: WebSocket;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    // Replayed, live and just-sent messages can overlap; each is applied once.
+    const applyMessage = (message: Message, unreadCount?: number) => {
+      if (seenIds.current.has(message.id)) {
+        return;
+      }
+      seenIds.current.add(message.id);
+      const conversationId = message.conversation_id;
+      queryClient.setQueryData<InfiniteData<MessagePage>>(["conversation", conversationId], (current) =>
+        current
+          ? {
+              ...current,
+              pages: current.pages.map((page, index) =>
+                index === 0 ? { ...page, items: [message, ...page.items] } : page
+              )
+            }
+          : current
+      );
+      const inbox = queryClient.getQueryData<ConversationPage>(["conversations"]);
+      const summary = inbox?.items.find((conversation) => conversation.id === conversationId);
+      if (!inbox || !summary) {
+        queryClient.invalidateQueries({ queryKey: ["conversations"] });
+        return;
+      }
+      const updated = {
+        ...summary,
+        last_message_at: message.created_at,
+        last_message_body: message.body,
+        last_sender_id: message.sender.id,
+        message_count: summary.message_count + 1,
+        unread_count: unreadCount ?? summary.unread_count
+      };
+      queryClient.setQueryData<ConversationPage>(["conversations"], {
+        ...inbox,
+        items: [updated, ...inbox.items.filter((conversation) => conversation.id !== conversationId)]
+      });
+      const open = socket?.readyState === WebSocket.OPEN;
+      if (open && conversationId === activeRef.current && message.sender.id !== user?.id) {
+        socket.send(JSON.stringify({ type: "read", conversation_id: conversationId }));
+      }
+    };
+
+    const connect = () => {
+      const params = new URLSearchParams({ token });
+      if (lastSeenId.current !== null) {
+        params.set("last_seen_id", String(lastSeenId.current));
       }
-    });
-    return Array.from(map.values()).sort((a, b) =>
-      dayjs(b.lastMessage.created_at).diff(dayjs(a.lastMessage.created_at))
-    );
-  }, [data, user]);
-
-  const filteredMessages = useMemo(() => {
-    if (!data) return [];
-    if (activeConversation === "all") return data;
-    return data.filter(
-      (message) => message.sender.id === activeConversation || message.recipient.id === activeConversation
-    );
-  }, [activeConversation, data]);
+      socket = new WebSocket(`${API_BASE.replace(/^http/, "ws")}/messages/stream?${params}`);
+      socket.onmessage = (frame) => {
+        const event: MessageStreamEvent = JSON.parse(frame.data);
+        if (event.type === "snapshot") {
+          setTotalUnread(event.total_unread);
+          if (lastSeenId.current === null) {
+            lastSeenId.current = event.last_message_id;
+          }
+        } else if (event.type === "message") {
+          setTotalUnread(event.total_unread);
+          lastSeenId.current = Math.max(lastSeenId.current ?? 0, event.message.id);
+          applyMessage(event.message, event.unread_count);
+        } else if (event.type === "read") {
+          queryClient.setQueryData<ConversationPage>(["conversations"], (current) =>
+            current
+              ? {
+                  ...current,
+                  items: current.items.map((conversation) => {
+                    if (conversation.id !== event.conversation_id) return conversation;
+                    return event.user_id === user?.id
+                      ? { ...conversation, unread_count: 0 }
+                      : { ...conversation, counterpart_last_read_at: event.read_at };
+                  })
+                }
+              : current
+          );
+          if (event.total_unread !== undefined) {
+            setTotalUnread(event.total_unread);
+          }
+        } else if (event.type === "resync") {
+          lastSeenId.current = null;
+          queryClient.invalidateQueries({ queryKey: ["conversations"] });
+          queryClient.invalidateQueries({ queryKey: ["conversation"] });
+        }
+      };
+      socket.onclose = () => {
+        if (!closed) {
+          retry = setTimeout(connect, RECONNECT_DELAY_MS);
+        }
+      };
+    };
+
+    applyMessageRef.current = applyMessage;
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      socket.close();
+    };
+  }, [token, user?.id, queryClient]);
+
+  const activeSummary = conversations.find((conversation) => conversation.id === activeConversation);
+
+  // Pages arrive newest-first; the thread reads oldest to newest.
+  const threadMessages = useMemo(
+    () => (thread.data?.pages ?? []).flatMap((page) => page.items).reverse(),
+    [thread.data]
+  );
+
+  const latest = threadMessages[threadMessages.length - 1];
+  const seen =
+    latest?.sender.id === user?.id &&
+    Boolean(activeSummary?.counterpart_last_read_at) &&
+    !dayjs(activeSummary?.counterpart_last_read_at).isBefore(dayjs(latest.created_at));
 
   const mutation = useMutation({
     mutationFn: async () => {
@@ -85,37 +235,37 @@ export function MessagesPage() {
       }
       return response.json();
     },
-    onSuccess: () => {
+    onSuccess: (message: Message) => {
       setBody("");
-      queryClient.invalidateQueries({ queryKey: ["messages"] });
+      applyMessageRef.current?.(message);
     }
   });
 
   return (
     <section className="messages-layout">
       <aside className="conversation-list">
-        <h2>Inbox</h2>
-        <button
-          className={activeConversation === "all" ? "conversation active" : "conversation"}
-          onClick={() => setActiveConversation("all")}
-        >
-          All conversations
-        </button>
-        {conversations.map(({ counterpart, lastMessage }) => (
+        <h2>Inbox{totalUnread > 0 && ` (${totalUnread})`}</h2>
+        {conversations.map((conversation) => (
           <button
-            key={counterpart.id}
-            className={activeConversation === counterpart.id ? "conversation active" : "conversation"}
+            key={conversation.id}
+            className={activeConversation === conversation.id ? "conversation active" : "conversation"}
             onClick={() => {
-              setActiveConversation(counterpart.id);
-              setRecipientId(counterpart.id);
+              setActiveConversation(conversation.id);
+              setRecipientId(conversation.counterpart.id);
+              setAuctionId(conversation.auction_id ?? "");
             }}
           >
-            <span className="name">{counterpart.display_name}</span>
+            <span className="name">
+              {conversation.counterpart.display_name}
+              {conversation.unread_count > 0 && ` (${conversation.unread_count})`}
+            </span>
             <span className="preview">
-              {dayjs(lastMessage.created_at).fromNow()} · {lastMessage.body.slice(0, 40)}
+              {conversation.auction_id && `Auction #${conversation.auction_id} · `}
+              {dayjs(conversation.last_message_at).fromNow()} · {conversation.last_message_body?.slice(0, 40)}
             </span>
           </button>
         ))}
+        {conversations.length === 0 && <p className="muted">No conversations yet.</p>}
       </aside>
 
       <div className="messages-content">
@@ -158,7 +308,12 @@ export function MessagesPage() {
         </div>
 
         <section className="message-thread">
-          {filteredMessages.map((message) => (
+          {thread.hasNextPage && (
+            <button className="secondary" onClick={() => thread.fetchNextPage()} disabled={thread.isFetchingNextPage}>
+              {thread.isFetchingNextPage ? "Loading…" : "Load earlier messages"}
+            </button>
+          )}
+          {threadMessages.map((message) => (
             <article key={message.id} className="message">
               <header>
                 <div>
@@ -174,7 +329,8 @@ export function MessagesPage() {
               <p>{message.body}</p>
             </article>
           ))}
-          {filteredMessages.length === 0 && <p className="muted">No messages yet.</p>}
+          {threadMessages.length === 0 && <p className="muted">No messages yet.</p>}
+          {seen && <small className="muted">Seen {dayjs(activeSummary?.counterpart_last_read_at).fromNow()}</small>}
         </section>
 
         <aside className="help-card">
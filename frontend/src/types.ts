@@ -17,12 +17,41 @@ export type Bid = {
   bidder: User;
 };
 
+export type BidPage = {
+  items: Bid[];
+  next_cursor: string | null;
+};
+
+export type BidReceipt = {
+  id: number;
+  auction_id: number;
+  amount: number;
+  created_at: string;
+  current_price: number;
+  bid_count: number;
+  end_time: string;
+  high_bidder_id: number | null;
+};
+
+export type ProxyBidReceipt = {
+  auction_id: number;
+  max_amount: number;
+  leading: boolean;
+  current_price: number;
+  bid_count: number;
+  end_time: string;
+  bids_placed: number;
+};
+
 export type Auction = {
   id: number;
   title: string;
   description: string;
   image_url: string | null;
   location: string | null;
+  postal_code: string | null;
+  latitude: number | null;
+  longitude: number | null;
   starting_price: number;
   current_price: number;
   start_time: string;
@@ -32,17 +61,92 @@ export type Auction = {
   owner: User;
   created_at: string;
   updated_at: string;
+  bid_count: number;
+  high_bidder_id: number | null;
+  last_bid_at: string | null;
+  version: number;
+  closed_at: string | null;
+  winning_bid_id: number | null;
   bids: Bid[];
   gallery: AuctionImage[];
   status: "active" | "upcoming" | "completed";
   time_remaining_seconds: number;
   categories: Category[];
+  warnings?: string[];
+};
+
+export type AuctionSummary = {
+  id: number;
+  title: string;
+  thumbnail_url: string | null;
+  location: string | null;
+  latitude: number | null;
+  longitude: number | null;
+  distance_miles: number | null;
+  current_price: number;
+  start_time: string;
+  end_time: string;
+  status: "active" | "upcoming" | "completed";
+  time_remaining_seconds: number;
+  bid_count: number;
+  category_slugs: string[];
+};
+
+export type AuctionImportReport = {
+  created: number;
+  failed: number;
+  auction_ids: number[];
+  errors: { line: number; errors: string[] }[];
+  warnings: { line: number; message: string }[];
+};
+
+export type AuctionPage = {
+  items: AuctionSummary[];
+  next_cursor: string | null;
+};
+
+export type AuctionSearchResult = AuctionSummary & {
+  title_html: string;
+  snippet_html: string;
+};
+
+export type SearchFacet = {
+  slug: string;
+  name: string;
+  count: number;
+};
+
+export type AuctionSearchPage = {
+  items: AuctionSearchResult[];
+  facets: SearchFacet[];
+  total: number | null;
+  next_cursor: string | null;
 };
 
 export type AuctionImage = {
   id: number;
   url: string;
   position: number;
+  width: number | null;
+  height: number | null;
+  thumbnail_url: string | null;
+  medium_url: string | null;
+};
+
+export type UploadResponse = {
+  url: string;
+  content_type: string;
+  size: number;
+  width: number | null;
+  height: number | null;
+  thumbnail_url: string | null;
+  medium_url: string | null;
+};
+
+export type BatchUploadResponse = {
+  items: UploadResponse[];
+  auction_id: number | null;
+  gallery: AuctionImage[];
 };
 
 export type Category = {
@@ -74,6 +178,7 @@ export type TransportQuote = {
   timeline: string | null;
   notes: string | null;
   auction_id: number | null;
+  distance_miles: number | null;
   created_at: string;
 };
 
@@ -96,10 +201,33 @@ export type Message = {
   body: string;
   created_at: string;
   auction_id: number | null;
+  conversation_id: number | null;
   sender: User;
   recipient: User;
 };
 
+export type MessagePage = {
+  items: Message[];
+  next_cursor: string | null;
+};
+
+export type ConversationSummary = {
+  id: number;
+  counterpart: User;
+  auction_id: number | null;
+  last_message_at: string | null;
+  last_message_body: string | null;
+  last_sender_id: number | null;
+  message_count: number;
+  unread_count: number;
+  counterpart_last_read_at: string | null;
+};
+
+export type ConversationPage = {
+  items: ConversationSummary[];
+  next_cursor: string | null;
+};
+
 export type ContactRequest = {
   id: number;
   first_name: string;